@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:38
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_outstanding_balance(apps, schema_editor):
+    """
+    Sets the new stored balance of existing clients to their order totals minus their payments.
+    """
+    Client = apps.get_model('clients', 'Client')
+    Order = apps.get_model('sales', 'Order')
+    Payment = apps.get_model('sales', 'Payment')
+    decimal_field = models.DecimalField(max_digits=12, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=decimal_field)
+    order_totals = Order.objects.filter(client=OuterRef('pk')).order_by().values('client').annotate(
+        total=Sum('total_amount')
+    ).values('total')
+    payment_totals = Payment.objects.filter(client=OuterRef('pk')).order_by().values('client').annotate(
+        total=Sum('amount_paid')
+    ).values('total')
+    Client.objects.update(outstanding_balance=(
+        Coalesce(Subquery(order_totals, output_field=decimal_field), zero)
+        - Coalesce(Subquery(payment_totals, output_field=decimal_field), zero)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_composite_indexes'),
+        ('sales', '0004_composite_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='outstanding_balance',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_outstanding_balance, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['outstanding_balance', 'id'], name='client_balance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['assigned_salesperson', 'outstanding_balance', 'id'], name='client_salesperson_balance_idx'),
+        ),
+    ]
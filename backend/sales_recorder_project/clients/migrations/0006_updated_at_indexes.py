@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_client_outstanding_balance'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['assigned_salesperson', 'updated_at', 'id'], name='client_salesperson_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ),
+    ]
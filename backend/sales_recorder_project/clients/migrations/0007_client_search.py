@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Client search index (clients/search.py). SQLite: an FTS5 trigram table without content of its own,
+# kept up to date by triggers; the phone column holds the number without punctuation.
+# PostgreSQL: pg_trgm GIN indexes on the same three columns.
+
+SQLITE_PHONE = (
+    "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(COALESCE({0}.phone_number, ''), "
+    "' ', ''), '-', ''), '+', ''), '(', ''), ')', ''), '.', ''), '/', '')"
+)
+SQLITE_VALUES = "{0}.id, COALESCE({0}.name, ''), COALESCE({0}.contact_person, ''), " + SQLITE_PHONE
+# A contentless table forgets a row through the 'delete' command, given the values it indexed
+SQLITE_DELETE = (
+    "INSERT INTO clients_client_search(clients_client_search, rowid, name, contact_person, phone) "
+    "VALUES ('delete', {})".format(SQLITE_VALUES.format('old'))
+)
+
+SQLITE_FORWARDS = [
+    "CREATE VIRTUAL TABLE clients_client_search USING fts5("
+    "name, contact_person, phone, content='', tokenize='trigram')",
+    "CREATE TRIGGER clients_client_search_insert AFTER INSERT ON clients_client BEGIN "
+    "INSERT INTO clients_client_search(rowid, name, contact_person, phone) VALUES ({}); END".format(
+        SQLITE_VALUES.format('new')
+    ),
+    "CREATE TRIGGER clients_client_search_delete AFTER DELETE ON clients_client BEGIN "
+    "{}; END".format(SQLITE_DELETE),
+    "CREATE TRIGGER clients_client_search_update AFTER UPDATE OF name, contact_person, phone_number "
+    "ON clients_client BEGIN "
+    "{}; "
+    "INSERT INTO clients_client_search(rowid, name, contact_person, phone) VALUES ({}); END".format(
+        SQLITE_DELETE, SQLITE_VALUES.format('new')
+    ),
+    "INSERT INTO clients_client_search(rowid, name, contact_person, phone) "
+    "SELECT {} FROM clients_client AS client".format(SQLITE_VALUES.format('client')),
+]
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS clients_client_search_insert",
+    "DROP TRIGGER IF EXISTS clients_client_search_delete",
+    "DROP TRIGGER IF EXISTS clients_client_search_update",
+    "DROP TABLE IF EXISTS clients_client_search",
+]
+
+POSTGRES_FORWARDS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS client_name_trgm_idx ON clients_client USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS client_contact_trgm_idx ON clients_client USING gin (contact_person gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS client_phone_trgm_idx ON clients_client "
+    "USING gin ((regexp_replace(phone_number, '\\D', '', 'g')) gin_trgm_ops)",
+]
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS client_name_trgm_idx",
+    "DROP INDEX IF EXISTS client_contact_trgm_idx",
+    "DROP INDEX IF EXISTS client_phone_trgm_idx",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARDS, 'postgresql': POSTGRES_FORWARDS}),
+            run({'sqlite': SQLITE_BACKWARDS, 'postgresql': POSTGRES_BACKWARDS}),
+        ),
+    ]
@@ -51,8 +51,25 @@ class Client(models.Model):
         related_name='requested_clients'
     )
 
+    # Sum of order totals minus sum of payments, kept current by the order and payment
+    # write paths (sales/balances.py) and reconciled with `manage.py reconcile_client_balances`
+    outstanding_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Composite indexes follow the (filter, sort) pairs used by ClientViewSet
+        indexes = [
+            models.Index(fields=['assigned_salesperson', 'name', 'id'], name='client_salesperson_name_idx'),
+            models.Index(fields=['requested_by_salesperson', 'status'], name='client_requester_status_idx'),
+            models.Index(fields=['status', 'name', 'id'], name='client_status_name_idx'),
+            models.Index(fields=['name', 'id'], name='client_name_idx'),
+            models.Index(fields=['outstanding_balance', 'id'], name='client_balance_idx'),
+            models.Index(fields=['assigned_salesperson', 'outstanding_balance', 'id'], name='client_salesperson_balance_idx'),
+            models.Index(fields=['assigned_salesperson', 'updated_at', 'id'], name='client_salesperson_updated_idx'),
+            models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
@@ -0,0 +1,175 @@
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+
+# Index created by migration 0007_client_search: an FTS5 trigram table on SQLite, filled by triggers
+# (its phone column holds the number without punctuation), and pg_trgm GIN indexes on PostgreSQL
+SQLITE_SEARCH_TABLE = 'clients_client_search'
+# Queries are cut to this length: long input only adds trigrams, never precision
+MAX_QUERY_LENGTH = 64
+# normalize_phone() in PostgreSQL; the trigram index on the phone number is built on this expression
+POSTGRES_PHONE_SQL = r"regexp_replace(phone_number, '\D', '', 'g')"
+
+
+def normalize_phone(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def words(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def trigrams(text):
+    """
+    Trigrams of each word, padded like pg_trgm (two spaces before, one after) so word starts weigh more.
+    """
+    grams = set()
+    for word in words(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query, text):
+    """
+    Share of the query's trigrams found in `text` (pg_trgm's word_similarity, roughly).
+    A prefix match counts as a full match, so typing a name's first letters ranks it first.
+    """
+    if not text:
+        return 0.0
+    if text.lower().startswith(query.lower()):
+        return 1.0
+    wanted = trigrams(query)
+    return len(wanted & trigrams(text)) / len(wanted) if wanted else 0.0
+
+
+def phone_similarity(digits, phone):
+    phone = normalize_phone(phone)
+    if not digits or not phone:
+        return 0.0
+    if phone.startswith(digits):
+        return 1.0
+    if digits in phone:
+        return 0.9 # Typically the last digits of the number
+    return similarity(digits, phone)
+
+
+def score(query, digits, client):
+    return max(
+        similarity(query, client['name']),
+        similarity(query, client['contact_person']),
+        phone_similarity(digits, client['phone_number']),
+    )
+
+
+def phrase(text):
+    return '"%s"' % text.replace('"', '""')
+
+
+def fts_queries(query, digits):
+    """
+    FTS5 queries for the query, strictest first. The trigram tokenizer matches a quoted string
+    anywhere in a column, so the first finds rows containing every word of the query; the next
+    rows sharing a trigram with every word (a typo in each), then with any word (a word mangled
+    beyond that). Each also finds the digits anywhere in the phone number.
+    """
+    terms = [word for word in words(query) if len(word) >= 3]
+    number = f' OR phone : {phrase(digits)}' if len(digits) >= 3 else ''
+    if not terms:
+        return [number[len(' OR '):]] if number else []
+    fuzzy = ['(%s)' % ' OR '.join(phrase(word[i:i + 3]) for i in range(len(word) - 2)) for word in terms]
+    queries = [' AND '.join(phrase(word) for word in terms)]
+    if any(len(word) > 3 for word in terms):
+        queries.append(' AND '.join(fuzzy))
+    if len(terms) > 1:
+        queries.append(' OR '.join(fuzzy))
+    return [f'({match}){number}' for match in queries]
+
+
+def scope_sql(queryset, column):
+    """
+    ` AND column IN (<the queryset's ids>)` with its params, or nothing for an unfiltered queryset.
+    """
+    if not queryset.query.where:
+        return '', []
+    sql, params = queryset.order_by().values('pk').query.get_compiler(queryset.db).as_sql()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+def candidate_ids(queryset, query, digits, limit):
+    """
+    Ids of the best `limit` rows of `queryset` for the query, found through the search index.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        queries = fts_queries(query, digits)
+        if not queries:
+            return None
+        # `+rowid`: FTS5 given a rowid constraint would run the MATCH once per scoped row
+        scope, scope_params = scope_sql(queryset, '+rowid')
+        # bm25 is computed for every row ranked: only the first CLIENT_SEARCH_SCAN matches are, so a
+        # query matching much of the table (a common word, a loose typo) stays within budget
+        sql = (
+            f'SELECT rowid FROM (SELECT rowid, rank FROM {SQLITE_SEARCH_TABLE} '
+            f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s{scope} LIMIT %s) ORDER BY rank LIMIT %s'
+        )
+        scan = getattr(settings, 'CLIENT_SEARCH_SCAN', 5000)
+        ids = []
+        with connection.cursor() as cursor:
+            for match in queries:
+                cursor.execute(sql, [match, *scope_params, scan, limit])
+                ids.extend(row[0] for row in cursor.fetchall() if row[0] not in ids)
+                if len(ids) >= limit:
+                    break
+        return ids[:limit]
+    elif connection.vendor == 'postgresql':
+        # `<%` is word similarity above pg_trgm.word_similarity_threshold, served by the GIN indexes
+        fields = [('name', query), ('contact_person', query)] if len(query) >= 3 else []
+        if len(digits) >= 3:
+            fields.append((POSTGRES_PHONE_SQL, digits))
+        if not fields:
+            return None
+        scope, scope_params = scope_sql(queryset, 'id')
+        sql = (
+            f"SELECT id FROM {queryset.model._meta.db_table} "
+            f"WHERE ({' OR '.join(f'%s <%% {field}' for field, _ in fields)}){scope} "
+            f"ORDER BY GREATEST({', '.join(f'word_similarity(%s, {field})' for field, _ in fields)}) DESC NULLS LAST "
+            f"LIMIT %s"
+        )
+        params = [value for _, value in fields] + scope_params + [value for _, value in fields] + [limit]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_clients(queryset, query, limit=10):
+    """
+    The `limit` clients of `queryset` best matching `query` on name, contact person or phone
+    number, best first, as dicts with their `score` (0 to 1).
+
+    The index picks CLIENT_SEARCH_CANDIDATES candidates (restricted to the queryset, so role
+    scoping and filters apply before ranking), which are then ranked by trigram similarity.
+    Queries too short for trigrams, and databases without a search index, fall back to prefix
+    matching.
+    """
+    query = ' '.join(query.split())[:MAX_QUERY_LENGTH]
+    # Only a query without letters is a phone number: the digits of 'Kiosk 12' are not
+    digits = '' if re.search(r'[^\W\d_]', query) else normalize_phone(query)
+    if not query:
+        return []
+    columns = ('id', 'name', 'contact_person', 'phone_number', 'status', 'outstanding_balance')
+    ids = candidate_ids(queryset, query, digits, max(limit, getattr(settings, 'CLIENT_SEARCH_CANDIDATES', 100)))
+    if ids is None:
+        prefix = Q(name__istartswith=query) | Q(contact_person__istartswith=query)
+        if digits:
+            prefix |= Q(phone_number__startswith=digits)
+        candidates = queryset.filter(prefix).order_by('name', 'id')[:limit].values(*columns)
+    else:
+        candidates = queryset.filter(pk__in=ids).order_by().values(*columns)
+
+    results = [{**client, 'score': round(score(query, digits, client), 3)} for client in candidates]
+    results.sort(key=lambda client: (-client['score'], client['name'] or '', client['id']))
+    return results[:limit]
@@ -7,7 +7,7 @@ from users.models import UserProfile
 class ClientSerializer(serializers.ModelSerializer):
     """
     Serializer for the Client model.
-    Includes nested salesperson data and calculated outstanding balance.
+    Includes nested salesperson data and the stored outstanding balance.
     """
     # Read-only nested serializer for the assigned salesperson's profile
     assigned_salesperson = UserProfileSerializer(read_only=True)
@@ -23,8 +23,8 @@ class ClientSerializer(serializers.ModelSerializer):
     # This will be set by the ViewSet's perform_create method for salespersons
     requested_by_salesperson = UserProfileSerializer(read_only=True) 
 
-    # Outstanding balance is read-only and calculated (or placeholder for now)
-    outstanding_balance = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    # Outstanding balance is read-only; it is stored on the client and kept current by orders and payments
+    outstanding_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Client
@@ -42,17 +42,6 @@ class ClientSerializer(serializers.ModelSerializer):
             'requested_by_salesperson' # Set by viewset, read-only for incoming serializer data
         ]
 
-    def to_representation(self, instance):
-        """
-        Add outstanding_balance to the representation.
-        This is a simplified calculation; a more robust solution would involve
-        aggregating payments and orders.
-        """
-        representation = super().to_representation(instance)
-        # Placeholder for outstanding balance calculation.
-        representation['outstanding_balance'] = '0.00'
-        return representation
-
     def create(self, validated_data):
         request = self.context.get('request')
         user_profile = request.user.profile
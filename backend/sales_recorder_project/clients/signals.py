@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from core.changefeed import record_tombstones
+from .models import Client
+
+
+def visible_to(assigned_salesperson_id, requested_by_salesperson_id, status, is_new_client):
+    """
+    Salespersons who see a client in their list (mirrors ClientViewSet.get_role_queryset).
+    """
+    salespersons = {assigned_salesperson_id}
+    if assigned_salesperson_id is None and is_new_client and status == 'pending_approval':
+        salespersons.add(requested_by_salesperson_id)
+    return salespersons - {None}
+
+
+@receiver(pre_save, sender=Client)
+def record_client_leaving_scope(sender, instance, raw=False, **kwargs):
+    """
+    A client reassigned, approved or rejected away from a salesperson drops out of their list;
+    their change feed reports that as a deletion.
+    """
+    if raw or instance.pk is None:
+        return
+    old = Client.objects.filter(pk=instance.pk).values_list(
+        'assigned_salesperson_id', 'requested_by_salesperson_id', 'status', 'is_new_client'
+    ).first()
+    if old is None:
+        return
+    left = visible_to(*old) - visible_to(
+        instance.assigned_salesperson_id, instance.requested_by_salesperson_id, instance.status, instance.is_new_client
+    )
+    if left:
+        record_tombstones(instance, left)
+
+
+@receiver(post_delete, sender=Client)
+def record_client_tombstone(sender, instance, **kwargs):
+    record_tombstones(instance, visible_to(
+        instance.assigned_salesperson_id, instance.requested_by_salesperson_id, instance.status, instance.is_new_client
+    ))
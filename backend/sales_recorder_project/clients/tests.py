@@ -1,3 +1,102 @@
+from decimal import Decimal
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+from core.models import Flavor
+from users.models import User, UserProfile
+from .models import Client
 
-# Create your tests here.
+
+class ClientTestCase(TestCase):
+    """
+    Shared fixtures: an admin and a salesperson with an approved client.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        admin_user = User.objects.create_user(username='admin', password='adminpassword')
+        cls.admin = UserProfile.objects.create(user=admin_user, role='admin')
+        sales_user = User.objects.create_user(username='john_doe', password='sales1password')
+        cls.salesperson = UserProfile.objects.create(user=sales_user, role='salesperson')
+        cls.client_obj = Client.objects.create(name='Corner Shop', status='approved', assigned_salesperson=cls.salesperson)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.salesperson.user)
+
+
+class ClientSearchTests(ClientTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other_user = User.objects.create_user(username='jane_doe', password='sales2password')
+        cls.other_salesperson = UserProfile.objects.create(user=other_user, role='salesperson')
+        cls.kiosk = Client.objects.create(
+            name='Mama Njeri Kiosk', contact_person='Wanjiku Kamau', phone_number='+254 (712) 345-678',
+            status='approved', assigned_salesperson=cls.salesperson,
+        )
+        cls.supermarket = Client.objects.create(
+            name='Cornerstone Supermarket', status='approved', assigned_salesperson=cls.other_salesperson,
+        )
+
+    def search(self, q, api=None, **params):
+        response = (api or self.api).get('/api/v1/clients/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [client['id'] for client in response.data['results']]
+
+    def test_matches_prefixes_typos_and_phone_digits(self):
+        self.assertEqual(self.search('Corner Sh'), [self.client_obj.id])
+        self.assertEqual(self.search('co'), [self.client_obj.id]) # Too short for trigrams: prefix match
+        self.assertEqual(self.search('conrer shop')[:1], [self.client_obj.id])
+        self.assertEqual(self.search('wanjku')[:1], [self.kiosk.id])
+        self.assertEqual(self.search('0712 345 678')[:1], [self.kiosk.id])
+        self.assertEqual(self.search('345678'), [self.kiosk.id])
+        response = self.api.get('/api/v1/clients/search/', {'q': 'kiosk'})
+        self.assertEqual(response.data['results'][0]['outstanding_balance'], '0.00')
+
+    def test_results_are_scoped_to_the_user(self):
+        admin = APIClient()
+        admin.force_authenticate(self.admin.user)
+        self.assertEqual(self.search('corner'), [self.client_obj.id])
+        self.assertEqual(sorted(self.search('corner', admin)), sorted([self.client_obj.id, self.supermarket.id]))
+        self.assertEqual(self.search('corner', admin, limit=1), [self.client_obj.id])
+        self.assertEqual(self.search('corner', admin, salesperson_id=self.other_salesperson.id), [self.supermarket.id])
+
+    def test_index_follows_renames_and_deletes(self):
+        self.kiosk.name = 'Baraka Stores'
+        self.kiosk.save()
+        self.assertEqual(self.search('baraka'), [self.kiosk.id])
+        self.assertEqual(self.search('njeri'), [])
+        self.kiosk.delete()
+        self.assertEqual(self.search('baraka'), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM clients_client_search")
+            self.assertEqual(cursor.fetchone()[0], Client.objects.count())
+
+
+class ClientBalanceListTests(ClientTestCase):
+
+    def test_clients_can_be_sorted_and_filtered_by_balance(self):
+        other = Client.objects.create(name='Another Shop', status='approved', assigned_salesperson=self.salesperson)
+        mango = Flavor.objects.create(name='Mango', base_price_per_liter=Decimal('120.00'))
+        response = self.api.post('/api/v1/orders/', {
+            'client_id': self.client_obj.id, 'order_items': [{'flavor_id': mango.id, 'quantity_liters': '1.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.api.get('/api/v1/clients/', {'ordering': '-outstanding_balance'})
+        self.assertEqual([c['id'] for c in response.data['results']], [self.client_obj.id, other.id])
+        response = self.api.get('/api/v1/clients/', {'min_balance': '0.01'})
+        self.assertEqual([c['id'] for c in response.data['results']], [self.client_obj.id])
+
+    def test_balance_filters_reject_non_numbers(self):
+        for value in ('abc', 'NaN', 'Infinity', 'sNaN'):
+            response = self.api.get('/api/v1/clients/', {'min_balance': value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertEqual(self.api.get('/api/v1/clients/', {'max_balance': value}).status_code, 400, value)
+
+    def test_large_balances_are_rendered(self):
+        Client.objects.filter(pk=self.client_obj.pk).update(outstanding_balance=Decimal('1234567890.50'))
+        response = self.api.get(f'/api/v1/clients/{self.client_obj.id}/')
+        self.assertEqual(response.data['outstanding_balance'], '1234567890.50')
+        response = self.api.get('/api/v1/clients/')
+        self.assertEqual(response.data['results'][0]['outstanding_balance'], '1234567890.50')
@@ -1,15 +1,27 @@
+import datetime
+from decimal import Decimal, InvalidOperation
 from rest_framework import viewsets, mixins, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.db.models import Sum # For future outstanding balance calculation
 from django.db.models import Q # For complex queryset filters
+from django.utils import timezone
 from .models import Client
 from .serializers import ClientSerializer
 from users.permissions import IsAdminUser, IsSalesperson, IsOwnerOfClient 
 from users.models import UserProfile 
 from rest_framework import permissions 
+from core.changefeed import ChangeFeedMixin
+from core.conditional import ConditionalGetMixin
+from core.fastread import FastReadMixin
+from core.fieldsets import SparseFieldsMixin
+from core.pagination import KeysetPagination
+from core.replicas import ReplicaReadMixin
+from sales.archive import client_history
+from .search import search_clients
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ChangeFeedMixin, ConditionalGetMixin, FastReadMixin, SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows clients to be viewed or edited.
     Salespersons can manage their assigned clients and request new ones.
@@ -18,10 +30,43 @@ class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOfClient] # Apply custom permission
+    pagination_class = KeysetPagination
+    replica_actions = ('list', 'retrieve', 'history', 'search')
+    etag_related_fields = ('assigned_salesperson__updated_at', 'requested_by_salesperson__updated_at')
+    # ?ordering= choices and the keyset each one paginates on
+    ORDERING_KEYSETS = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+        'outstanding_balance': ('outstanding_balance', 'id'),
+        '-outstanding_balance': ('-outstanding_balance', '-id'),
+    }
+
+    def get_keyset_ordering(self):
+        return self.ORDERING_KEYSETS.get(self.request.query_params.get('ordering'), self.ORDERING_KEYSETS['name'])
 
     def get_queryset(self):
         """
-        Filter clients based on user role.
+        Filter clients based on user role, then by outstanding balance if requested.
+        """
+        queryset = self.get_role_queryset()
+
+        # Balance filters are available to every role, e.g. ?min_balance=0.01 for clients who owe money
+        for param, lookup in (('min_balance', 'outstanding_balance__gte'), ('max_balance', 'outstanding_balance__lte')):
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                value = Decimal(value)
+            except InvalidOperation:
+                value = None
+            # NaN and Infinity parse as Decimals but cannot be compared with a column
+            if value is None or not value.is_finite():
+                raise ValidationError({"detail": "Balance filters must be numbers."})
+            queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    def get_role_queryset(self):
+        """
         Salespersons only see their assigned clients or clients they requested.
         Admins see all clients.
         """
@@ -109,3 +154,40 @@ class ClientViewSet(viewsets.ModelViewSet):
         client.save()
         serializer = self.get_serializer(client)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        The client's orders and payments, newest first, archived ones included.
+        Optional ?start_date= and ?end_date= (YYYY-MM-DD, inclusive) limit the period;
+        only a period reaching back into the archive reads it.
+        """
+        client = self.get_object()
+        bounds = {}
+        for param in ('start_date', 'end_date'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValidationError({"detail": "Invalid date format. Use YYYY-MM-DD."})
+                if param == 'end_date':
+                    day += datetime.timedelta(days=1)
+                bounds[param] = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        return Response(client_history(client, request.user, bounds.get('start_date'), bounds.get('end_date')))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Type-ahead client search: ?q= is matched against name, contact person and phone number,
+        tolerating typos and punctuation. Returns the best ?limit= matches (default 10, at most 50)
+        among the clients this user can see, best first.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            raise ValidationError({"detail": "limit must be a number."})
+        results = search_clients(self.get_queryset(), request.query_params.get('q', ''), limit)
+        for client in results:
+            client['outstanding_balance'] = str(client['outstanding_balance']) # As ClientSerializer shows it
+        return Response({'results': results})
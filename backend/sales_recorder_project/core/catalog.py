@@ -0,0 +1,42 @@
+import threading
+import time
+from django.conf import settings
+from .models import Flavor
+
+# Process-local flavor catalog: {flavor id: Flavor}.
+# Loaded on first use and dropped by the Flavor post_save/post_delete handlers (core/signals.py).
+# Other worker processes do not see those signals, so entries also expire after FLAVOR_CATALOG_TTL seconds.
+_catalog = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_flavor_catalog():
+    """
+    Returns the cached {id: Flavor} map, loading it with a single query when it is empty or expired.
+    """
+    global _catalog, _loaded_at
+    ttl = getattr(settings, 'FLAVOR_CATALOG_TTL', 300)
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _loaded_at < ttl:
+        return catalog
+    with _lock:
+        if _catalog is None or time.monotonic() - _loaded_at >= ttl:
+            _catalog = Flavor.objects.in_bulk()
+            _loaded_at = time.monotonic()
+        return _catalog
+
+
+def catalog_last_modified(flavors=None):
+    """
+    The newest updated_at among `flavors` (default: the whole catalog), or None if there are none.
+    """
+    if flavors is None:
+        flavors = get_flavor_catalog().values()
+    return max((flavor.updated_at for flavor in flavors), default=None)
+
+
+def invalidate_flavor_catalog():
+    global _catalog
+    with _lock:
+        _catalog = None
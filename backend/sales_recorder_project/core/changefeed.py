@@ -0,0 +1,117 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .models import Tombstone
+from .pagination import KeysetPagination
+
+
+def record_tombstones(instance, salesperson_ids):
+    """
+    Records that `instance` is gone for each of the given salespersons (None entries are skipped).
+    One row per salesperson keeps the feed query a plain indexed lookup.
+    """
+    bulk_record_tombstones(type(instance), {instance.pk: salesperson_ids})
+
+
+def bulk_record_tombstones(model, owners):
+    """
+    record_tombstones() for many rows of `model` at once: `owners` maps their ids to salesperson ids.
+    """
+    label = model._meta.label_lower
+    Tombstone.objects.bulk_create([
+        Tombstone(model=label, object_id=object_id, salesperson_id=salesperson_id)
+        for object_id, salesperson_ids in owners.items()
+        for salesperson_id in ({owner for owner in salesperson_ids if owner is not None} or [None])
+    ], batch_size=500)
+
+
+class ChangeFeedPagination(KeysetPagination):
+    """
+    Keyset pages in change order, oldest change first, so a row updated while the client
+    is paging moves behind the cursor instead of being skipped.
+    """
+
+    def get_ordering(self, view):
+        return ('updated_at', 'id')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+            'deleted': self.deleted,
+            'watermark': self.watermark,
+            'reset': self.reset,
+        })
+
+
+class ChangeFeedMixin:
+    """
+    ?updated_since=<ISO 8601 timestamp> turns list into a change feed: only rows whose
+    updated_at is after the timestamp (through the usual role scoping and filters), plus
+    the ids deleted since then in `deleted`, and the `watermark` to send next time.
+
+    Deletions are reported on the last page, so a client follows `next` to the end and then
+    stores the watermark. The watermark trails the server clock by CHANGE_FEED_OVERLAP seconds,
+    so a write that commits late is picked up by the next sync; clients upsert by id, so rows
+    seen twice are harmless.
+
+    A timestamp older than CHANGE_FEED_RETENTION_DAYS (e.g. the epoch, for a first sync) returns
+    every row with `reset: true`: tombstones that old may have been pruned, so the client replaces
+    its copy with the rows from these pages instead of merging.
+    """
+    change_feed_query_param = 'updated_since'
+
+    def get_updated_since(self):
+        value = self.request.query_params.get(self.change_feed_query_param)
+        if value is None:
+            return None
+        since = parse_datetime(value.replace(' ', '+')) # An unencoded '+' in the offset arrives as a space
+        if since is None:
+            raise ValidationError({"detail": "updated_since must be an ISO 8601 timestamp."})
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def can_read_from_replica(self, request):
+        # The watermark promises every row committed before it was sent; a lagging replica could not keep that
+        if self.change_feed_query_param in request.query_params:
+            return False
+        return getattr(super(), 'can_read_from_replica', lambda request: True)(request)
+
+    def list(self, request, *args, **kwargs):
+        since = self.get_updated_since()
+        if since is None:
+            return super().list(request, *args, **kwargs)
+        now = timezone.now()
+        queryset = self.filter_queryset(self.get_queryset()).filter(updated_at__gt=since)
+        paginator = ChangeFeedPagination()
+        # Tombstones that old may have been pruned: send everything and let the client start over
+        paginator.reset = since < now - timedelta(days=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 90))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        if paginator.has_next:
+            # The sync is only complete on the last page; until then the client's timestamp still stands
+            watermark, paginator.deleted = since, []
+        else:
+            overlap = timedelta(seconds=getattr(settings, 'CHANGE_FEED_OVERLAP', 5))
+            watermark = max(now - overlap, since)
+            paginator.deleted = [] if paginator.reset else self.get_deleted_ids(since)
+        paginator.watermark = serializers.DateTimeField().to_representation(watermark)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def get_deleted_ids(self, since):
+        """
+        Ids of rows deleted since `since` that the requesting user could see.
+        """
+        tombstones = Tombstone.objects.filter(model=self.queryset.model._meta.label_lower, deleted_at__gt=since)
+        user = self.request.user
+        if not hasattr(user, 'profile'):
+            return []
+        if user.profile.role == 'salesperson':
+            tombstones = tombstones.filter(salesperson=user.profile)
+        elif user.profile.role != 'admin':
+            return []
+        return sorted(set(tombstones.values_list('object_id', flat=True)))
@@ -0,0 +1,104 @@
+import hashlib
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_validators(request, *parts):
+    """
+    Turns the values a response depends on into (etag, last_modified).
+    The ETag also covers the user, the full URL (filters, page, fields) and the negotiated format;
+    Last-Modified is the newest datetime among `parts`.
+    """
+    accepted = getattr(request, 'accepted_media_type', '')
+    key = repr((request.user.pk, request.get_full_path(), accepted) + parts)
+    etag = 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+    timestamps = [part.timestamp() for part in parts if hasattr(part, 'timestamp')]
+    return etag, (int(max(timestamps)) if timestamps else None)
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Returns a 304 response if the request's If-None-Match / If-Modified-Since still match, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified, revalidate=True):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if revalidate:
+        # Browsers may keep the response but must check with us before reusing it
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and retrieve.
+
+    A list is validated with one aggregate over the filtered queryset, COUNT plus MAX(updated_at)
+    (and MAX of each `etag_related_fields` lookup), so an unchanged list answers 304 Not Modified
+    without fetching or serializing any row. A detail response is validated with the row's updated_at.
+
+    `etag_related_fields` names forward foreign keys' updated_at columns, e.g. 'client__updated_at',
+    for nested objects the representation includes; `get_etag_subqueries()` adds single values read
+    from other tables (in the list's aggregate, so still one query) and `get_etag_extra()` anything else.
+    """
+    etag_related_fields = ()
+
+    def get_etag_subqueries(self):
+        """
+        {name: flat values_list queryset} whose first value goes into the ETag, e.g. the newest
+        updated_at of a table the representation nests through a reverse relation.
+        """
+        return {}
+
+    def get_etag_extra(self):
+        return ()
+
+    def get_required_columns(self):
+        # Keep updated_at loaded when ?fields= trims the queryset (core/fieldsets.py)
+        return [*getattr(super(), 'get_required_columns', list)(), 'updated_at']
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregates = {'count': Count('pk'), 'updated_at': Max('updated_at')}
+        for i, lookup in enumerate(self.etag_related_fields):
+            aggregates[f'related_{i}'] = Max(lookup)
+        for name, subquery in self.get_etag_subqueries().items():
+            aggregates[f'subquery_{name}'] = Max(Subquery(subquery[:1]))
+        values = queryset.order_by().aggregate(**aggregates)
+        etag, last_modified = make_validators(request, *values.values(), *self.get_etag_extra())
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        parts = [instance.updated_at]
+        for lookup in self.etag_related_fields:
+            value = instance
+            for attr in lookup.split('__'):
+                value = getattr(value, attr, None)
+            parts.append(value)
+        for subquery in self.get_etag_subqueries().values():
+            parts.append(next(iter(subquery[:1]), None))
+        etag, last_modified = make_validators(request, *parts, *self.get_etag_extra())
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(Response(self.get_serializer(instance).data), etag, last_modified)
@@ -0,0 +1,201 @@
+import datetime
+import decimal
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, fields as drf_fields, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+
+SKIP = object()
+
+
+def compile_serializer(serializer):
+    """
+    Compiles a serializer instance (after any ?fields= shaping) into a function that turns an
+    object into the same dict serializer.to_representation would, without walking field objects
+    per row. Fields read straight from a model column get a direct getter and a specialised
+    formatter; anything else (method fields, dotted sources, collapsed relations, custom
+    to_representation) runs the field's own DRF code, so the output is identical either way.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        if type(serializer).to_representation is not serializers.ListSerializer.to_representation:
+            return serializer.to_representation
+        child = compile_serializer(serializer.child)
+        return lambda data: [child(item) for item in iterable(data)]
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return serializer.to_representation
+
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    getters = tuple(
+        (name, compile_field(field, model))
+        for name, field in serializer.fields.items() if not field.write_only
+    )
+
+    def represent(instance):
+        ret = {}
+        for name, getter in getters:
+            value = getter(instance)
+            if value is not SKIP:
+                ret[name] = value
+        return ret
+    return represent
+
+
+def iterable(data):
+    # What ListSerializer.to_representation iterates
+    return data.all() if isinstance(data, models.manager.BaseManager) else data
+
+
+def compile_field(field, model):
+    model_field = column(model, field)
+    if model_field is None:
+        return drf_getter(field)
+    attr = field.source_attrs[0]
+
+    if is_nested(field):
+        represent = compile_serializer(field)
+
+        def get_nested(instance):
+            try:
+                value = getattr(instance, attr)
+            except ObjectDoesNotExist:
+                return None
+            return None if value is None else represent(value)
+        return get_nested
+
+    to_representation = compile_formatter(field)
+
+    def get(instance):
+        value = getattr(instance, attr)
+        return None if value is None else to_representation(value)
+    return get
+
+
+def is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def column(model, field):
+    """
+    The model field a serializer field reads directly (a column or a forward relation), or None.
+    """
+    if model is None or len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if isinstance(field, serializers.ListSerializer):
+        # Reverse and many-to-many relations: the related manager is iterated like DRF does
+        return model_field if model_field.is_relation and (model_field.one_to_many or model_field.many_to_many) else None
+    if not model_field.concrete or model_field.many_to_many:
+        return None
+    # Related fields (e.g. a collapsed PrimaryKeyRelatedField) keep DRF's pk-only lookup
+    if model_field.is_relation and not is_nested(field):
+        return None
+    return model_field
+
+
+def compile_formatter(field):
+    """
+    field.to_representation for a non-None value, specialised for the common exact field classes.
+    """
+    field_class = type(field)
+    if field_class in (drf_fields.CharField, drf_fields.EmailField):
+        return str
+    if field_class is drf_fields.IntegerField:
+        return int
+    if field_class is drf_fields.DecimalField:
+        return compile_decimal(field)
+    if field_class is drf_fields.DateTimeField:
+        return compile_datetime(field)
+    return field.to_representation
+
+
+def compile_decimal(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    # DecimalField.quantize builds this context and exponent on every call
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def to_representation(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return to_representation
+
+
+def compile_datetime(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    # DateTimeField.enforce_timezone looks the current timezone up on every call
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if type(value) is not datetime.datetime or value.utcoffset() is None:
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value) # Raises DRF's own error
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return to_representation
+
+
+def drf_getter(field):
+    """
+    The per-field step of Serializer.to_representation, unchanged.
+    """
+    def get(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+    return get
+
+
+class FastReadMixin:
+    """
+    Viewset mixin that serializes list pages with compile_serializer() instead of DRF's
+    per-field machinery. The serializer is still built (and shaped by ?fields=) as usual;
+    only its .data is produced by the compiled function. FAST_READ_SERIALIZERS = False turns it off.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if (
+            getattr(self, 'action', None) == 'list' and kwargs.get('many') and args
+            and getattr(settings, 'FAST_READ_SERIALIZERS', True)
+        ):
+            return CompiledListSerializer(serializer)
+        return serializer
+
+
+class CompiledListSerializer:
+    """
+    Stands in for a read-only ListSerializer: .data is built by the compiled representation.
+    """
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    @property
+    def data(self):
+        represent = compile_serializer(self.serializer)
+        return ReturnList(represent(self.serializer.instance), serializer=self.serializer)
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
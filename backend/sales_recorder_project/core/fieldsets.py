@@ -0,0 +1,194 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_tree(value):
+    """
+    Parses "id,client.name,order_items.flavor.name" into
+    {'id': {}, 'client': {'name': {}}, 'order_items': {'flavor': {'name': {}}}}.
+    """
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def collapse(field):
+    """
+    Replaces a nested serializer with the primary key(s) of the related object(s).
+    """
+    kwargs = {'read_only': True}
+    if field.source != field.field_name:
+        kwargs['source'] = field.source
+    return serializers.PrimaryKeyRelatedField(many=isinstance(field, serializers.ListSerializer), **kwargs)
+
+
+def expanded(field, serializer_class):
+    """
+    Builds the richer serializer that replaces `field` when it is expanded.
+    """
+    kwargs = {'read_only': True, 'many': isinstance(field, serializers.ListSerializer)}
+    if field.source != field.field_name:
+        kwargs['source'] = field.source
+    return serializer_class(**kwargs)
+
+
+def shape_serializer(serializer, fields=None, expand=None, path=''):
+    """
+    Trims a serializer instance in place to the requested shape.
+
+    `fields` is a field tree (None keeps every field); `expand` is a tree of relations to render
+    nested. A nested relation is expanded when it is listed in `expand`, when sub-fields are asked
+    for (`client.name`), or when no `fields` are given (the serializer's own nesting is kept).
+    Other relations are rendered as primary keys.
+
+    A serializer may also declare `expanded_fields = {name: SerializerClass}`: a richer
+    representation that replaces its default nested one when the relation is expanded explicitly.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    expand = expand or {}
+    readable = {name: field for name, field in serializer.fields.items() if not field.write_only}
+
+    if fields is not None:
+        unknown = [path + name for name in fields if name not in readable]
+        if unknown:
+            raise ValidationError({"detail": f"Unknown field(s): {', '.join(unknown)}."})
+        for name in readable:
+            if name not in fields:
+                serializer.fields.pop(name)
+
+    expanded_fields = getattr(serializer, 'expanded_fields', {})
+    for name, field in list(serializer.fields.items()):
+        if field.write_only or not is_nested(field):
+            continue
+        subfields = fields.get(name) if fields is not None else None
+        if name in expand or subfields:
+            if name in expanded_fields:
+                field = expanded(field, expanded_fields[name])
+                serializer.fields[name] = field
+            shape_serializer(field, subfields or None, expand.get(name), f'{path}{name}.')
+        elif fields is None:
+            if expand.get(name):
+                shape_serializer(field, None, expand[name], f'{path}{name}.')
+        else:
+            serializer.fields[name] = collapse(field)
+    return serializer
+
+
+def loading_plan(serializer, model, prefix=''):
+    """
+    Works out what a (shaped) serializer reads from `model`: returns (only, select_related, prefetch)
+    with lookups prefixed by `prefix`. Relations it does not render are not loaded.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    only = {prefix + model._meta.pk.name}
+    select, prefetch = [], []
+    # Foreign keys are cheap and keep permission checks and links from hitting deferred columns
+    if not prefix:
+        only.update(field.name for field in model._meta.concrete_fields if field.is_relation)
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        source = field.source
+        try:
+            model_field = None if source == '*' or '.' in source else model._meta.get_field(source)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None:
+            # A property, method or dotted source: we can't tell what it reads, so load every column
+            only.update(prefix + f.name for f in model._meta.concrete_fields)
+            continue
+
+        lookup = prefix + source
+        related_model = model_field.related_model
+        many = model_field.one_to_many or model_field.many_to_many
+        if many:
+            child = field.child_relation if isinstance(field, serializers.ManyRelatedField) else field
+            queryset = related_model._default_manager.all()
+            if is_nested(child):
+                queryset = shape_queryset(queryset, child)
+            else:
+                queryset = queryset.only(related_model._meta.pk.name, model_field.field.name)
+            prefetch.append(Prefetch(lookup, queryset=queryset))
+        elif related_model is not None and is_nested(field):
+            select.append(lookup)
+            only.add(lookup)
+            sub_only, sub_select, sub_prefetch = loading_plan(field, related_model, lookup + '__')
+            only |= sub_only
+            select += sub_select
+            prefetch += sub_prefetch
+        elif model_field.concrete:
+            only.add(lookup)
+    return only, select, prefetch
+
+
+def shape_queryset(queryset, serializer, extra_only=()):
+    """
+    Replaces the queryset's eager loading with exactly what the serializer needs.
+    """
+    only, select, prefetch = loading_plan(serializer, queryset.model)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only(*only, *extra_only)
+
+
+class SparseFieldsMixin:
+    """
+    Viewset mixin for ?fields= and ?expand= on read requests, e.g.
+    ?fields=id,order_date,client.name,total_amount,payment_status or ?expand=order.
+    The serializer is trimmed to the requested shape and the queryset loads only what it renders.
+    Without either parameter responses and queries are unchanged.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_requested_shape(self):
+        """
+        Returns (fields, expand) trees, or None when the request does not ask for a shape.
+        """
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        fields = self.request.query_params.get(self.fields_query_param)
+        expand = self.request.query_params.get(self.expand_query_param)
+        if fields is None and expand is None:
+            return None
+        return (parse_field_tree(fields) if fields is not None else None), parse_field_tree(expand or '')
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        shape = self.get_requested_shape()
+        if shape is not None:
+            shape_serializer(serializer, *shape)
+        return serializer
+
+    def get_required_columns(self):
+        """
+        Columns loaded even when the serializer does not render them: by default the ones
+        the paginator orders and pages on.
+        """
+        ordering = getattr(self, 'get_keyset_ordering', lambda: getattr(self, 'keyset_ordering', ()))()
+        return [field.lstrip('-') for field in ordering]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_requested_shape() is None:
+            return queryset
+        return shape_queryset(queryset, self.get_serializer(), self.get_required_columns())
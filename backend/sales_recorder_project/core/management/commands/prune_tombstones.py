@@ -0,0 +1,14 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes change feed tombstones older than CHANGE_FEED_RETENTION_DAYS."
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(days=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 90))
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=horizon).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones older than {horizon:%Y-%m-%d}."))
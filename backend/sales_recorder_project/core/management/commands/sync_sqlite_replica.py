@@ -0,0 +1,38 @@
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from core.replicas import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database into the replica's SQLite file (DJANGO_REPLICA_DB), once "
+        "or every --interval seconds, to run with a read replica locally. The interval stands in for "
+        "replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help="Seconds between copies; 0 copies once.")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if not alias:
+            raise CommandError("No read replica configured; set DJANGO_REPLICA_DB to the replica's file.")
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Both databases must be SQLite; other backends replicate on their own.")
+
+        primary.ensure_connection()
+        while True:
+            started = time.perf_counter()
+            # The backup API copies a consistent snapshot, even while other processes write
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"Copied the primary into {replica.settings_dict['NAME']} in {time.perf_counter() - started:.2f}s.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,105 @@
+import threading
+from collections import defaultdict
+
+# Upper bounds of the histogram buckets, Prometheus style (each bucket counts values <= its bound)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per label set.
+    """
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = defaultdict(lambda: [[0] * len(self.buckets), 0, 0.0]) # bucket counts, count, sum
+
+    def observe(self, label_values, value):
+        counts, count, total = self.series[label_values]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.series[label_values] = [counts, count + 1, total + value]
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, count, total) in sorted(self.series.items()):
+            labels = format_labels(zip(self.labels, label_values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.series = defaultdict(int)
+
+    def inc(self, label_values):
+        self.series[label_values] += 1
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(zip(self.labels, label_values))}}} {value}')
+        return lines
+
+
+def format_labels(pairs):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """
+    Per-view request metrics, aggregated in this process since it started.
+    Each worker process keeps its own, so Prometheus should scrape every process
+    (or sum them) when the app runs under several workers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        labels = ('view', 'method')
+        self.duration = Histogram('http_request_duration_seconds', 'Request latency.', SECONDS_BUCKETS, labels)
+        self.sql_duration = Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request.', SECONDS_BUCKETS, labels)
+        self.serialization_duration = Histogram(
+            'http_request_serialization_duration_seconds',
+            'Time spent building and rendering the response outside SQL.', SECONDS_BUCKETS, labels,
+        )
+        self.queries = Histogram('http_request_queries', 'SQL queries per request.', QUERY_COUNT_BUCKETS, labels)
+        self.responses = Counter('http_responses_total', 'Responses by status code.', labels + ('status',))
+
+    def record(self, view, method, status, duration, sql_duration, serialization_duration, queries):
+        key = (view, method)
+        with self.lock:
+            self.duration.observe(key, duration)
+            self.sql_duration.observe(key, sql_duration)
+            self.serialization_duration.observe(key, serialization_duration)
+            self.queries.observe(key, queries)
+            self.responses.inc(key + (str(status),))
+
+    def exposition(self):
+        """
+        The metrics in the Prometheus text format.
+        """
+        with self.lock:
+            lines = []
+            for metric in (self.duration, self.sql_duration, self.serialization_duration, self.queries, self.responses):
+                lines += metric.exposition()
+        return '\n'.join(lines) + '\n'
+
+
+registry = RequestMetrics()
@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from users.models import UserProfile
 
 class Flavor(models.Model):
     """
@@ -12,3 +14,24 @@ class Flavor(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class Tombstone(models.Model):
+    """
+    Records that a row was deleted, or left a salesperson's view, so delta-sync clients
+    can drop it (see core/changefeed.py). Pruned with `manage.py prune_tombstones`.
+    """
+    model = models.CharField(max_length=100) # Model label, e.g. 'sales.order'
+    object_id = models.BigIntegerField()
+    # The salesperson whose change feed reports it; admins see every tombstone of the model
+    salesperson = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at'], name='tombstone_model_deleted_idx'),
+            models.Index(fields=['model', 'salesperson', 'deleted_at'], name='tombstone_salesperson_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
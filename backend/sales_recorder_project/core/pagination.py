@@ -0,0 +1,146 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite key such as ('-order_date', '-id').
+    Each page is fetched with a "WHERE key after <cursor> ORDER BY key LIMIT n" query,
+    so the cost of a page does not grow with the table and no COUNT(*) is needed.
+
+    The ordering is read from the view's `keyset_ordering` attribute (or `get_keyset_ordering()`).
+    Its last field must be unique; nullable fields sort first ascending and last descending.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+        queryset = queryset.order_by(*[self.order_expression(field) for field in self.ordering])
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        # Fetch one extra row to find out whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = [self.key_value(results[-1], field) for field in self.fields] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, view):
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering())
+        assert getattr(view, 'keyset_ordering', None), (
+            f'{view.__class__.__name__} must define `keyset_ordering` to use KeysetPagination.'
+        )
+        return tuple(view.keyset_ordering)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    @staticmethod
+    def order_expression(field):
+        if field.startswith('-'):
+            return F(field[1:]).desc(nulls_last=True)
+        return F(field).asc(nulls_first=True)
+
+    @staticmethod
+    def key_value(obj, field):
+        value = obj
+        for attr in field.split('__'):
+            value = getattr(value, attr)
+        return value
+
+    def after(self, position):
+        """
+        Builds the filter for rows strictly after `position` in the keyset ordering:
+        (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if value is None:
+                # Nulls come first ascending, so every non-null value is after them; descending they come last
+                beyond = Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+                if descending:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal_so_far & beyond
+            equal_so_far &= same
+        return condition
+
+    def encode_cursor(self, position):
+        values = [value if value is None or isinstance(value, (int, str)) else str(value) for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [
+                None if value is None else self.lookup_field(model, name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def lookup_field(model, name):
+        parts = name.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(parts[-1])
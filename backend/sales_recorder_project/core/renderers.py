@@ -0,0 +1,71 @@
+import io
+import json
+import re
+import orjson
+from rest_framework import parsers, renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer backed by orjson, byte for byte identical to DRF's compact output
+    (floats aside: orjson writes exponents as 1e16 where json writes 1e+16; the API sends none).
+
+    Decimals reach the renderer already formatted as strings by the serializers' DecimalFields
+    (COERCE_DECIMAL_TO_STRING), so "270.00" stays "270.00". Everything orjson does not write the
+    way DRF does (datetimes, raw Decimals, lazy strings, querysets...) goes through DRF's own
+    encoder. Pretty-printed output (?indent=, the browsable API) and anything orjson rejects
+    fall back to the stdlib renderer.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.compact or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits or NaN under STRICT_JSON: let json decide
+            return super().render(data, accepted_media_type, renderer_context)
+        # DRF escapes U+2028 and U+2029 so the output is also valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSONParser backed by orjson. Bodies orjson would read differently (invalid JSON, integers beyond
+    64 bits, non UTF-8 charsets) are handed to the stdlib parser, so results and error messages stay the same.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read()
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        # orjson reads integers beyond 64 bits as floats; a quick scan keeps such bodies exact
+        if encoding.lower().replace('_', '-') in ('utf-8', 'utf8') and not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class PrometheusTextRenderer(renderers.BaseRenderer):
+    """
+    Renders the /metrics exposition as is; error responses (e.g. 403) are rendered as JSON text.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data).encode(self.charset)
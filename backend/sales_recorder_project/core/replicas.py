@@ -0,0 +1,147 @@
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Routing of the request being served in this thread (None outside requests: commands, report workers)
+_routing = ContextVar('db_routing', default=None)
+
+
+def replica_alias():
+    """
+    The read replica's database alias, or None when no replica is configured.
+    """
+    return getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+
+
+def reading_from_replica():
+    """
+    True while the current request's reads go to the replica.
+    """
+    routing = _routing.get()
+    return routing is not None and routing.read_alias != DEFAULT_DB_ALIAS and not routing.wrote
+
+
+def get_pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def pins_shared():
+    """
+    False when pins go to a per-process LocMemCache and REPLICA_PIN_PROCESS_LOCAL is off: a pin set by
+    the worker that took a write would not be seen by the others, so nothing may read from the replica.
+    """
+    return getattr(settings, 'REPLICA_PIN_PROCESS_LOCAL', True) or not isinstance(get_pin_cache(), LocMemCache)
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def is_pinned(user):
+    # A user who wrote in the last REPLICA_LAG_SECONDS reads from the primary, so they see their own write
+    return user.is_authenticated and get_pin_cache().get(pin_key(user.pk)) is not None
+
+
+class RequestRouting:
+    """
+    Where the reads of one request go. Everything starts on the primary; views opt in to the replica
+    (ReplicaReadMixin), and the first write of the request sends its later reads back to the primary.
+    """
+
+    def __init__(self):
+        self.read_alias = DEFAULT_DB_ALIAS
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """
+    Database router for an optional read replica (REPLICA_DATABASE_ALIAS).
+
+    Writes always go to the primary. Reads go to the replica only during requests whose view opted in
+    and that have not written anything yet; anything else (management commands, report workers,
+    signals run by writes) keeps reading the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return replica_alias() if reading_from_replica() else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Explicit, or Django would save an instance read from the replica back to the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary (replication or sync_sqlite_replica)
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Gives every request its own RequestRouting (also set as request.db_routing) and, when the request
+    wrote, pins its user to the primary for REPLICA_LAG_SECONDS so their next reads see the write
+    however far the replica is behind. The pin lives in the REPLICA_PIN_CACHE_ALIAS cache, which must be
+    shared by the workers for it to cover them all (see pins_shared()).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting()
+        request.db_routing = routing
+        _routing.set(routing)
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if routing.wrote and replica_alias() and user is not None and user.is_authenticated:
+            get_pin_cache().set(pin_key(user.pk), True, getattr(settings, 'REPLICA_LAG_SECONDS', 10))
+        return response
+
+
+def end_request_routing(**kwargs):
+    # Runs once the response is closed, after streamed bodies have been read from the database too
+    _routing.set(None)
+
+
+request_finished.connect(end_request_routing)
+
+
+class ReplicaReadMixin:
+    """
+    Per-view opt-in to the read replica: the actions in `replica_actions` (viewset action names,
+    or lowercase method names for plain APIViews) read from the replica when called with a safe
+    method by a user who has not written recently, and only while pins_shared(). Authentication and permission checks run on
+    the primary first, so a token created a moment ago is always found.
+    """
+    replica_actions = ()
+
+    def can_read_from_replica(self, request):
+        """
+        Hook for views to keep particular requests on the primary.
+        """
+        return True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        routing = _routing.get()
+        action = getattr(self, 'action', None) or request.method.lower()
+        if (
+            routing is not None and replica_alias() and pins_shared() and not routing.wrote
+            and request.method in SAFE_METHODS and action in self.replica_actions
+            and not is_pinned(request.user) and self.can_read_from_replica(request)
+        ):
+            routing.read_alias = replica_alias()
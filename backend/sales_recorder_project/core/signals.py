@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .catalog import invalidate_flavor_catalog
+from .models import Flavor
+
+
+@receiver(post_save, sender=Flavor)
+@receiver(post_delete, sender=Flavor)
+def flavor_changed(sender, instance, **kwargs):
+    """
+    Drops the cached flavor catalog once the change is committed,
+    so the next lookup reloads it and never caches uncommitted data.
+    """
+    invalidate_flavor_catalog()
+    transaction.on_commit(invalidate_flavor_catalog)
@@ -1,3 +1,164 @@
-from django.test import TestCase
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User, UserProfile
+from .catalog import get_flavor_catalog, invalidate_flavor_catalog
+from .models import Flavor
+from .renderers import FastJSONParser, FastJSONRenderer
 
-# Create your tests here.
+
+class FlavorCatalogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='john_doe', password='sales1password')
+        cls.salesperson = UserProfile.objects.create(user=user, role='salesperson')
+        cls.mango = Flavor.objects.create(name='Mango', base_price_per_liter=Decimal('120.00'))
+        cls.retired = Flavor.objects.create(name='Guava', base_price_per_liter=Decimal('90.00'), is_active=False)
+
+    def setUp(self):
+        invalidate_flavor_catalog()
+        self.api = APIClient()
+        self.api.force_authenticate(self.salesperson.user)
+
+    def test_catalog_is_loaded_once_and_invalidated_on_save(self):
+        with self.assertNumQueries(1):
+            get_flavor_catalog()
+            get_flavor_catalog()
+        self.mango.base_price_per_liter = Decimal('130.00')
+        self.mango.save()
+        self.assertEqual(get_flavor_catalog()[self.mango.id].base_price_per_liter, Decimal('130.00'))
+
+    def test_list_is_served_from_catalog_with_cache_headers(self):
+        get_flavor_catalog()
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/v1/flavors/')
+        self.assertEqual([flavor['name'] for flavor in response.data], ['Mango'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+
+class RequestMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.salesperson = UserProfile.objects.create(user=User.objects.create_user(username='john_doe'), role='salesperson')
+        cls.admin = UserProfile.objects.create(user=User.objects.create_user(username='admin'), role='admin')
+
+    def setUp(self):
+        invalidate_flavor_catalog()
+        self.api = APIClient()
+        self.api.force_authenticate(self.salesperson.user)
+
+    def test_server_timing_reports_queries_and_durations(self):
+        response = self.api.get('/api/v1/flavors/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", serialize;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_metrics_endpoint_is_admin_only_prometheus_text(self):
+        self.api.get('/api/v1/flavors/')
+        self.assertEqual(self.api.get('/metrics').status_code, 403)
+        self.api.force_authenticate(self.admin.user)
+        response = self.api.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_queries_bucket{view="flavor-list",method="GET",le="+Inf"}', body)
+        self.assertIn('http_responses_total{view="metrics",method="GET",status="403"}', body)
+
+    @override_settings(METRICS_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_their_sql(self):
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.api.get('/api/v1/flavors/')
+        self.assertIn('GET /api/v1/flavors/', logs.output[0])
+        self.assertIn('core_flavor', logs.output[0])
+
+    @override_settings(METRICS_SLOW_QUERY_MS=0)
+    def test_slow_query_log_leaves_out_bound_values(self):
+        token = Token.objects.create(user=self.salesperson.user)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            api.get('/api/v1/flavors/')
+        self.assertIn('authtoken_token', '\n'.join(logs.output))
+        self.assertNotIn(token.key, '\n'.join(logs.output))
+
+
+class FastJSONTests(TestCase):
+
+    def test_renders_the_same_bytes_as_drf(self):
+        data = {
+            'total_amount': '270.00', # DecimalFields arrive as strings
+            'raw': Decimal('12.50'),
+            'order_date': datetime(2025, 1, 1, 10, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2025, 1, 1),
+            'name': 'Caf\u00e9 \u2028 "Mango"',
+            'error': ErrorDetail('Invalid', code='invalid'),
+            'lazy': gettext_lazy('Approved'),
+            1: [None, True, 3, (4, 5)],
+            'nested': {'items': []},
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(2 ** 70), JSONRenderer().render(2 ** 70))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'), JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_parses_like_drf(self):
+        body = b'{"amount_paid": "10.00", "items": [{"id": 1, "q": 2.5}], "big": 123456789012345678901234567890}'
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"amount_paid": '))
+
+
+class SQLiteProductionOptionsTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'db.sqlite3'
+        # A second connection alias opened with the production options (it also needs a 'default')
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path,
+            'OPTIONS': dict(settings.SQLITE_PRODUCTION_OPTIONS),
+        }
+        self.connection = ConnectionHandler({'default': database, 'production': database})['production']
+        connections['production'] = self.connection
+        self.addCleanup(connections.__delitem__, 'production')
+        self.addCleanup(self.connection.close)
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY)')
+            cursor.execute('INSERT INTO orders VALUES (1)')
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1) # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_PRODUCTION_OPTIONS['timeout'] * 1000)
+        self.assertEqual(self.pragma('cache_size'), -65536)
+
+    def test_transactions_take_the_write_lock_up_front_without_blocking_readers(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='production'):
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM orders') # Nothing written yet
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+            self.assertEqual(other.execute('SELECT COUNT(*) FROM orders').fetchone(), (1,))
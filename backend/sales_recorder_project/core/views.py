@@ -1,10 +1,18 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .catalog import catalog_last_modified, get_flavor_catalog
+from .conditional import ConditionalGetMixin, make_validators, not_modified, set_validators
+from .metrics import registry
 from .models import Flavor
+from .renderers import PrometheusTextRenderer
 from .serializers import FlavorSerializer
 from users.permissions import IsAdminUser 
 from rest_framework import permissions 
 
-class FlavorViewSet(viewsets.ModelViewSet):
+class FlavorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Flavor.objects.all().order_by('name')
     serializer_class = FlavorSerializer
     # Admins can create/update/delete. Salespersons can only read active flavors.
@@ -17,11 +25,45 @@ class FlavorViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated, IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    def is_salesperson(self):
+        return self.request.user and self.request.user.is_authenticated and \
+           hasattr(self.request.user, 'profile') and self.request.user.profile.role == 'salesperson'
+
     def get_queryset(self):
         queryset = super().get_queryset()
-        if self.request.user and self.request.user.is_authenticated and \
-           hasattr(self.request.user, 'profile') and self.request.user.profile.role == 'salesperson':
+        if self.is_salesperson():
             # Salespersons only see active flavors
             return queryset.filter(is_active=True)
         # Admins see all flavors
-        return queryset
\ No newline at end of file
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serves the flavor list from the cached catalog (no query on a warm cache)
+        and lets the browser reuse it for FLAVOR_LIST_MAX_AGE seconds, then revalidate with its ETag.
+        """
+        flavors = sorted(get_flavor_catalog().values(), key=lambda flavor: flavor.name)
+        if self.is_salesperson():
+            flavors = [flavor for flavor in flavors if flavor.is_active]
+
+        # Validated from the catalog too, so a 304 costs no query either
+        etag, last_modified = make_validators(request, len(flavors), catalog_last_modified(flavors))
+        response = not_modified(request, etag, last_modified) or Response(self.get_serializer(flavors, many=True).data)
+        set_validators(response, etag, last_modified, revalidate=False)
+        # The list differs per role, so shared caches must not serve it across users
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'FLAVOR_LIST_MAX_AGE', 60))
+        return response
+
+
+class MetricsView(APIView):
+    """
+    Per-view request metrics (core/middleware.py) in the Prometheus text format. Admin only;
+    point the scraper at /metrics with an `Authorization: Token <admin token>` header.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request):
+        response = Response(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        patch_cache_control(response, no_store=True)
+        return response
@@ -1,21 +1,92 @@
+from decimal import Decimal
 from django.contrib import admin
+from .allocations import allocate_clients, rebuild_allocations
+from .balances import adjust_client_balance, move_client_balance
 from .models import Order, OrderItem, Payment
+from .rollups import apply_rollup_delta, order_contribution, stored_order_contribution
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1 # Allows adding multiple items in the same order
+    # Priced like the API prices them (see OrderAdmin.save_formset)
+    readonly_fields = ('price_per_liter_at_sale', 'item_total')
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    """
+    Orders written here keep the rollup, the client's balance and the payment allocations in step,
+    through the same helpers as OrderSerializer. Deletes are covered by the signals (sales/signals.py).
+    """
     list_display = ('id', 'client', 'salesperson', 'order_date', 'total_amount', 'payment_status', 'created_at')
     list_filter = ('payment_status', 'order_date', 'salesperson__user__username', 'client__name')
     search_fields = ('client__name', 'salesperson__user__username')
     inlines = [OrderItemInline]
     raw_id_fields = ('client','salesperson',)  # Useful for large number of clients and salespersons
+    readonly_fields = ('total_amount',) # The sum of the items
+
+    def save_model(self, request, obj, form, change):
+        # What the stored order contributes, before the form's changes are written
+        obj._stored = None
+        if change:
+            stored = Order.objects.get(pk=obj.pk)
+            obj._stored = (stored.client_id, stored.total_amount, stored_order_contribution(stored))
+        super().save_model(request, obj, form, change)
+
+    def save_formset(self, request, form, formset, change):
+        items = formset.save(commit=False)
+        # New items and items given another flavor are sold at the flavor's current price
+        repriced = {id(item) for item in formset.new_objects}
+        repriced |= {id(item) for item, fields in formset.changed_objects if 'flavor' in fields}
+        for item in formset.deleted_objects:
+            item.delete()
+        for item in items:
+            if id(item) in repriced:
+                item.price_per_liter_at_sale = item.flavor.base_price_per_liter
+            item.item_total = item.quantity_liters * item.price_per_liter_at_sale
+            item.save()
+        formset.save_m2m()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Runs inside the admin's transaction, once the items are saved
+        order = form.instance
+        items = list(order.order_items.values_list('flavor_id', 'quantity_liters', 'item_total'))
+        total = sum((item_total for _, _, item_total in items), Decimal('0.00'))
+        if order.total_amount != total:
+            order.total_amount = total
+            order.save(update_fields=['total_amount', 'updated_at'])
+
+        if order._stored is None:
+            apply_rollup_delta({}, order_contribution(order, items))
+            adjust_client_balance(order.client_id, order.total_amount)
+            allocate_clients([order.client_id])
+        else:
+            old_client_id, old_total, rollup_before = order._stored
+            apply_rollup_delta(rollup_before, order_contribution(order, items))
+            move_client_balance(old_client_id, old_total, order.client_id, order.total_amount)
+            if (old_client_id, old_total) != (order.client_id, order.total_amount):
+                rebuild_allocations([old_client_id, order.client_id])
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
+    """
+    Payments written here update the client's balance and allocations like PaymentSerializer does.
+    """
     list_display = ('id', 'client', 'order', 'amount_paid', 'payment_date', 'recorded_by_salesperson', 'created_at')
     list_filter = ('payment_date', 'payment_method', 'client__name', 'recorded_by_salesperson__user__username')
     search_fields = ('client__name', 'recorded_by_salesperson__user__username')
-    raw_id_fields = ('client', 'order', 'recorded_by_salesperson')
\ No newline at end of file
+    raw_id_fields = ('client', 'order', 'recorded_by_salesperson')
+
+    def save_model(self, request, obj, form, change):
+        stored = None
+        if change:
+            stored = Payment.objects.values_list('client_id', 'amount_paid', 'payment_date').get(pk=obj.pk)
+        super().save_model(request, obj, form, change)
+        if stored is None:
+            adjust_client_balance(obj.client_id, -obj.amount_paid)
+            allocate_clients([obj.client_id])
+        else:
+            old_client_id, old_amount, _ = stored
+            move_client_balance(old_client_id, -old_amount, obj.client_id, -obj.amount_paid)
+            if stored != (obj.client_id, obj.amount_paid, obj.payment_date):
+                rebuild_allocations([old_client_id, obj.client_id])
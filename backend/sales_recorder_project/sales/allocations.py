@@ -0,0 +1,199 @@
+from collections import defaultdict, deque
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from .models import Order, Payment, PaymentAllocation
+from .report_cache import invalidate_all_reports, invalidate_report_days
+
+
+def allocated_total(field):
+    """
+    Sum of the allocations of the outer order or payment (`field` is 'order' or 'payment'), 0 if none.
+    """
+    decimal_field = DecimalField(max_digits=12, decimal_places=2)
+    totals = PaymentAllocation.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Sum('amount')
+    ).values('total')
+    return Coalesce(Subquery(totals, output_field=decimal_field), Value(Decimal('0.00'), output_field=decimal_field))
+
+
+def allocated_later(field, date):
+    """
+    Whether the client of the outer order or payment (`field` is 'order' or 'payment') has one
+    allocated that comes after it in FIFO order (by `date`, then id).
+    """
+    later = Q(**{f'{field}__{date}__gt': OuterRef(date)}) | Q(
+        **{f'{field}__{date}': OuterRef(date), f'{field}_id__gt': OuterRef('pk')}
+    )
+    return Exists(PaymentAllocation.objects.filter(later, **{f'{field}__client_id': OuterRef('client_id')}))
+
+
+def cents(expression):
+    # Amounts are compared in whole cents: SQLite adds decimals up as floats
+    return Round(expression * 100)
+
+
+def allocate_clients(client_ids):
+    """
+    Applies the unallocated part of these clients' payments to the unpaid part of their orders,
+    oldest payment to oldest order first, and marks the orders it settles paid.
+    Existing allocations are kept, so this is what runs after a payment or an order is added;
+    changes that take money or orders away need rebuild_allocations() instead. Clients whose new
+    payment or order is dated before one already allocated are rebuilt, as FIFO pairs them differently.
+
+    Call it after the write that locks the clients' rows (the balance update does), so two
+    transactions never allocate the same client's money at once.
+    """
+    client_ids = {client_id for client_id in client_ids if client_id is not None}
+    if not client_ids:
+        return
+
+    # Clients without unallocated payments (the usual case for a new order) stop after two queries
+    credit, rebuild = defaultdict(list), set()
+    payments = Payment.objects.filter(client_id__in=client_ids, amount_paid__gt=0).annotate(
+        allocated=allocated_total('payment'), backdated=allocated_later('payment', 'payment_date'),
+    ).alias(covered=cents(F('allocated')), due=cents(F('amount_paid'))).filter(covered__lt=F('due'))
+    for payment_id, client_id, amount, allocated, backdated in payments.order_by('payment_date', 'id').values_list(
+        'id', 'client_id', 'amount_paid', 'allocated', 'backdated'
+    ):
+        credit[client_id].append((payment_id, amount - allocated))
+        if backdated:
+            rebuild.add(client_id)
+
+    unpaid = defaultdict(deque)
+    orders = Order.objects.filter(client_id__in=client_ids, total_amount__gt=0).annotate(
+        allocated=allocated_total('order'), backdated=allocated_later('order', 'order_date'),
+    ).alias(covered=cents(F('allocated')), due=cents(F('total_amount'))).filter(covered__lt=F('due'))
+    for order_id, client_id, total, allocated, backdated in orders.order_by('order_date', 'id').values_list(
+        'id', 'client_id', 'total_amount', 'allocated', 'backdated'
+    ):
+        unpaid[client_id].append((order_id, total - allocated))
+        if backdated:
+            rebuild.add(client_id)
+
+    # Money or an order dated before what is already allocated changes the earlier pairs too:
+    # appending to them would not be FIFO, so those clients are recomputed from scratch
+    if rebuild:
+        rebuild_allocations(rebuild)
+        for client_id in rebuild:
+            credit.pop(client_id, None)
+    if not credit:
+        return
+
+    allocations, settled = [], []
+    for client_id, payments in credit.items():
+        orders = unpaid[client_id]
+        for payment_id, available in payments:
+            while available > 0 and orders:
+                order_id, due = orders[0]
+                applied = min(available, due)
+                allocations.append(PaymentAllocation(payment_id=payment_id, order_id=order_id, amount=applied))
+                available -= applied
+                if applied == due:
+                    orders.popleft()
+                    settled.append(order_id)
+                else:
+                    orders[0] = (order_id, due - applied)
+
+    with transaction.atomic(savepoint=False):
+        PaymentAllocation.objects.bulk_create(allocations)
+        if settled:
+            drop_cached_reports(set_payment_status(Order.objects.filter(pk__in=settled), 'paid'))
+
+
+# Every order and every payment as an interval of its client's running total, in cents. An order
+# and a payment of the same client overlap exactly by the amount FIFO allocation applies between them.
+RUNNING_TOTALS_SQL = """
+    SELECT id, client_id, running - cents AS start_cents, running AS end_cents
+    FROM (
+        SELECT id, client_id, cents, SUM(cents) OVER (PARTITION BY client_id ORDER BY {date}, id) AS running
+        FROM (
+            SELECT id, client_id, {date}, CAST(ROUND({amount} * 100) AS BIGINT) AS cents
+            FROM {table} WHERE {amount} > 0{clients}
+        ) amounts
+    ) totals
+"""
+
+ALLOCATE_SQL = """
+    INSERT INTO {allocation_table} (payment_id, order_id, amount)
+    SELECT payments.id, orders.id,
+        (CASE WHEN orders.end_cents < payments.end_cents THEN orders.end_cents ELSE payments.end_cents END
+         - CASE WHEN orders.start_cents > payments.start_cents THEN orders.start_cents ELSE payments.start_cents END) / 100.0
+    FROM ({orders}) orders
+    JOIN ({payments}) payments ON payments.client_id = orders.client_id
+        AND payments.start_cents < orders.end_cents AND orders.start_cents < payments.end_cents
+"""
+
+
+def rebuild_allocations(client_ids=None):
+    """
+    Recomputes the allocations of these clients (every client when None) from scratch and updates
+    the orders' payment status, with set-based queries whatever the number of clients: one DELETE,
+    one INSERT ... SELECT that pairs orders and payments by their running totals, and the status
+    updates. Runs after edits and deletes of orders and payments. Returns the allocations written.
+    """
+    if client_ids is not None:
+        client_ids = sorted({client_id for client_id in client_ids if client_id is not None})
+        if not client_ids:
+            return 0
+    clients = '' if client_ids is None else f" AND client_id IN ({', '.join(['%s'] * len(client_ids))})"
+    params = [] if client_ids is None else client_ids * 2
+
+    sql = ALLOCATE_SQL.format(
+        allocation_table=connection.ops.quote_name(PaymentAllocation._meta.db_table),
+        orders=RUNNING_TOTALS_SQL.format(
+            table=connection.ops.quote_name(Order._meta.db_table), date='order_date', amount='total_amount', clients=clients,
+        ),
+        payments=RUNNING_TOTALS_SQL.format(
+            table=connection.ops.quote_name(Payment._meta.db_table), date='payment_date', amount='amount_paid', clients=clients,
+        ),
+    )
+    allocations = PaymentAllocation.objects.all()
+    if client_ids is not None:
+        allocations = allocations.filter(order__client_id__in=client_ids)
+    with transaction.atomic():
+        allocations.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            count = cursor.rowcount
+        refresh_payment_status(client_ids)
+    return count
+
+
+def refresh_payment_status(client_ids=None):
+    """
+    Marks the orders of these clients (all when None) paid when their allocations cover their total
+    and outstanding otherwise, one UPDATE per direction. updated_at moves with the status so the
+    change feed and ETags pick it up, and cached reports of the days concerned are dropped.
+    """
+    orders = Order.objects.all() if client_ids is None else Order.objects.filter(client_id__in=client_ids)
+    orders = orders.alias(covered=cents(allocated_total('order')), due=cents(F('total_amount')))
+    days = set_payment_status(orders.filter(covered__gte=F('due')), 'paid')
+    days |= set_payment_status(orders.filter(covered__lt=F('due')), 'outstanding')
+    drop_cached_reports(days, everything=client_ids is None)
+
+
+def set_payment_status(orders, status):
+    """
+    Gives `orders` the status with one UPDATE (moving updated_at) where it differs.
+    Returns the days of the orders it changed.
+    """
+    changed = orders.exclude(payment_status=status)
+    days = {day.date() for day in changed.datetimes('order_date', 'day')}
+    if days:
+        changed.update(payment_status=status, updated_at=timezone.now())
+    return days
+
+
+def drop_cached_reports(days, everything=False):
+    """
+    Drops the cached reports of these days (of every day when `everything`), now and again after
+    commit, like the order signals (sales/signals.py).
+    """
+    if not days:
+        return
+    invalidate = invalidate_all_reports if everything else lambda: invalidate_report_days(days)
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,236 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max, Q, Value
+from django.utils import timezone
+from clients.models import Client
+from core.changefeed import bulk_record_tombstones
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Order, OrderItem, Payment, PaymentAllocation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def archive_horizon():
+    """
+    Orders and payments dated before this are candidates for the archive.
+    """
+    return timezone.now() - timedelta(days=getattr(settings, 'ARCHIVE_HORIZON_DAYS', 365))
+
+
+def archived_through():
+    """
+    The newest order date in the archive (None when it is empty): periods after it never need the archive.
+    """
+    return ArchivedOrder.objects.aggregate(newest=Max('order_date'))['newest']
+
+
+def needs_archive(start):
+    """
+    Whether a period starting at `start` (None: from the beginning) reaches into the archive.
+    """
+    newest = archived_through()
+    return newest is not None and (start is None or start <= newest)
+
+
+def cents(amount):
+    return int(amount * 100)
+
+
+def closed_prefix(orders, payments, order_links, payment_links):
+    """
+    Picks what of one client's history can be archived: the longest run of its oldest orders,
+    all paid, that a run of its oldest payments pays off exactly, to the cent.
+
+    Such a run nets to zero, so archiving it leaves the client's balance alone, and FIFO allocation
+    of the remaining orders and payments comes out the same (every running total drops by the same
+    amount). The run must also be closed under links between payments and orders (Payment.order
+    and the stored allocations): its payments only point at its orders, and its orders are only
+    pointed at by its payments.
+
+    `orders` are (id, total, paid) and `payments` (id, amount), both oldest first; `order_links`
+    maps order ids to the ids of every payment linked to them, `payment_links` the other way round.
+    Returns (order ids, payment ids), empty when nothing can go.
+    """
+    # Payment running totals -> the longest payment run reaching them (zero payments extend a run)
+    runs, total = {0: 0}, 0
+    for j, (_, amount) in enumerate(payments, start=1):
+        if amount < 0:
+            break # Refunds and corrections are never archived, nor anything after them
+        total += cents(amount)
+        runs[total] = j
+
+    candidates, total = [], 0
+    for i, (_, amount, paid) in enumerate(orders, start=1):
+        if not paid or amount < 0:
+            break
+        total += cents(amount)
+        if total in runs:
+            candidates.append((i, runs[total]))
+
+    for i, j in reversed(candidates):
+        order_ids = {order_id for order_id, _, _ in orders[:i]}
+        payment_ids = {payment_id for payment_id, _ in payments[:j]}
+        if all(payment_links.get(payment_id, set()) <= order_ids for payment_id in payment_ids) and all(
+            order_links.get(order_id, set()) <= payment_ids for order_id in order_ids
+        ):
+            return order_ids, payment_ids
+    return set(), set()
+
+
+def select_archivable(client_ids, horizon):
+    """
+    closed_prefix() for each of these clients, over their orders and payments dated before `horizon`.
+    Returns (order ids, payment ids).
+    """
+    orders, payments = defaultdict(list), defaultdict(list)
+    for order_id, client_id, total, status in Order.objects.filter(
+        client_id__in=client_ids, order_date__lt=horizon,
+    ).order_by('order_date', 'id').values_list('id', 'client_id', 'total_amount', 'payment_status'):
+        orders[client_id].append((order_id, total, status == 'paid'))
+    for payment_id, client_id, amount in Payment.objects.filter(
+        client_id__in=client_ids, payment_date__lt=horizon,
+    ).order_by('payment_date', 'id').values_list('id', 'client_id', 'amount_paid'):
+        payments[client_id].append((payment_id, amount))
+
+    # Every link, of any date, touching one of these orders or payments
+    order_links, payment_links = defaultdict(set), defaultdict(set)
+    old_orders = Q(order__client_id__in=client_ids, order__order_date__lt=horizon)
+    for payment_id, order_id in Payment.objects.filter(
+        old_orders | Q(client_id__in=client_ids, payment_date__lt=horizon, order__isnull=False),
+    ).values_list('id', 'order_id').union(PaymentAllocation.objects.filter(
+        old_orders | Q(payment__client_id__in=client_ids, payment__payment_date__lt=horizon),
+    ).values_list('payment_id', 'order_id')):
+        order_links[order_id].add(payment_id)
+        payment_links[payment_id].add(order_id)
+
+    order_ids, payment_ids = set(), set()
+    for client_id in orders:
+        client_orders, client_payments = closed_prefix(orders[client_id], payments[client_id], order_links, payment_links)
+        order_ids |= client_orders
+        payment_ids |= client_payments
+    return order_ids, payment_ids
+
+
+def copy_rows(source, target, ids, **extra):
+    """
+    Copies the rows of `source` with these ids into `target`, keeping the ids.
+    """
+    columns = [field.attname for field in source._meta.concrete_fields]
+    target.objects.bulk_create(
+        [target(**row, **extra) for row in source.objects.filter(pk__in=ids).values(*columns)],
+        batch_size=500,
+    )
+
+
+def delete_rows(model, column, ids):
+    """
+    A plain DELETE. The delete signals must not run: archiving changes none of what they maintain
+    (rollups, balances, allocations, cached reports). Change feeds are told by archive_clients().
+    """
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} "
+            f"WHERE {connection.ops.quote_name(column)} IN ({', '.join(['%s'] * len(ids))})",
+            list(ids),
+        )
+
+
+def archive_clients(client_ids, horizon, dry_run=False):
+    """
+    Archives what can be archived of these clients, in one transaction.
+    Returns (orders, payments) archived.
+    """
+    with transaction.atomic():
+        # Order and payment writes update the client's balance, so they wait for this transaction
+        list(Client.objects.select_for_update().filter(pk__in=client_ids).values_list('pk', flat=True))
+        order_ids, payment_ids = select_archivable(client_ids, horizon)
+        if dry_run or not order_ids:
+            return len(order_ids), len(payment_ids)
+
+        now = timezone.now()
+        copy_rows(Order, ArchivedOrder, order_ids, archived_at=now)
+        copy_rows(OrderItem, ArchivedOrderItem, OrderItem.objects.filter(order_id__in=order_ids).values_list('pk', flat=True))
+        copy_rows(Payment, ArchivedPayment, payment_ids, archived_at=now)
+        # Archived rows leave the order and payment lists, so delta-sync clients must drop them too
+        bulk_record_tombstones(Order, {
+            order_id: [salesperson_id]
+            for order_id, salesperson_id in Order.objects.filter(pk__in=order_ids).values_list('id', 'salesperson_id')
+        })
+        bulk_record_tombstones(Payment, {
+            payment_id: [salesperson_id]
+            for payment_id, salesperson_id in Payment.objects.filter(pk__in=payment_ids).values_list('id', 'recorded_by_salesperson_id')
+        })
+
+        # The allocations of an archived run only ever pair its own orders and payments
+        delete_rows(PaymentAllocation, 'order_id', order_ids)
+        delete_rows(PaymentAllocation, 'payment_id', payment_ids)
+        delete_rows(OrderItem, 'order_id', order_ids)
+        delete_rows(Payment, 'id', payment_ids)
+        delete_rows(Order, 'id', order_ids)
+    return len(order_ids), len(payment_ids)
+
+
+def archive(horizon=None, chunk_size=100, dry_run=False):
+    """
+    Moves closed, fully paid orders dated before `horizon` (default: ARCHIVE_HORIZON_DAYS ago), with
+    their items and the payments that paid them, into the archive tables, chunk_size clients per
+    transaction so writers are never held up for long. Yields (orders, payments) per chunk; a chunk
+    that fails is logged and yields (0, 0).
+    """
+    horizon = horizon or archive_horizon()
+    client_ids = list(
+        Order.objects.filter(order_date__lt=horizon, payment_status='paid')
+        .order_by('client_id').values_list('client_id', flat=True).distinct()
+    )
+    for start in range(0, len(client_ids), chunk_size):
+        chunk = client_ids[start:start + chunk_size]
+        try:
+            yield archive_clients(chunk, horizon, dry_run=dry_run)
+        except DatabaseError:
+            # The chunk's transaction is rolled back; the other chunks still go
+            logger.exception("Archiving clients %s to %s failed, skipped", chunk[0], chunk[-1])
+            yield 0, 0
+
+
+def client_history(client, user, start=None, end=None):
+    """
+    The orders and payments of a client, newest first, from the hot tables and (when the period
+    reaches it) the archive, each row flagged `archived`. Salespersons see the rows they recorded.
+    """
+    scoped = {}
+    if user.profile.role == 'salesperson':
+        scoped = {'salesperson': user.profile}
+
+    def period(queryset, field):
+        if start is not None:
+            queryset = queryset.filter(**{f'{field}__gte': start})
+        if end is not None:
+            queryset = queryset.filter(**{f'{field}__lt': end})
+        return queryset
+
+    order_columns = ('id', 'order_date', 'total_amount', 'payment_status')
+    orders = period(Order.objects.filter(client=client, **scoped), 'order_date').values(
+        *order_columns, archived=Value(False),
+    )
+    payment_scope = {'recorded_by_salesperson': scoped['salesperson']} if scoped else {}
+    payment_columns = ('id', 'payment_date', 'amount_paid', 'payment_method', 'order_id')
+    payments = period(Payment.objects.filter(client=client, **payment_scope), 'payment_date').values(
+        *payment_columns, archived=Value(False),
+    )
+    if needs_archive(start):
+        orders = orders.union(period(ArchivedOrder.objects.filter(client=client, **scoped), 'order_date').values(
+            *order_columns, archived=Value(True),
+        ), all=True)
+        payments = payments.union(period(ArchivedPayment.objects.filter(client=client, **payment_scope), 'payment_date').values(
+            *payment_columns, archived=Value(True),
+        ), all=True)
+    return {
+        'orders': list(orders.order_by('-order_date', '-id')),
+        'payments': list(payments.order_by('-payment_date', '-id')),
+    }
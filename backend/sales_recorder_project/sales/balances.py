@@ -0,0 +1,84 @@
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from clients.models import Client
+from .models import Order, Payment
+
+
+def adjust_client_balance(client_id, amount):
+    """
+    Adds `amount` to a client's stored outstanding balance.
+    The update is relative (F expression) so concurrent orders and payments never overwrite each other.
+    """
+    if client_id is None or not amount:
+        return
+    Client.objects.filter(pk=client_id).update(
+        outstanding_balance=F('outstanding_balance') + amount,
+        updated_at=timezone.now()
+    )
+
+
+def adjust_client_balances(amounts):
+    """
+    adjust_client_balance for many clients at once ({client_id: amount}), with a single UPDATE.
+    """
+    amounts = {client_id: amount for client_id, amount in amounts.items() if client_id is not None and amount}
+    if not amounts:
+        return
+    decimal_field = DecimalField(max_digits=12, decimal_places=2)
+    Client.objects.filter(pk__in=amounts).update(
+        outstanding_balance=F('outstanding_balance') + Case(
+            *[When(pk=client_id, then=Value(amount, output_field=decimal_field)) for client_id, amount in amounts.items()],
+            output_field=decimal_field,
+        ),
+        updated_at=timezone.now()
+    )
+
+
+def move_client_balance(old_client_id, old_amount, new_client_id, new_amount):
+    """
+    Replaces an old contribution to a client's balance with a new one,
+    which may belong to a different client (e.g. an order moved to another client).
+    """
+    if old_client_id == new_client_id:
+        adjust_client_balance(new_client_id, new_amount - old_amount)
+    else:
+        adjust_client_balance(old_client_id, -old_amount)
+        adjust_client_balance(new_client_id, new_amount)
+
+
+def computed_balance_expression():
+    """
+    Outstanding balance computed from scratch: sum of order totals minus sum of payments.
+    """
+    decimal_field = DecimalField(max_digits=12, decimal_places=2)
+    order_totals = Order.objects.filter(client=OuterRef('pk')).order_by().values('client').annotate(
+        total=Sum('total_amount')
+    ).values('total')
+    payment_totals = Payment.objects.filter(client=OuterRef('pk')).order_by().values('client').annotate(
+        total=Sum('amount_paid')
+    ).values('total')
+    zero = Value(Decimal('0.00'), output_field=decimal_field)
+    return (
+        Coalesce(Subquery(order_totals, output_field=decimal_field), zero)
+        - Coalesce(Subquery(payment_totals, output_field=decimal_field), zero)
+    )
+
+
+def reconcile_client_balances(dry_run=False):
+    """
+    Recomputes every client's stored balance with one set-based UPDATE.
+    Returns the number of clients whose stored balance had drifted.
+    """
+    drifted = Client.objects.annotate(
+        computed_balance=computed_balance_expression()
+    ).exclude(outstanding_balance=F('computed_balance'))
+    count = drifted.count()
+    if count and not dry_run:
+        # Only drifted rows are written, so their updated_at moves and the rest stay untouched
+        Client.objects.filter(pk__in=drifted.values('pk')).update(
+            outstanding_balance=computed_balance_expression(),
+            updated_at=timezone.now()
+        )
+    return count
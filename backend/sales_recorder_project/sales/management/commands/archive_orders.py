@@ -0,0 +1,33 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sales.archive import archive, archive_horizon
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves closed, fully paid orders older than the horizon (ARCHIVE_HORIZON_DAYS by default), with "
+        "their items and the payments that paid them, into the archive tables, a chunk of clients per "
+        "transaction. Reports and client history keep reading them from there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, help="Horizon in days; default ARCHIVE_HORIZON_DAYS.")
+        parser.add_argument('--chunk-size', type=int, default=100, help="Clients archived per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be archived; nothing is moved.")
+
+    def handle(self, *args, **options):
+        horizon = archive_horizon()
+        if options['older_than_days'] is not None:
+            horizon = timezone.now() - timedelta(days=options['older_than_days'])
+        started = time.perf_counter()
+        orders = payments = 0
+        for chunk_orders, chunk_payments in archive(horizon, chunk_size=options['chunk_size'], dry_run=options['dry_run']):
+            orders += chunk_orders
+            payments += chunk_payments
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {orders} orders and {payments} payments dated before {horizon:%Y-%m-%d} "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,58 @@
+import io
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONParser, FastJSONRenderer
+from sales.models import Order
+from sales.serializers import OrderSerializer
+
+
+def best_of(repeat, run):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+class Command(BaseCommand):
+    help = (
+        "Serializes a large order list (as GET /api/v1/orders/ renders it) once, then times rendering it with "
+        "DRF's JSONRenderer and the orjson FastJSONRenderer, and parsing it back with both parsers. "
+        "Fails if the two renderers' output differs by a single byte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000, help="Newest orders to put in the list.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per renderer/parser; the best time is reported.")
+
+    def handle(self, *args, **options):
+        orders = list(
+            Order.objects.select_related('client', 'salesperson__user')
+            .prefetch_related('order_items__flavor').order_by('-order_date', '-id')[:options['orders']]
+        )
+        if not orders:
+            raise CommandError("No orders; run seed_benchmark_data first.")
+        data, serialize_seconds = best_of(1, lambda: OrderSerializer(orders, many=True).data)
+        decimals = sum(4 + 3 * len(order['order_items']) for order in data) # Decimal strings in the payload
+
+        stdlib_bytes, stdlib_render = best_of(options['repeat'], lambda: JSONRenderer().render(data))
+        fast_bytes, fast_render = best_of(options['repeat'], lambda: FastJSONRenderer().render(data))
+        if fast_bytes != stdlib_bytes:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer.")
+        stdlib_parsed, stdlib_parse = best_of(options['repeat'], lambda: JSONParser().parse(io.BytesIO(stdlib_bytes)))
+        fast_parsed, fast_parse = best_of(options['repeat'], lambda: FastJSONParser().parse(io.BytesIO(stdlib_bytes)))
+        if fast_parsed != stdlib_parsed:
+            raise CommandError("FastJSONParser result differs from JSONParser.")
+
+        self.stdout.write(
+            f"{len(orders)} orders, {decimals} decimal values, {len(stdlib_bytes) / 1024:.0f} KiB of JSON; "
+            f"serializing took {serialize_seconds * 1000:.0f} ms"
+        )
+        self.stdout.write(f"{'':10} {'json ms':>10} {'orjson ms':>10} {'speedup':>8}")
+        for name, stdlib, fast in (('render', stdlib_render, fast_render), ('parse', stdlib_parse, fast_parse)):
+            self.stdout.write(f"{name:10} {stdlib * 1000:>10.1f} {fast * 1000:>10.1f} {stdlib / fast:>7.1f}x")
+        self.stdout.write(self.style.SUCCESS("Output is byte for byte identical."))
@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.test.utils import CaptureQueriesContext
+from sales.models import DailySalesRollup, Order
+from sales.reporting import SUMMARY_FIELDS, summarize_orders, summarize_rollup
+
+
+def legacy_joined_summary(orders):
+    """
+    The aggregation the yearly report used to run: order and item sums in one query.
+    The join to order_items repeats each order once per item, which inflates
+    total_sales and num_orders on multi-item orders. Kept here only as a baseline.
+    """
+    return [
+        dict(row, period=row['period'].date())
+        for row in orders.annotate(period=TruncMonth('order_date')).values(
+            'period', 'salesperson__user__username'
+        ).annotate(
+            total_sales=Sum('total_amount'),
+            num_orders=models.Count('id'),
+            total_liters=Sum('order_items__quantity_liters'),
+        ).order_by('period', 'salesperson__user__username')
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the yearly (month x salesperson) sales summary three ways: the legacy joined query, "
+        "the fan-out-free raw aggregation and the rollup, and checks their figures against the subquery result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per strategy; the best time is reported.")
+
+    def handle(self, *args, **options):
+        year = options['year']
+        group_by = ('salesperson__user__username',)
+        strategies = [
+            ('legacy joined query', lambda: legacy_joined_summary(Order.objects.filter(order_date__year=year))),
+            ('subquery aggregation', lambda: summarize_orders(Order.objects.filter(order_date__year=year), 'month', group_by)),
+            ('daily rollup', lambda: summarize_rollup(DailySalesRollup.objects.filter(day__year=year), 'month', group_by)),
+        ]
+
+        results = {}
+        for name, run in strategies:
+            best = None
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    rows = run()
+                    elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = (rows, best, len(queries))
+
+        reference = self.figures(results['subquery aggregation'][0])
+        self.stdout.write(f"{'strategy':24} {'best ms':>10} {'queries':>8}  figures")
+        for name, (rows, best, query_count) in results.items():
+            matches = 'correct' if self.figures(rows) == reference else 'WRONG'
+            self.stdout.write(f"{name:24} {best * 1000:10.1f} {query_count:8d}  {matches}")
+
+    @staticmethod
+    def figures(rows):
+        return [
+            (row['period'], row['salesperson__user__username']) + tuple(row[field] or 0 for field in SUMMARY_FIELDS)
+            for row in rows
+        ]
@@ -0,0 +1,172 @@
+import multiprocessing
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from clients.models import Client
+from core.models import Flavor
+from sales.models import Order
+from sales.serializers import OrderSerializer
+from users.models import UserProfile
+
+# Each profile: the connection OPTIONS and the journal mode the database file is put in first
+# (WAL is persistent, so the stock run has to switch the file back to a rollback journal)
+PROFILES = {
+    'stock': ({}, 'DELETE'),
+    'production': (getattr(settings, 'SQLITE_PRODUCTION_OPTIONS', {}), 'WAL'),
+}
+
+
+def use_profile(name):
+    """
+    Points the default connection at a profile; the next connection opened picks it up.
+    """
+    options, journal_mode = PROFILES[name]
+    connections.close_all()
+    connection.settings_dict['OPTIONS'] = dict(options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+    connections.close_all()
+
+
+def write_orders(salesperson, client_ids, flavor_ids, count, items, seed, start, results):
+    """
+    Worker process: creates `count` orders through OrderSerializer, as POST /api/v1/orders/ does.
+    """
+    rand = random.Random(seed)
+    request = SimpleNamespace(user=salesperson.user)
+    latencies, locked = [], 0
+    start.wait()
+    for _ in range(count):
+        serializer = OrderSerializer(data={
+            'client_id': rand.choice(client_ids),
+            'order_items': [
+                {'flavor_id': flavor_id, 'quantity_liters': f'{rand.randint(1, 40)}.00'}
+                for flavor_id in rand.sample(flavor_ids, items)
+            ],
+        }, context={'request': request})
+        started = time.perf_counter()
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put(('writer', latencies, locked))
+
+
+def read_orders(start, writers_done, results):
+    """
+    Reader process: fetches the newest order page until the writers are done.
+    """
+    latencies, locked = [], 0
+    start.wait()
+    while not writers_done.is_set():
+        started = time.perf_counter()
+        try:
+            list(Order.objects.select_related('client').order_by('-order_date', '-id')[:50])
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.put(('reader', latencies, locked))
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts several processes that create orders through OrderSerializer at the same time (with "
+        "optional reader processes listing orders) and reports the committed orders per second, lock "
+        "errors and latencies, once with the stock SQLite connection and once with "
+        "SQLITE_PRODUCTION_OPTIONS. Writes real orders: meant for a dedicated benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Writer processes.")
+        parser.add_argument('--orders', type=int, default=200, help="Orders each writer creates.")
+        parser.add_argument('--items', type=int, default=3, help="Line items per order.")
+        parser.add_argument('--readers', type=int, default=2, help="Reader processes running alongside the writers.")
+        parser.add_argument('--profile', choices=sorted(PROFILES), action='append', help="Profile to run; default both.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark is for the SQLite backend.")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("This benchmark needs the fork start method (Linux or macOS).")
+
+        writers = []
+        for salesperson in UserProfile.objects.filter(role='salesperson').select_related('user').order_by('id'):
+            client_ids = list(Client.objects.filter(assigned_salesperson=salesperson, status='approved').values_list('id', flat=True))
+            if client_ids:
+                writers.append((salesperson, client_ids))
+        flavor_ids = list(Flavor.objects.values_list('id', flat=True))
+        if not writers or len(flavor_ids) < options['items']:
+            raise CommandError("Not enough salespersons, approved clients or flavors; run seed_benchmark_data first.")
+
+        self.stdout.write(
+            f"{options['workers']} writers x {options['orders']} orders of {options['items']} items, "
+            f"{options['readers']} readers"
+        )
+        self.stdout.write(
+            f"{'profile':12} {'orders/s':>9} {'locked':>7} {'write p50':>10} {'write p99':>10} "
+            f"{'reads/s':>8} {'read p99':>9}"
+        )
+        original_options = connection.settings_dict.get('OPTIONS', {})
+        try:
+            for name in options['profile'] or ['stock', 'production']:
+                use_profile(name)
+                self.report(name, self.run(writers, flavor_ids, options))
+        finally:
+            connections.close_all()
+            connection.settings_dict['OPTIONS'] = original_options
+
+    def run(self, writers, flavor_ids, options):
+        context = multiprocessing.get_context('fork')
+        start = context.Barrier(options['workers'] + options['readers'] + 1)
+        writers_done = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=write_orders, args=(
+                *writers[i % len(writers)], flavor_ids, options['orders'], options['items'], i, start, results,
+            ))
+            for i in range(options['workers'])
+        ]
+        readers = [context.Process(target=read_orders, args=(start, writers_done, results)) for _ in range(options['readers'])]
+
+        connections.close_all() # Children must open their own connections
+        for process in processes + readers:
+            process.start()
+        start.wait()
+        started = time.perf_counter()
+        collected = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        writers_done.set()
+        collected += [results.get() for _ in readers]
+        for process in processes + readers:
+            process.join()
+        if any(process.exitcode for process in processes + readers):
+            raise CommandError("A benchmark process failed; see its traceback above.")
+
+        def merged(role):
+            rows = [row for row in collected if row[0] == role]
+            return [latency for row in rows for latency in row[1]], sum(row[2] for row in rows)
+        return elapsed, merged('writer'), merged('reader')
+
+    def report(self, name, result):
+        elapsed, (writes, write_locked), (reads, read_locked) = result
+        self.stdout.write(
+            f"{name:12} {len(writes) / elapsed:>9.1f} {write_locked + read_locked:>7} "
+            f"{statistics.median(writes) * 1000 if writes else 0:>8.1f}ms {percentile(writes, 0.99) * 1000:>8.1f}ms "
+            f"{len(reads) / elapsed:>8.1f} {percentile(reads, 0.99) * 1000:>7.1f}ms"
+        )
@@ -0,0 +1,51 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from sales.payment_import import REPORT_COLUMNS, PaymentStatementImport, report_row
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a CSV payment statement (columns client_id, amount_paid, payment_date and optionally "
+        "order_id and payment_method) in batches, as POST /api/v1/payments/import/ does, and writes the "
+        "outcome of every row as CSV to --report (default stdout)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help="Path to the CSV statement.")
+        parser.add_argument('--recorded-by', required=True, help="Username of the salesperson or admin recording the payments.")
+        parser.add_argument('--report', help="Where to write the per-row outcome CSV; '-' or omitted for stdout.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows validated and inserted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; nothing is written.")
+
+    def handle(self, *args, **options):
+        try:
+            recorded_by = UserProfile.objects.get(user__username=options['recorded_by'])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No salesperson or admin profile for user {options['recorded_by']!r}.")
+        importer = PaymentStatementImport(recorded_by, batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        to_file = options['report'] not in (None, '-')
+        report = open(options['report'], 'w', newline='', encoding='utf-8') if to_file else self.stdout
+        started = time.perf_counter()
+        try:
+            with open(options['statement'], 'rb') as statement:
+                writer = csv.writer(report, lineterminator='\n')
+                writer.writerow(REPORT_COLUMNS)
+                for outcome in importer.run(statement):
+                    writer.writerow(report_row(outcome))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ValidationError as exc:
+            raise CommandError(exc.detail['detail'])
+        finally:
+            if to_file:
+                report.close()
+
+        # The summary goes to stderr when the report is on stdout, so the report stays valid CSV
+        (self.stdout if to_file else self.stderr).write(
+            f"{importer.valid} valid rows, {importer.created} payments created, {importer.failed} rows failed "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from sales.allocations import rebuild_allocations
+
+
+class Command(BaseCommand):
+    help = (
+        "Reallocates every client's payments to their orders, oldest first, and sets each order's "
+        "payment_status from the result. Run it once after upgrading to allocations, and whenever "
+        "orders or payments were changed outside the API."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_allocations()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt payment allocations: {count} rows."))
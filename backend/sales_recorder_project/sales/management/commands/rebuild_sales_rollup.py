@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from sales.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Regenerates the daily sales rollup table from all orders and order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily sales rollup: {count} rows."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from sales.balances import reconcile_client_balances
+
+
+class Command(BaseCommand):
+    help = "Recomputes every client's stored outstanding balance from orders and payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many balances have drifted.")
+
+    def handle(self, *args, **options):
+        drifted = reconcile_client_balances(dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{drifted} client balances differ from their orders and payments.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled client balances: {drifted} corrected."))
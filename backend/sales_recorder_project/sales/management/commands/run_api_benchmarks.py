@@ -0,0 +1,193 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIClient
+from clients.models import Client
+from core.models import Flavor
+from sales.models import Order, OrderItem, Payment
+from users.models import UserProfile
+
+
+class QueryCounter:
+    """
+    Counts executed statements. The query log cannot be used here because every
+    request resets it (request_started -> reset_queries).
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def consume(response):
+    """
+    Reads the whole body so streamed responses are measured end to end. Returns its size in bytes.
+    """
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs every router endpoint and report view against the current database as an admin and as "
+        "a salesperson, recording wall time, query count and peak Python memory, and writes the results "
+        "to a JSON file. Pass --compare with an earlier result file to print the change per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark_results.json')
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per endpoint; min and median are reported.")
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--compare', help="A previous result file to compare against.")
+
+    def handle(self, *args, **options):
+        admin = UserProfile.objects.filter(role='admin').select_related('user').order_by('id').first()
+        # The busiest salesperson gives the most representative scoped queries
+        salesperson = self.busiest_salesperson()
+        if admin is None or salesperson is None:
+            raise CommandError("Needs at least one admin and one salesperson; run seed_benchmark_data first.")
+
+        results = []
+        for profile in (admin, salesperson):
+            api = APIClient(HTTP_HOST='localhost')
+            api.force_authenticate(profile.user)
+            for name, url, params in self.cases(profile, options['page_size']):
+                result = self.measure(api, url, params, options['repeat'])
+                result.update(name=name, role=profile.role)
+                results.append(result)
+                self.stdout.write(
+                    f"{profile.role:12} {name:28} {result['status']:>4} {result['median_ms']:>10.1f} ms "
+                    f"{result['queries']:>5} q {result['peak_memory_kb']:>10.1f} KiB"
+                )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'git_commit': self.git_commit(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'dataset': {
+                'clients': Client.objects.count(),
+                'flavors': Flavor.objects.count(),
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'payments': Payment.objects.count(),
+            },
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def busiest_salesperson(self):
+        busiest = Order.objects.values('salesperson_id').order_by().annotate(
+            n=Count('id')
+        ).order_by('-n').first()
+        if busiest is None:
+            return UserProfile.objects.filter(role='salesperson').select_related('user').first()
+        return UserProfile.objects.select_related('user').get(pk=busiest['salesperson_id'])
+
+    def cases(self, profile, page_size):
+        """
+        Yields (name, url, params) for each endpoint, using ids and dates the given user can see.
+        """
+        orders = Order.objects.all()
+        payments = Payment.objects.all()
+        clients = Client.objects.all()
+        if profile.role == 'salesperson':
+            orders = orders.filter(salesperson=profile)
+            payments = payments.filter(recorded_by_salesperson=profile)
+            clients = clients.filter(assigned_salesperson=profile)
+        page = {'page_size': page_size}
+
+        yield 'orders list', '/api/v1/orders/', page
+        yield 'payments list', '/api/v1/payments/', page
+        yield 'clients list', '/api/v1/clients/', page
+        yield 'flavors list', '/api/v1/flavors/', {}
+        if profile.role == 'admin':
+            yield 'users list', '/api/v1/users/', {}
+
+        latest = orders.order_by('-order_date', '-id').first()
+        if latest is not None:
+            yield 'order detail', f'/api/v1/orders/{latest.pk}/', {}
+        payment = payments.order_by('-payment_date', '-id').first()
+        if payment is not None:
+            yield 'payment detail', f'/api/v1/payments/{payment.pk}/', {}
+        client = clients.order_by('-outstanding_balance').first()
+        if client is not None:
+            yield 'client detail', f'/api/v1/clients/{client.pk}/', {}
+        flavor = Flavor.objects.order_by('id').first()
+        if flavor is not None:
+            yield 'flavor detail', f'/api/v1/flavors/{flavor.pk}/', {}
+
+        day = timezone.localtime(latest.order_date).date() if latest is not None else timezone.localdate()
+        yield 'daily report', '/api/v1/reports/sales/daily/', {'date': day}
+        yield 'weekly report', '/api/v1/reports/sales/weekly/', {'start_date': day - timedelta(days=6), 'end_date': day}
+        yield 'monthly report', '/api/v1/reports/sales/monthly/', {'year': day.year, 'month': day.month}
+        if profile.role == 'admin':
+            yield 'yearly report', '/api/v1/reports/sales/yearly/', {'year': day.year}
+
+    def measure(self, api, url, params, repeat):
+        # One warm-up run that also records queries and peak memory; tracemalloc slows
+        # execution down, so the timed runs below are made without it
+        tracemalloc.start()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = api.get(url, params)
+            size = consume(response)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            consume(api.get(url, params))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return {
+            'url': url,
+            'params': {key: str(value) for key, value in params.items()},
+            'status': response.status_code,
+            'bytes': size,
+            'queries': queries.count,
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = {(r['role'], r['name']): r for r in json.load(f)['results']}
+        self.stdout.write(f"\nCompared with {path}:")
+        for result in results:
+            before = previous.get((result['role'], result['name']))
+            if before is None:
+                continue
+            change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+            self.stdout.write(
+                f"{result['role']:12} {result['name']:28} {before['median_ms']:>10.1f} -> {result['median_ms']:>10.1f} ms "
+                f"({change:+.0f}%)  queries {before['queries']} -> {result['queries']}"
+            )
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from sales.report_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued report jobs one after another. Use with REPORT_JOBS_RUNNER = 'worker' "
+        "to keep report generation out of the web processes; several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f"Running {job}")
+            run_job(job.id, claimed=True)
@@ -0,0 +1,208 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from clients.models import Client
+from core.catalog import invalidate_flavor_catalog
+from core.models import Flavor
+from sales.allocations import rebuild_allocations
+from sales.balances import reconcile_client_balances
+from sales.models import Order, OrderItem, Payment
+from sales.rollups import rebuild_rollups
+from users.models import User, UserProfile
+
+PAYMENT_METHODS = ['Cash', 'Mpesa', 'Bank Transfer']
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Lets bulk inserts keep the dates we generate instead of auto_now/auto_now_add overwriting them.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a realistic benchmark dataset with bulk inserts: salespersons, clients, flavors, "
+        "orders with items and payments spread over a date range. The daily sales rollup, client "
+        "balances and payment allocations are rebuilt at the end. Meant for a dedicated benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salespersons', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=2000)
+        parser.add_argument('--flavors', type=int, default=15)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--max-items', type=int, default=4, help="Line items per order are 1..max-items.")
+        parser.add_argument('--payments', type=int, default=50000)
+        parser.add_argument('--days', type=int, default=730, help="Orders and payments are spread over this many past days.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible dataset.")
+
+    def handle(self, *args, **options):
+        if options['salespersons'] < 1:
+            raise CommandError("--salespersons must be at least 1.")
+        if options['clients'] < options['salespersons']:
+            raise CommandError("--clients must be at least --salespersons: every salesperson gets an approved client.")
+        if options['orders'] and options['flavors'] < 1:
+            raise CommandError("--flavors must be at least 1 to create orders.")
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        # Usernames and flavor names get a run tag so several seeds can share a database
+        self.tag = uuid.uuid4().hex[:6]
+
+        salespersons = self.create_salespersons(options['salespersons'])
+        self.create_admin()
+        flavors = self.create_flavors(options['flavors'])
+        clients = self.create_clients(options['clients'], salespersons)
+        self.create_orders(options['orders'], options['max_items'], clients, flavors)
+        self.create_payments(options['payments'], clients)
+
+        self.stdout.write("Rebuilding daily sales rollup...")
+        rebuild_rollups()
+        self.stdout.write("Reconciling client balances...")
+        reconcile_client_balances()
+        self.stdout.write("Allocating payments to orders...")
+        rebuild_allocations()
+        invalidate_flavor_catalog()
+        self.stdout.write(self.style.SUCCESS(f"Seeded benchmark data (run tag {self.tag})."))
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.random.randint(0, self.days * 86400))
+
+    def create_users(self, count, role, prefix):
+        password = make_password(f'{prefix}password') # Hash once; every benchmark user shares it
+        users = User.objects.bulk_create(
+            [User(username=f'{prefix}_{self.tag}_{i}', password=password) for i in range(count)],
+            batch_size=self.batch_size,
+        )
+        return UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role=role) for user in users],
+            batch_size=self.batch_size,
+        )
+
+    def create_admin(self):
+        (profile,) = self.create_users(1, 'admin', 'bench_admin')
+        self.stdout.write(f"Admin user: {profile.user.username} / bench_adminpassword")
+
+    def create_salespersons(self, count):
+        profiles = self.create_users(count, 'salesperson', 'bench_sales')
+        self.stdout.write(f"Created {len(profiles)} salespersons (password bench_salespassword).")
+        return profiles
+
+    def create_flavors(self, count):
+        flavors = Flavor.objects.bulk_create([
+            Flavor(
+                name=f'Flavor {self.tag} {i}',
+                base_price_per_liter=Decimal(self.random.randint(80, 250)),
+                is_active=self.random.random() > 0.1,
+            )
+            for i in range(count)
+        ])
+        self.stdout.write(f"Created {len(flavors)} flavors.")
+        return flavors
+
+    def create_clients(self, count, salespersons):
+        statuses = ['approved'] * 8 + ['pending_approval', 'rejected']
+        clients = []
+        for start in range(0, count, self.batch_size):
+            batch = []
+            for i in range(start, min(start + self.batch_size, count)):
+                if i < len(salespersons):
+                    # Every salesperson gets an approved client, so orders and payments always have one to go to
+                    status, salesperson = 'approved', salespersons[i]
+                else:
+                    status = self.random.choice(statuses)
+                    salesperson = self.random.choice(salespersons)
+                batch.append(Client(
+                    name=f'Client {self.random.randint(0, 10 ** 7):07d}',
+                    contact_person=f'Contact {i}',
+                    phone_number=f'07{self.random.randint(0, 10 ** 8 - 1):08d}',
+                    client_type=self.random.choice(['retail', 'wholesale']),
+                    is_new_client=status == 'pending_approval',
+                    status=status,
+                    assigned_salesperson=salesperson if status == 'approved' else None,
+                    requested_by_salesperson=salesperson,
+                ))
+            clients.extend(Client.objects.bulk_create(batch))
+        self.stdout.write(f"Created {len(clients)} clients.")
+        return [client for client in clients if client.status == 'approved']
+
+    def create_orders(self, count, max_items, clients, flavors):
+        order_date = Order._meta.get_field('order_date')
+        created_at = Order._meta.get_field('created_at')
+        updated_at = Order._meta.get_field('updated_at')
+        created = 0
+        with explicit_timestamps(order_date, created_at, updated_at):
+            while created < count:
+                size = min(self.batch_size, count - created)
+                orders, order_items = [], []
+                for _ in range(size):
+                    client = self.random.choice(clients)
+                    when = self.random_date()
+                    items = []
+                    for flavor in self.random.sample(flavors, self.random.randint(1, min(max_items, len(flavors)))):
+                        quantity = Decimal(self.random.randint(1, 40)) / 2
+                        items.append(OrderItem(
+                            flavor=flavor,
+                            quantity_liters=quantity,
+                            price_per_liter_at_sale=flavor.base_price_per_liter,
+                            item_total=quantity * flavor.base_price_per_liter,
+                        ))
+                    orders.append(Order(
+                        client=client,
+                        salesperson_id=client.assigned_salesperson_id,
+                        order_date=when,
+                        created_at=when,
+                        updated_at=when,
+                        total_amount=sum(item.item_total for item in items),
+                    ))
+                    order_items.append(items)
+
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    for order, items in zip(orders, order_items):
+                        for item in items:
+                            item.order = order
+                    OrderItem.objects.bulk_create([item for items in order_items for item in items])
+                created += size
+                self.stdout.write(f"  orders: {created}/{count}")
+
+    def create_payments(self, count, clients):
+        created_at = Payment._meta.get_field('created_at')
+        updated_at = Payment._meta.get_field('updated_at')
+        created = 0
+        with explicit_timestamps(created_at, updated_at):
+            while created < count:
+                size = min(self.batch_size, count - created)
+                payments = []
+                for _ in range(size):
+                    client = self.random.choice(clients)
+                    when = self.random_date()
+                    payments.append(Payment(
+                        client=client,
+                        amount_paid=Decimal(self.random.randint(100, 50000)) / 10,
+                        payment_date=when,
+                        payment_method=self.random.choice(PAYMENT_METHODS),
+                        recorded_by_salesperson_id=client.assigned_salesperson_id,
+                        created_at=when,
+                        updated_at=when,
+                    ))
+                Payment.objects.bulk_create(payments)
+                created += size
+                self.stdout.write(f"  payments: {created}/{count}")
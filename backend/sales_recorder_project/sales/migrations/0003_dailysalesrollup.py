@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_client_requested_by_salesperson'),
+        ('core', '0001_initial'),
+        ('sales', '0002_rename_price_per_liter_orderitem_price_per_liter_at_sale_and_more'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_liters', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='clients.client')),
+                ('flavor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='core.flavor')),
+                ('salesperson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='users.userprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'salesperson', 'client', 'flavor'), name='unique_daily_sales_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_composite_indexes'),
+        ('core', '0001_initial'),
+        ('sales', '0003_dailysalesrollup'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['salesperson', 'day'], name='rollup_salesperson_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['salesperson', 'order_date', 'id'], name='order_salesperson_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'order_date', 'id'], name='order_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'id'], name='order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_status', 'order_date'], name='order_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('payment_status', 'outstanding')), fields=['client', 'order_date'], name='order_outstanding_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['recorded_by_salesperson', 'payment_date', 'id'], name='payment_salesperson_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['client', 'payment_date', 'id'], name='payment_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='payment_date_idx'),
+        ),
+    ]
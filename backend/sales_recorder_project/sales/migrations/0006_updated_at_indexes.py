@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_updated_at_indexes'),
+        ('sales', '0005_reportjob'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['salesperson', 'updated_at', 'id'], name='order_salesperson_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['recorded_by_salesperson', 'updated_at', 'id'], name='payment_salesperson_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at', 'id'], name='payment_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_updated_at_indexes'),
+        ('core', '0002_tombstone'),
+        ('sales', '0007_paymentallocation'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_date', models.DateTimeField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_status', models.CharField(choices=[('paid', 'Paid'), ('outstanding', 'Outstanding')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='clients.client')),
+                ('salesperson', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='users.userprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity_liters', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_liter_at_sale', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('item_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('flavor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_order_items', to='core.flavor')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='sales.archivedorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_date', models.DateTimeField()),
+                ('payment_method', models.CharField(blank=True, max_length=50, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_payments', to='clients.client')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='sales.archivedorder')),
+                ('recorded_by_salesperson', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_payments', to='users.userprofile')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['salesperson', 'order_date', 'id'], name='archorder_salesperson_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['client', 'order_date', 'id'], name='archorder_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['order_date', 'id'], name='archorder_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(fields=['client', 'payment_date', 'id'], name='archpayment_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(fields=['recorded_by_salesperson', 'payment_date', 'id'], name='archpayment_salesperson_idx'),
+        ),
+    ]
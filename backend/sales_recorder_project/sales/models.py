@@ -31,6 +31,24 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Composite indexes follow the (filter, sort) pairs used by the viewsets and reports
+        indexes = [
+            models.Index(fields=['salesperson', 'order_date', 'id'], name='order_salesperson_date_idx'),
+            models.Index(fields=['client', 'order_date', 'id'], name='order_client_date_idx'),
+            models.Index(fields=['order_date', 'id'], name='order_date_idx'),
+            models.Index(fields=['payment_status', 'order_date'], name='order_status_date_idx'),
+            # Small partial index: only unpaid orders, oldest first per client
+            models.Index(
+                fields=['client', 'order_date'],
+                condition=models.Q(payment_status='outstanding'),
+                name='order_outstanding_client_idx',
+            ),
+            # ?updated_since= change feed, per salesperson and across everyone (admins)
+            models.Index(fields=['salesperson', 'updated_at', 'id'], name='order_salesperson_updated_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} for {self.client.name} by {self.salesperson.user.username} on {self.order_date}"
 
@@ -74,5 +92,152 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_by_salesperson', 'payment_date', 'id'], name='payment_salesperson_date_idx'),
+            models.Index(fields=['client', 'payment_date', 'id'], name='payment_client_date_idx'),
+            models.Index(fields=['payment_date', 'id'], name='payment_date_idx'),
+            models.Index(fields=['recorded_by_salesperson', 'updated_at', 'id'], name='payment_salesperson_upd_idx'),
+            models.Index(fields=['updated_at', 'id'], name='payment_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Payment of {self.amount_paid} by {self.client.name} on {self.payment_date}"
+
+class PaymentAllocation(models.Model):
+    """
+    The part of a payment applied to an order. Each client's payments settle their orders
+    oldest first (FIFO); an order is paid once its allocations cover its total.
+    Maintained by sales/allocations.py, never edited directly.
+    """
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='allocations')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='allocations')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.amount} of payment {self.payment_id} to order {self.order_id}"
+
+class ArchivedOrder(models.Model):
+    """
+    An order moved out of the hot tables by sales/archive.py: closed, paid in full and older than
+    the archive horizon. Same columns and ids as Order; read by reports and client history only.
+    """
+    id = models.BigIntegerField(primary_key=True) # The id it had as an Order
+    client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='archived_orders')
+    salesperson = models.ForeignKey(UserProfile, on_delete=models.PROTECT, related_name='archived_orders')
+    order_date = models.DateTimeField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['salesperson', 'order_date', 'id'], name='archorder_salesperson_date_idx'),
+            models.Index(fields=['client', 'order_date', 'id'], name='archorder_client_date_idx'),
+            models.Index(fields=['order_date', 'id'], name='archorder_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} of client {self.client_id} on {self.order_date}"
+
+class ArchivedOrderItem(models.Model):
+    """
+    An item of an archived order, with the id it had as an OrderItem.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='order_items')
+    flavor = models.ForeignKey(Flavor, on_delete=models.PROTECT, related_name='archived_order_items')
+    quantity_liters = models.DecimalField(max_digits=10, decimal_places=2)
+    price_per_liter_at_sale = models.DecimalField(max_digits=10, decimal_places=2)
+    item_total = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.quantity_liters}L of flavor {self.flavor_id} for archived order {self.order_id}"
+
+class ArchivedPayment(models.Model):
+    """
+    A payment archived together with the orders it paid, with the id it had as a Payment.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='archived_payments')
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.PROTECT, related_name='payments', null=True, blank=True)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateTimeField()
+    payment_method = models.CharField(max_length=50, null=True, blank=True)
+    recorded_by_salesperson = models.ForeignKey(UserProfile, on_delete=models.PROTECT, related_name='archived_payments')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'payment_date', 'id'], name='archpayment_client_date_idx'),
+            models.Index(fields=['recorded_by_salesperson', 'payment_date', 'id'], name='archpayment_salesperson_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived payment {self.id} of {self.amount_paid} by client {self.client_id}"
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales figures per (day, salesperson, client, flavor).
+    Kept current by the order write path (see sales/rollups.py) and read by the report views.
+    Each order is counted once, on the row of its lowest flavor id
+    (or on a flavor-less row if it has no items), so every column can simply be summed.
+    """
+    day = models.DateField()
+    salesperson = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='sales_rollups')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='sales_rollups')
+    flavor = models.ForeignKey(Flavor, on_delete=models.CASCADE, related_name='sales_rollups', null=True, blank=True)
+    order_count = models.IntegerField(default=0)
+    total_liters = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'salesperson', 'client', 'flavor'], name='unique_daily_sales_rollup'),
+        ]
+        indexes = [
+            # Salesperson reports filter on the salesperson first, then the day range
+            models.Index(fields=['salesperson', 'day'], name='rollup_salesperson_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.day} for {self.salesperson_id}/{self.client_id}/{self.flavor_id}"
+
+class ReportJob(models.Model):
+    """
+    A sales report generated in the background (see sales/report_jobs.py).
+    The finished CSV is written to REPORT_JOBS_DIR and served by the download endpoint.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    report_type = models.CharField(max_length=20) # daily, weekly, monthly or yearly
+    params = models.JSONField(default=dict) # Query parameters the report was requested with
+    requested_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='report_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    rows_written = models.IntegerField(default=0) # Progress, updated while the file is written
+    filename = models.CharField(max_length=255, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker picks the oldest queued job
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} report job {self.id} ({self.status})"
@@ -0,0 +1,155 @@
+import csv
+import io
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from clients.models import Client
+from .allocations import allocate_clients
+from .balances import adjust_client_balances
+from .models import Order, Payment
+from .serializers import PaymentStatementRowSerializer
+
+REQUIRED_COLUMNS = ('client_id', 'amount_paid', 'payment_date')
+OPTIONAL_COLUMNS = ('order_id', 'payment_method')
+REPORT_COLUMNS = ('row', 'status', 'payment_id', 'errors')
+
+
+def read_statement(file):
+    """
+    Checks the header of a CSV statement (a binary file, UTF-8 with or without BOM) and returns
+    an iterator of (line number, row) with the known columns only and blank values left out.
+    The file is read as the iterator is consumed, so a statement is never loaded whole.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = reader.fieldnames or ()
+    except (csv.Error, UnicodeDecodeError):
+        raise ValidationError({"detail": "The statement is not a UTF-8 CSV file."})
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValidationError({"detail": f"The statement is missing the column(s): {', '.join(missing)}."})
+    columns = set(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    return (
+        (reader.line_num, {key: value.strip() for key, value in row.items() if key in columns and value and value.strip()})
+        for row in reader
+    )
+
+
+class PaymentStatementImport:
+    """
+    Imports the rows of a CSV payment statement as payments recorded by `recorded_by`.
+
+    Rows are taken batch_size at a time: each row is validated on its own, the batch's clients and
+    orders are then looked up with one query each, and the valid payments are inserted with one
+    bulk_create, the clients' balances lowered with one UPDATE and the payments allocated to their
+    oldest unpaid orders (sales/allocations.py), in one transaction per batch.
+    Invalid rows are skipped and reported; a batch that was written stays written if a later
+    one fails. Salespersons can only import payments for the clients assigned to them, and a
+    payment's order must belong to its client.
+
+    run() checks the statement's header and returns an iterator of one outcome per row, in statement
+    order, importing the rows as it is consumed:
+    {'row': line, 'status': 'created' | 'valid' (dry run) | 'error', 'payment_id': id, 'errors': {...}}
+    """
+
+    def __init__(self, recorded_by, batch_size=1000, dry_run=False):
+        self.recorded_by = recorded_by
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.row_serializer = PaymentStatementRowSerializer()
+        self.valid = self.created = self.failed = 0
+
+    def run(self, file):
+        # A bad header raises ValidationError here, before any outcome is produced
+        return self.import_rows(read_statement(file))
+
+    def import_rows(self, rows):
+        line = 1
+        while True:
+            try:
+                batch = list(islice(rows, self.batch_size))
+            except (csv.Error, UnicodeDecodeError) as exc:
+                # The rest of the file cannot be trusted; what was imported so far stays
+                self.failed += 1
+                yield self.error(line + 1, {'detail': [f"Unreadable line, import stopped: {exc}"]})
+                return
+            if not batch:
+                return
+            line = batch[-1][0]
+            yield from self.import_batch(batch)
+
+    def import_batch(self, batch):
+        outcomes, validated = {}, []
+        for line, row in batch:
+            try:
+                validated.append((line, self.row_serializer.run_validation(row)))
+            except ValidationError as exc:
+                outcomes[line] = self.error(line, exc.detail)
+
+        client_ids = self.client_ids({data['client_id'] for _, data in validated})
+        order_ids = {data['order_id'] for _, data in validated if 'order_id' in data}
+        order_clients = dict(Order.objects.filter(pk__in=order_ids).values_list('id', 'client_id')) if order_ids else {}
+
+        payments = []
+        for line, data in validated:
+            errors = {}
+            if data['client_id'] not in client_ids:
+                errors['client_id'] = ["Client not found or not assigned to this salesperson."]
+            if 'order_id' in data and order_clients.get(data['order_id']) != data['client_id']:
+                errors['order_id'] = ["Order not found for this client."]
+            if errors:
+                outcomes[line] = self.error(line, errors)
+                continue
+            payments.append((line, Payment(
+                client_id=data['client_id'],
+                order_id=data.get('order_id'),
+                amount_paid=data['amount_paid'],
+                payment_date=data['payment_date'],
+                payment_method=data.get('payment_method'),
+                recorded_by_salesperson=self.recorded_by,
+            )))
+
+        if payments and not self.dry_run:
+            with transaction.atomic():
+                Payment.objects.bulk_create([payment for _, payment in payments])
+                # Payments lower what the clients owe
+                balances = defaultdict(Decimal)
+                for _, payment in payments:
+                    balances[payment.client_id] -= payment.amount_paid
+                adjust_client_balances(balances)
+                allocate_clients(balances)
+        status = 'valid' if self.dry_run else 'created'
+        for line, payment in payments:
+            outcomes[line] = {'row': line, 'status': status, 'payment_id': payment.pk, 'errors': {}}
+        self.valid += len(payments)
+        self.created += 0 if self.dry_run else len(payments)
+        self.failed += len(batch) - len(payments)
+        return [outcomes[line] for line, _ in batch]
+
+    def client_ids(self, ids):
+        """
+        The ids among `ids` of clients the importing user may record payments for.
+        """
+        if not ids:
+            return set()
+        clients = Client.objects.filter(pk__in=ids)
+        if self.recorded_by.role == 'salesperson':
+            clients = clients.filter(assigned_salesperson=self.recorded_by)
+        return set(clients.values_list('id', flat=True))
+
+    @staticmethod
+    def error(line, errors):
+        return {
+            'row': line, 'status': 'error', 'payment_id': None,
+            'errors': {field: [str(message) for message in messages] for field, messages in errors.items()},
+        }
+
+
+def report_row(outcome):
+    """
+    An outcome as a row of the CSV outcome report.
+    """
+    errors = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in outcome['errors'].items())
+    return [outcome['row'], outcome['status'], outcome['payment_id'] or '', errors]
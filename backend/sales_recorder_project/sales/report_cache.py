@@ -0,0 +1,154 @@
+import hashlib
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from core.replicas import reading_from_replica
+
+# Every cached report depends on a few "granules" (a day, a month or a year) plus ALL.
+# Each granule has a version number in the cache; an order write bumps the versions of its day,
+# month and year, which changes the key of every report covering that date and leaves the rest alone.
+ALL = 'all'
+# Longer ranges are keyed by month, so a key never depends on hundreds of day versions
+MAX_DAY_GRANULES = 62
+
+
+def get_cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+def caching_enabled():
+    """
+    False when the report cache is a per-process LocMemCache and REPORT_CACHE_PROCESS_LOCAL is off:
+    the order writes of other worker processes would never invalidate it.
+    """
+    return getattr(settings, 'REPORT_CACHE_PROCESS_LOCAL', True) or not isinstance(get_cache(), LocMemCache)
+
+
+def day_granule(day):
+    return f'd:{day.isoformat()}'
+
+
+def month_granule(year, month):
+    return f'm:{year:04d}-{month:02d}'
+
+
+def year_granule(year):
+    return f'y:{year:04d}'
+
+
+def range_granules(start, end):
+    """
+    Granules covering the days from start to end inclusive.
+    """
+    if (end - start).days < MAX_DAY_GRANULES:
+        return [day_granule(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(month_granule(year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _version_key(granule):
+    return f'sales-report-version:{granule}'
+
+
+def get_versions(granules):
+    keys = [_version_key(granule) for granule in granules]
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Start unknown (never written or evicted) versions from the clock rather than 0,
+        # so an evicted version can never match a key that was built before the eviction
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def invalidate_report_days(days):
+    """
+    Bumps the versions of the given days and of their months and years.
+    """
+    granules = set()
+    for day in days:
+        granules.update((day_granule(day), month_granule(day.year, day.month), year_granule(day.year)))
+    _bump(granules)
+
+
+def invalidate_all_reports():
+    _bump([ALL])
+
+
+def _bump(granules):
+    cache = get_cache()
+    for granule in granules:
+        key = _version_key(granule)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not in the cache: readers will start it from the clock, which is always newer
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def report_cache_key(view, user, params):
+    """
+    Builds the key for a report: report type, parameters (the period and the admin's salesperson
+    filter), the requesting role and salesperson, the versions of every period it covers and whether
+    it is read from the replica. Returns None for reports that are not cached (or when caching is off).
+    """
+    granules = view.cache_granules(params)
+    if granules is None or not hasattr(user, 'profile') or not caching_enabled():
+        return None
+    profile = user.profile
+    scope = profile.id if profile.role == 'salesperson' else None
+    parts = (
+        view.report_type,
+        sorted((key, str(value)) for key, value in params.items()),
+        profile.role,
+        scope,
+        get_versions(list(granules) + [ALL]),
+        # A report built on a lagging replica may predate the latest version bump, so it is kept
+        # apart from the primary's and never served to a user pinned to the primary after a write
+        reading_from_replica(),
+    )
+    return 'sales-report:' + hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def get_report(view, user, params):
+    """
+    Returns (filename, header, rows) from the cache, or builds the report and caches it
+    once its rows have been consumed. Reports with more than REPORT_CACHE_MAX_ROWS rows
+    are passed through without being cached, so streamed reports keep flat memory.
+    """
+    key = report_cache_key(view, user, params)
+    if key is None:
+        return view.build_report(user, params)
+    cache = get_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    filename, header, rows = view.build_report(user, params)
+    timeout = getattr(settings, 'REPORT_CACHE_TTL', 3600)
+    if reading_from_replica():
+        # ...and kept no longer than the replica may lag
+        timeout = min(timeout, getattr(settings, 'REPLICA_LAG_SECONDS', 10))
+    return filename, header, _caching_rows(cache, key, filename, header, rows, timeout)
+
+
+def _caching_rows(cache, key, filename, header, rows, timeout):
+    limit = getattr(settings, 'REPORT_CACHE_MAX_ROWS', 5000)
+    collected = []
+    for row in rows:
+        if collected is not None:
+            collected.append(row)
+            if len(collected) > limit:
+                collected = None
+        yield row
+    if collected is not None:
+        cache.set(key, (filename, header, collected), timeout)
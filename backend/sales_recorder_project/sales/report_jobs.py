@@ -0,0 +1,140 @@
+import csv
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_drain_scheduled = False
+
+
+def get_executor():
+    """
+    The in-process thread pool that runs jobs when REPORT_JOBS_RUNNER is 'thread'.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_JOBS_THREADS', 2),
+                thread_name_prefix='report-job',
+            )
+        return _executor
+
+
+def jobs_dir():
+    path = Path(getattr(settings, 'REPORT_JOBS_DIR', settings.BASE_DIR / 'report_jobs'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def enqueue_report(report_type, profile, params):
+    """
+    Records a queued job and, with the thread runner, wakes the pool once the row is committed.
+    With the 'worker' runner the job waits for `manage.py run_report_worker` to pick it up.
+    """
+    job = ReportJob.objects.create(report_type=report_type, requested_by=profile, params=params)
+    transaction.on_commit(wake_thread_runner)
+    return job
+
+
+def wake_thread_runner():
+    """
+    With the thread runner, has the pool run the queued jobs, oldest first, whichever process queued
+    them: a job left behind by a restarted web process is picked up by the next request that wakes it.
+    """
+    global _drain_scheduled
+    if getattr(settings, 'REPORT_JOBS_RUNNER', 'thread') != 'thread':
+        return
+    with _executor_lock:
+        if _drain_scheduled:
+            return
+        _drain_scheduled = True
+    get_executor().submit(_run_in_thread)
+
+
+def _run_in_thread():
+    global _drain_scheduled
+    # Cleared before claiming: a job committed from now on wakes another drain, earlier ones are claimed here
+    with _executor_lock:
+        _drain_scheduled = False
+    try:
+        while (job := claim_next_job()) is not None:
+            run_job(job.id, claimed=True)
+    finally:
+        # Pool threads keep their own connections; don't leave them open between jobs
+        connections.close_all()
+
+
+def requeue_stale_jobs():
+    """
+    Queues again the jobs running for longer than REPORT_JOBS_TIMEOUT seconds: the process running
+    them died (a restart, a crash) before finishing. Returns how many were requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOBS_TIMEOUT', 1800))
+    return ReportJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='queued', started_at=None, rows_written=0,
+    )
+
+
+def claim_next_job():
+    """
+    Marks the oldest queued job as running and returns it, or None if the queue is empty.
+    The claim is a conditional UPDATE, so two workers never run the same job.
+    """
+    requeue_stale_jobs()
+    while True:
+        job_id = ReportJob.objects.filter(status='queued').order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if _claim(job_id):
+            return ReportJob.objects.select_related('requested_by__user').get(pk=job_id)
+
+
+def _claim(job_id):
+    return ReportJob.objects.filter(pk=job_id, status='queued').update(status='running', started_at=timezone.now()) == 1
+
+
+def run_job(job_id, claimed=False):
+    """
+    Generates the report for a job and writes it to disk, updating rows_written as it goes.
+    """
+    from .report_cache import get_report
+    from .views_reports import REPORT_VIEWS
+
+    if not claimed and not _claim(job_id):
+        return
+    job = ReportJob.objects.select_related('requested_by__user').get(pk=job_id)
+    # Updates only apply to this run: a job requeued as stale may already run elsewhere
+    this_run = ReportJob.objects.filter(pk=job.id, status='running', started_at=job.started_at)
+    progress_every = getattr(settings, 'REPORT_JOBS_PROGRESS_EVERY', 1000)
+    try:
+        view = REPORT_VIEWS[job.report_type]()
+        params = view.parse_params(job.params)
+        filename, header, rows = get_report(view, job.requested_by.user, params)
+        path = jobs_dir() / f'{job.id}_{filename}'
+
+        written = 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+                if written % progress_every == 0:
+                    this_run.update(rows_written=written)
+
+        this_run.update(
+            status='done', rows_written=written, filename=filename, file_path=str(path), finished_at=timezone.now()
+        )
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.id)
+        this_run.update(status='failed', error=str(exc), finished_at=timezone.now())
@@ -0,0 +1,54 @@
+from decimal import Decimal
+from django.db.models import Count, DateField, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from .models import OrderItem
+
+# Figures every summary row carries, next to its period and group_by values
+SUMMARY_FIELDS = ('total_sales', 'num_orders', 'total_liters')
+
+
+def _truncate(field, period):
+    """
+    Expression giving the report period (as a date) of a date or datetime field.
+    """
+    if period == 'day':
+        return TruncDate(field)
+    if period == 'month':
+        return TruncMonth(field, output_field=DateField())
+    raise ValueError(f"Unknown report period: {period}")
+
+
+def summarize_rollup(rollup, period, group_by=()):
+    """
+    Sales summary per period (and group_by fields) read from DailySalesRollup rows.
+    One grouped query; the rollup has one row per flavor but counts each order once,
+    so every column can simply be summed.
+    """
+    period_expression = F('day') if period == 'day' else _truncate('day', period)
+    return list(
+        rollup.annotate(period=period_expression).values('period', *group_by).annotate(
+            total_sales=Sum('total_amount'),
+            num_orders=Sum('order_count'),
+            total_liters=Sum('total_liters'),
+        ).order_by('period', *group_by)
+    )
+
+
+def summarize_orders(orders, period, group_by=()):
+    """
+    Same summary computed from raw orders, without the fan-out of joining order items:
+    each order's liters come from a correlated subquery over its own items, so the
+    grouped query still sees exactly one row per order. One query.
+    """
+    order_liters = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        liters=Sum('quantity_liters')
+    ).values('liters')
+    rows = orders.annotate(
+        period=_truncate('order_date', period),
+        liters=Subquery(order_liters, output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).values('period', *group_by).annotate(
+        total_sales=Sum('total_amount'),
+        num_orders=Count('id'),
+        total_liters=Coalesce(Sum('liters'), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).order_by('period', *group_by)
+    return list(rows)
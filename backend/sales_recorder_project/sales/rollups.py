@@ -0,0 +1,159 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderItem, DailySalesRollup, Order, OrderItem
+from .report_cache import invalidate_all_reports
+
+# Columns carried by every rollup row, in the order used by contribution tuples
+ROLLUP_COLUMNS = ('order_count', 'total_liters', 'total_amount')
+
+
+def order_day(order):
+    """
+    The reporting day of an order, in the current time zone (matches `order_date__date` lookups).
+    """
+    if timezone.is_aware(order.order_date):
+        return timezone.localtime(order.order_date).date()
+    return order.order_date.date()
+
+
+def order_contribution(order, items):
+    """
+    Returns what a single order adds to the rollup as {key: [order_count, liters, amount]}.
+    `items` is an iterable of (flavor_id, quantity_liters, item_total) tuples.
+    The order itself is counted on the row of its lowest flavor id so the counts stay additive.
+    """
+    day = order_day(order)
+    contribution = defaultdict(lambda: [0, Decimal('0'), Decimal('0')])
+    items = list(items)
+    first_flavor_id = min((flavor_id for flavor_id, _, _ in items), default=None)
+    contribution[(day, order.salesperson_id, order.client_id, first_flavor_id)][0] += 1
+    for flavor_id, quantity, item_total in items:
+        row = contribution[(day, order.salesperson_id, order.client_id, flavor_id)]
+        row[1] += quantity
+        row[2] += item_total
+    return dict(contribution)
+
+
+def stored_order_contribution(order):
+    """
+    Same as order_contribution but reads the order's items from the database.
+    """
+    items = order.order_items.values_list('flavor_id', 'quantity_liters', 'item_total')
+    return order_contribution(order, items)
+
+
+def apply_rollup_delta(before, after):
+    """
+    Applies the difference between two order contributions to the rollup table.
+    Must be called inside the transaction that writes the order.
+    """
+    delta = defaultdict(lambda: [0, Decimal('0'), Decimal('0')])
+    for key, values in after.items():
+        for i, value in enumerate(values):
+            delta[key][i] += value
+    for key, values in before.items():
+        for i, value in enumerate(values):
+            delta[key][i] -= value
+    delta = {key: values for key, values in delta.items() if any(values)}
+    if delta:
+        _apply_delta(delta)
+
+
+def _key_filter(keys):
+    condition = Q()
+    for day, salesperson_id, client_id, flavor_id in keys:
+        condition |= Q(day=day, salesperson_id=salesperson_id, client_id=client_id, flavor_id=flavor_id)
+    return condition
+
+
+def _apply_delta(delta):
+    """
+    Increments existing rows with a single UPDATE and inserts the missing ones in bulk.
+    The increments are relative (F expressions) so concurrent writers never overwrite each other.
+    """
+    existing = {
+        (row['day'], row['salesperson_id'], row['client_id'], row['flavor_id']): row['id']
+        for row in DailySalesRollup.objects.filter(_key_filter(delta)).values(
+            'id', 'day', 'salesperson_id', 'client_id', 'flavor_id'
+        )
+    }
+
+    if existing:
+        updates = {
+            column: Case(
+                *[When(pk=pk, then=F(column) + delta[key][i]) for key, pk in existing.items()],
+                default=F(column),
+            )
+            for i, column in enumerate(ROLLUP_COLUMNS)
+        }
+        DailySalesRollup.objects.filter(pk__in=existing.values()).update(**updates)
+
+    missing = {key: values for key, values in delta.items() if key not in existing}
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.bulk_create([_build_row(key, values) for key, values in missing.items()])
+    except IntegrityError:
+        # Another writer created some of these rows in the meantime; they exist now, so increment them
+        _apply_delta(missing)
+
+
+def _build_row(key, values):
+    day, salesperson_id, client_id, flavor_id = key
+    return DailySalesRollup(
+        day=day,
+        salesperson_id=salesperson_id,
+        client_id=client_id,
+        flavor_id=flavor_id,
+        **dict(zip(ROLLUP_COLUMNS, values))
+    )
+
+
+def rebuild_rollups(batch_size=1000):
+    """
+    Regenerates the whole rollup table from Order/OrderItem and their archive (sales/archive.py)
+    with two grouped queries each (one over items, one over orders) so the item join never
+    inflates order counts. Returns the number of rollup rows written.
+    """
+    rows = defaultdict(lambda: [0, Decimal('0'), Decimal('0')])
+    for order_model, item_model in ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)):
+        item_totals = item_model.objects.annotate(
+            day=TruncDate('order__order_date')
+        ).values(
+            'day', 'order__salesperson_id', 'order__client_id', 'flavor_id'
+        ).annotate(
+            liters=Sum('quantity_liters'),
+            amount=Sum('item_total'),
+        ).order_by()
+        for row in item_totals:
+            key = (row['day'], row['order__salesperson_id'], row['order__client_id'], row['flavor_id'])
+            rows[key][1] += row['liters']
+            rows[key][2] += row['amount']
+
+        order_counts = order_model.objects.annotate(
+            day=TruncDate('order_date'),
+            first_flavor_id=Subquery(
+                item_model.objects.filter(order=OuterRef('pk')).order_by('flavor_id').values('flavor_id')[:1]
+            ),
+        ).values(
+            'day', 'salesperson_id', 'client_id', 'first_flavor_id'
+        ).annotate(
+            num_orders=Count('id'),
+        ).order_by()
+        for row in order_counts:
+            key = (row['day'], row['salesperson_id'], row['client_id'], row['first_flavor_id'])
+            rows[key][0] += row['num_orders']
+
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailySalesRollup.objects.bulk_create(
+            [_build_row(key, values) for key, values in rows.items()],
+            batch_size=batch_size,
+        )
+    invalidate_all_reports()
+    return len(rows)
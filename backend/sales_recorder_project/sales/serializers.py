@@ -1,7 +1,12 @@
+from decimal import Decimal
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.db import transaction
 from django.db.models import Sum, F # Import Sum and F objects for calculations
-from .models import Order, OrderItem, Payment 
+from .models import Order, OrderItem, Payment, ReportJob
+from .rollups import apply_rollup_delta, order_contribution
+from .balances import adjust_client_balance, move_client_balance
+from .allocations import allocate_clients, rebuild_allocations
 from core.models import Flavor 
 from clients.models import Client 
 from core.serializers import FlavorSerializer
@@ -13,11 +18,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
     Serializer for OrderItem. Allows nesting within Order.
     """
     flavor = FlavorSerializer(read_only=True) # Display full flavor object
-    flavor_id = serializers.PrimaryKeyRelatedField(
-        queryset=Flavor.objects.all(),
-        source='flavor',
-        write_only=True # Only allow writing the ID
-    )
+    # Only allow writing the ID. It is resolved to a Flavor by OrderSerializer.validate_order_items
+    # for all items at once, with one query.
+    flavor_id = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = OrderItem
@@ -46,13 +49,32 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['total_amount', 'salesperson', 'created_at', 'updated_at']
 
+    def validate_order_items(self, order_items):
+        """
+        Resolves the flavor of every line item with one query instead of one query per item.
+        Read from the database rather than the flavor catalog, which another worker may hold for up
+        to FLAVOR_CATALOG_TTL after a price change: orders are always priced at the current price.
+        """
+        flavors = Flavor.objects.in_bulk({item['flavor_id'] for item in order_items})
+        errors = [
+            {} if item['flavor_id'] in flavors
+            else {'flavor_id': [f'Invalid pk "{item["flavor_id"]}" - object does not exist.']}
+            for item in order_items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in order_items:
+            item['flavor'] = flavors[item.pop('flavor_id')]
+        return order_items
+
     def validate(self, data):
         # Validate that client is assigned to salesperson if a salesperson is making the order
         request = self.context.get('request')
         user_profile = request.user.profile
 
         if user_profile.role == 'salesperson':
-            client = data.get('client')
+            # Partial updates (e.g. payment status) keep the order's current client
+            client = data.get('client', self.instance.client if self.instance else None)
             if not client or client.assigned_salesperson != user_profile:
                 raise serializers.ValidationError("Client not assigned to this salesperson.")
             if client.status != 'approved':
@@ -60,6 +82,35 @@ class OrderSerializer(serializers.ModelSerializer):
 
         return data
 
+    def build_order_items(self, order_items_data):
+        """
+        Prices the submitted line items in memory.
+        Returns unsaved OrderItem instances and the order total, so the order can be
+        inserted once with its final total and the items written with a single bulk insert.
+        """
+        order_items = []
+        total_order_amount = 0
+        for item_data in order_items_data:
+            flavor = item_data['flavor'] # This is the Flavor instance resolved by validate_order_items
+            quantity = item_data['quantity_liters']
+
+            # Get the current price from the Flavor model
+            price_per_liter = flavor.base_price_per_liter
+            item_total = quantity * price_per_liter
+
+            order_items.append(OrderItem(
+                flavor=flavor,
+                quantity_liters=quantity,
+                price_per_liter_at_sale=price_per_liter,
+                item_total=item_total
+            ))
+            total_order_amount += item_total
+        return order_items, total_order_amount
+
+    @staticmethod
+    def rollup_items(order_items):
+        return [(item.flavor_id, item.quantity_liters, item.item_total) for item in order_items]
+
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items')
 
@@ -69,69 +120,67 @@ class OrderSerializer(serializers.ModelSerializer):
         # Set the salesperson automatically based on the logged-in user
         validated_data['salesperson'] = user_profile
 
+        order_items, total_order_amount = self.build_order_items(order_items_data)
+
         with transaction.atomic():
-            order = Order.objects.create(**validated_data)
-            total_order_amount = 0
-
-            for item_data in order_items_data:
-                flavor = item_data['flavor'] # This is the Flavor instance from PrimaryKeyRelatedField
-                quantity = item_data['quantity_liters']
-
-                # Get the current price from the Flavor model
-                price_per_liter = flavor.base_price_per_liter
-                item_total = quantity * price_per_liter
-
-                OrderItem.objects.create(
-                    order=order,
-                    flavor=flavor,
-                    quantity_liters=quantity,
-                    price_per_liter_at_sale=price_per_liter, 
-                    item_total=item_total
-                )
-                total_order_amount += item_total
-
-            order.total_amount = total_order_amount
-            order.save()
+            order = Order.objects.create(total_amount=total_order_amount, **validated_data)
+            for item in order_items:
+                item.order = order
+            OrderItem.objects.bulk_create(order_items)
+            # Keep the daily sales rollup and the client's balance in step with the new order
+            apply_rollup_delta({}, order_contribution(order, self.rollup_items(order_items)))
+            adjust_client_balance(order.client_id, order.total_amount)
+            # Unallocated payments of the client (credit) go towards the new order
+            allocate_clients([order.client_id])
         return order
 
     def update(self, instance, validated_data):
-        # Allow updating order_items (e.g., adding/removing items)
-        # Allows full replacement of order_items.
+        # Allows full replacement of order_items when they are sent.
+        # Updates that leave order_items out (e.g. a PATCH of payment_status) keep the existing items.
         # For more complex updates (partial item updates), more logic would be needed.
-        order_items_data = validated_data.pop('order_items', [])
+        order_items_data = validated_data.pop('order_items', None)
 
         with transaction.atomic():
+            # Snapshot what the order currently contributes to the rollup before changing it
+            current_items = list(instance.order_items.values_list('flavor_id', 'quantity_liters', 'item_total'))
+            rollup_before = order_contribution(instance, current_items)
+            old_client_id, old_total = instance.client_id, instance.total_amount
+
             # Update main order fields
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
-            instance.save()
 
-            # Handle order items update
-            # Delete existing items and recreate new ones for simplicity
-            instance.order_items.all().delete()
-            total_order_amount = 0
-            for item_data in order_items_data:
-                flavor = item_data['flavor']
-                quantity = item_data['quantity_liters']
-                price_per_liter = flavor.base_price_per_liter 
-                item_total = quantity * price_per_liter
-
-                OrderItem.objects.create(
-                    order=instance,
-                    flavor=flavor,
-                    quantity_liters=quantity,
-                    price_per_liter_at_sale=price_per_liter, 
-                    item_total=item_total
-                )
-                total_order_amount += item_total
-
-            instance.total_amount = total_order_amount
+            if order_items_data is not None:
+                # Delete existing items and recreate new ones for simplicity
+                order_items, instance.total_amount = self.build_order_items(order_items_data)
+                instance.order_items.all().delete()
+                for item in order_items:
+                    item.order = instance
+                OrderItem.objects.bulk_create(order_items)
+                current_items = self.rollup_items(order_items)
+
             instance.save()
+            apply_rollup_delta(rollup_before, order_contribution(instance, current_items))
+            move_client_balance(old_client_id, old_total, instance.client_id, instance.total_amount)
+            # A new total or client re-settles the clients' orders; a payment_status-only PATCH is kept
+            # as a manual override until the next allocation for the client
+            if (old_client_id, old_total) != (instance.client_id, instance.total_amount):
+                rebuild_allocations([old_client_id, instance.client_id])
         return instance
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact order representation used inside payments: no items, client or salesperson.
+    """
+    class Meta:
+        model = Order
+        fields = ['id', 'order_date', 'total_amount', 'payment_status']
+        read_only_fields = fields
+
 class PaymentSerializer(serializers.ModelSerializer):
     """
     Serializer for the Payment model.
+    The order is summarised; ?expand=order returns the full nested order instead.
     """
     client = ClientSerializer(read_only=True) # Read-only nested client details
     client_id = serializers.PrimaryKeyRelatedField(
@@ -139,7 +188,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         source='client',
         write_only=True
     )
-    order = OrderSerializer(read_only=True) # Read-only nested order details
+    order = OrderSummarySerializer(read_only=True) # Read-only order summary
     order_id = serializers.PrimaryKeyRelatedField(
         queryset=Order.objects.all(),
         source='order',
@@ -148,6 +197,8 @@ class PaymentSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     recorded_by_salesperson = UserProfileSerializer(read_only=True) # Read-only nested salesperson profile
+    # Rich representations used when a relation is expanded (see core/fieldsets.py)
+    expanded_fields = {'order': OrderSerializer}
 
     class Meta:
         model = Payment
@@ -162,4 +213,48 @@ class PaymentSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user_profile = request.user.profile
         validated_data['recorded_by_salesperson'] = user_profile
-        return super().create(validated_data)
+        with transaction.atomic():
+            payment = super().create(validated_data)
+            # A payment lowers what the client owes and settles their oldest unpaid orders
+            adjust_client_balance(payment.client_id, -payment.amount_paid)
+            allocate_clients([payment.client_id])
+        return payment
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            old_client_id, old_amount, old_date = instance.client_id, instance.amount_paid, instance.payment_date
+            payment = super().update(instance, validated_data)
+            move_client_balance(old_client_id, -old_amount, payment.client_id, -payment.amount_paid)
+            if (old_client_id, old_amount, old_date) != (payment.client_id, payment.amount_paid, payment.payment_date):
+                rebuild_allocations([old_client_id, payment.client_id])
+        return payment
+
+class PaymentStatementRowSerializer(serializers.Serializer):
+    """
+    One line of a CSV payment statement (see sales/payment_import.py).
+    The client and order are only checked for existence later, for a whole batch at once.
+    """
+    client_id = serializers.IntegerField()
+    order_id = serializers.IntegerField(required=False)
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    payment_date = serializers.DateTimeField() # ISO 8601; a bare date means midnight
+    payment_method = serializers.CharField(max_length=50, required=False)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background report jobs; download_url is set once the file is ready.
+    """
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'params', 'status', 'rows_written', 'filename', 'error',
+            'download_url', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        return reverse('report-job-download', args=[obj.id], request=self.context.get('request'))
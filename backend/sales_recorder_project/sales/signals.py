@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from core.changefeed import record_tombstones
+from .allocations import rebuild_allocations
+from .balances import adjust_client_balance
+from .models import Order, Payment
+from .report_cache import invalidate_report_days
+from .rollups import apply_rollup_delta, order_day, stored_order_contribution
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollup(sender, instance, **kwargs):
+    """
+    Takes a deleted order (API, admin or queryset delete) back out of the daily sales rollup.
+    Runs inside the deletion transaction, before the cascade removes the order items.
+    """
+    apply_rollup_delta(stored_order_contribution(instance), {})
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_client_balance(sender, instance, **kwargs):
+    """
+    A deleted order no longer counts towards what the client owes.
+    """
+    adjust_client_balance(instance.client_id, -instance.total_amount)
+
+
+@receiver(pre_delete, sender=Order)
+def touch_order_payments(sender, instance, **kwargs):
+    """
+    The deletion unlinks the order's payments (SET_NULL) without saving them;
+    bump their updated_at so delta-sync clients pick up the change.
+    """
+    Payment.objects.filter(order=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Payment)
+def reallocate_client_payments(sender, instance, **kwargs):
+    """
+    The deletion removed the row's allocations (CASCADE); settle the client's orders again without it.
+    """
+    rebuild_allocations([instance.client_id])
+
+
+@receiver(post_delete, sender=Order)
+def record_order_tombstone(sender, instance, **kwargs):
+    record_tombstones(instance, [instance.salesperson_id])
+
+
+@receiver(post_delete, sender=Payment)
+def record_payment_tombstone(sender, instance, **kwargs):
+    record_tombstones(instance, [instance.recorded_by_salesperson_id])
+
+
+@receiver(pre_delete, sender=Payment)
+def remove_payment_from_client_balance(sender, instance, **kwargs):
+    """
+    A deleted payment no longer reduces what the client owes.
+    """
+    adjust_client_balance(instance.client_id, instance.amount_paid)
+
+
+def invalidate_order_reports(day):
+    """
+    Drops cached reports covering `day`, now and again once the write is committed
+    (a report built from the old data in between would otherwise stay cached).
+    """
+    invalidate_report_days([day])
+    transaction.on_commit(lambda: invalidate_report_days([day]))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    """
+    Item changes are covered too: the serializers and the admin inline always save the order
+    in the same transaction. (No OrderItem receivers, they would turn the bulk item deletes
+    into one query per row.)
+    """
+    invalidate_order_reports(order_day(instance))
+
@@ -1,3 +1,1008 @@
-from django.test import TestCase
+import csv
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from clients.models import Client
+from core.catalog import get_flavor_catalog
+from core.fastread import compile_serializer
+from core.replicas import RequestRouting, _routing
+from core.models import Flavor
+from users.models import User, UserProfile
+from .balances import reconcile_client_balances
+from .allocations import rebuild_allocations
+from .archive import archive
+from .models import ArchivedOrder, ArchivedPayment, DailySalesRollup, Order, Payment, PaymentAllocation, ReportJob
+from .reporting import summarize_orders, summarize_rollup
+from .rollups import rebuild_rollups
+from .serializers import OrderSerializer
 
-# Create your tests here.
+
+class SalesTestCase(TestCase):
+    """
+    Shared fixtures: an admin, a salesperson with an approved client and two flavors.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        admin_user = User.objects.create_user(username='admin', password='adminpassword')
+        cls.admin = UserProfile.objects.create(user=admin_user, role='admin')
+        sales_user = User.objects.create_user(username='john_doe', password='sales1password')
+        cls.salesperson = UserProfile.objects.create(user=sales_user, role='salesperson')
+        cls.client_obj = Client.objects.create(name='Corner Shop', status='approved', assigned_salesperson=cls.salesperson)
+        cls.mango = Flavor.objects.create(name='Mango', base_price_per_liter=Decimal('120.00'))
+        cls.passion = Flavor.objects.create(name='Passion', base_price_per_liter=Decimal('150.00'))
+
+    def setUp(self):
+        cache.clear() # Cached reports must not leak between tests
+        self.api = APIClient()
+        self.api.force_authenticate(self.salesperson.user)
+
+    def create_order(self, items, client=None):
+        response = self.api.post('/api/v1/orders/', {
+            'client_id': (client or self.client_obj).id,
+            'order_items': [{'flavor_id': flavor.id, 'quantity_liters': quantity} for flavor, quantity in items],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(pk=response.data['id'])
+
+    def pay(self, amount, days_ago=0, client=None):
+        response = self.api.post('/api/v1/payments/', {
+            'client_id': (client or self.client_obj).id, 'amount_paid': amount,
+            'payment_date': (timezone.now() - timedelta(days=days_ago)).isoformat(), 'payment_method': 'Cash',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Payment.objects.get(pk=response.data['id'])
+
+    def state(self):
+        allocations = sorted(PaymentAllocation.objects.values_list('payment_id', 'order_id', 'amount'))
+        return allocations, dict(Order.objects.values_list('id', 'payment_status'))
+
+    def rollup_rows(self):
+        return sorted(
+            (row.day, row.salesperson_id, row.client_id, row.flavor_id, row.order_count, row.total_liters, row.total_amount)
+            for row in DailySalesRollup.objects.all()
+            if row.order_count or row.total_liters or row.total_amount
+        )
+
+
+class DailySalesRollupTests(SalesTestCase):
+
+    def test_create_update_and_delete_keep_rollup_in_step_with_rebuild(self):
+        first = self.create_order([(self.mango, '2.00'), (self.passion, '1.50')])
+        self.create_order([(self.passion, '3.00')])
+
+        response = self.api.put(f'/api/v1/orders/{first.id}/', {
+            'client_id': self.client_obj.id,
+            'order_items': [{'flavor_id': self.passion.id, 'quantity_liters': '4.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        incremental = self.rollup_rows()
+
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(sum(row.order_count for row in DailySalesRollup.objects.all()), 2)
+
+        self.api.force_authenticate(self.admin.user)
+        self.assertEqual(self.api.delete(f'/api/v1/orders/{first.id}/').status_code, 204)
+        totals = [(row[4], row[5], row[6]) for row in self.rollup_rows()]
+        self.assertEqual(totals, [(1, Decimal('3.00'), Decimal('450.00'))])
+
+    def test_weekly_report_reads_rollup(self):
+        order = self.create_order([(self.mango, '2.00'), (self.passion, '1.00')])
+        day = order.order_date.date()
+        response = self.api.get('/api/v1/reports/sales/weekly/', {'start_date': day, 'end_date': day})
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[1], f'{day},390,1,3')
+
+
+class DailySalesReportTests(SalesTestCase):
+
+    def test_daily_report_streams_one_line_per_order(self):
+        order = self.create_order([(self.mango, '2.00'), (self.passion, '1.00')])
+        day = order.order_date.date()
+        response = self.api.get('/api/v1/reports/sales/daily/', {'date': day})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[1:], [f'{order.id},Corner Shop,john_doe,{day},390.00,outstanding,3'])
+
+
+class KeysetPaginationTests(SalesTestCase):
+
+    def test_pages_follow_order_date_then_id_without_counting(self):
+        orders = [self.create_order([(self.mango, '1.00')]) for _ in range(5)]
+        # Give two orders the same timestamp so the id tie-breaker is exercised
+        Order.objects.filter(pk=orders[1].pk).update(order_date=orders[2].order_date)
+
+        seen = []
+        url = '/api/v1/orders/?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.get(url)
+            # The only aggregate is the conditional-GET validator; the paginator itself never counts
+            counting = [query['sql'] for query in queries.captured_queries if 'COUNT(' in query['sql']]
+            self.assertEqual(len(counting), 1)
+            self.assertIn('MAX(', counting[0])
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Order.objects.order_by('-order_date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.api.get('/api/v1/orders/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderWritePathTests(SalesTestCase):
+
+    def save_order(self, item_count, instance=None):
+        request = Request(APIRequestFactory().post('/api/v1/orders/'))
+        request.user = self.salesperson.user
+        serializer = OrderSerializer(instance, data={
+            'client_id': self.client_obj.id,
+            'order_items': [
+                {'flavor_id': (self.mango if i % 2 else self.passion).id, 'quantity_liters': '1.50'}
+                for i in range(item_count)
+            ],
+        }, context={'request': request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as queries:
+            order = serializer.save()
+        return order, len(queries)
+
+    def test_create_costs_a_fixed_number_of_queries(self):
+        self.save_order(2) # creates the rollup rows the next orders will increment
+        order, single = self.save_order(2)
+        _, many = self.save_order(20)
+        # savepoint, order insert, item bulk insert, rollup select + update, client balance,
+        # unallocated payments of the client, unpaid orders dated before allocated ones, release
+        self.assertEqual(single, 9)
+        self.assertEqual(many, single)
+        self.assertEqual(order.total_amount, Decimal('405.00'))
+        self.assertEqual(order.order_items.count(), 2)
+
+    def test_orders_are_priced_at_the_stored_price(self):
+        get_flavor_catalog()
+        # A price change made by another worker: this process's catalog is not invalidated
+        Flavor.objects.filter(pk=self.mango.pk).update(base_price_per_liter=Decimal('130.00'))
+        order = self.create_order([(self.mango, '1.00')])
+        self.assertEqual(order.total_amount, Decimal('130.00'))
+
+    def test_update_costs_a_fixed_number_of_queries(self):
+        order, _ = self.save_order(3)
+        _, few = self.save_order(2, instance=order)
+        order, many = self.save_order(20, instance=order)
+        self.assertEqual(many, few)
+        self.assertEqual(order.total_amount, Decimal('4050.00'))
+        self.assertEqual(order.order_items.count(), 20)
+
+    def test_unknown_flavor_is_rejected_per_item(self):
+        response = self.api.post('/api/v1/orders/', {
+            'client_id': self.client_obj.id,
+            'order_items': [
+                {'flavor_id': self.mango.id, 'quantity_liters': '1.00'},
+                {'flavor_id': 9999, 'quantity_liters': '1.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['order_items'][0], {})
+        self.assertIn('flavor_id', response.data['order_items'][1])
+
+    def test_partial_update_keeps_items(self):
+        order = self.create_order([(self.mango, '2.00')])
+        response = self.api.patch(f'/api/v1/orders/{order.id}/', {'payment_status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, 'paid')
+        self.assertEqual(order.total_amount, Decimal('240.00'))
+        self.assertEqual(order.order_items.count(), 1)
+
+
+class ClientBalanceTests(SalesTestCase):
+
+    def balance(self):
+        self.client_obj.refresh_from_db()
+        return self.client_obj.outstanding_balance
+
+    def record_payment(self, amount):
+        response = self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id,
+            'amount_paid': amount,
+            'payment_date': '2025-01-01T10:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Payment.objects.get(pk=response.data['id'])
+
+    def test_orders_and_payments_keep_the_stored_balance_current(self):
+        order = self.create_order([(self.mango, '2.00')])
+        payment = self.record_payment('100.00')
+        self.assertEqual(self.balance(), Decimal('140.00'))
+
+        self.api.put(f'/api/v1/orders/{order.id}/', {
+            'client_id': self.client_obj.id,
+            'order_items': [{'flavor_id': self.passion.id, 'quantity_liters': '2.00'}],
+        }, format='json')
+        self.api.patch(f'/api/v1/payments/{payment.id}/', {'amount_paid': '50.00'}, format='json')
+        self.assertEqual(self.balance(), Decimal('250.00'))
+
+        Payment.objects.get(pk=payment.pk).delete()
+        self.assertEqual(self.balance(), Decimal('300.00'))
+        Order.objects.get(pk=order.pk).delete()
+        self.assertEqual(self.balance(), Decimal('0.00'))
+        response = self.api.get(f'/api/v1/clients/{self.client_obj.id}/')
+        self.assertEqual(response.data['outstanding_balance'], '0.00')
+
+    def test_reconcile_fixes_drifted_balances(self):
+        self.create_order([(self.mango, '1.00')])
+        Client.objects.update(outstanding_balance=0)
+        self.assertEqual(reconcile_client_balances(dry_run=True), 1)
+        self.assertEqual(reconcile_client_balances(), 1)
+        self.assertEqual(self.balance(), Decimal('120.00'))
+        self.assertEqual(reconcile_client_balances(), 0)
+
+
+class ReportAggregationTests(SalesTestCase):
+
+    def test_multi_item_orders_are_not_inflated(self):
+        self.create_order([(self.mango, '2.00'), (self.passion, '1.00')])
+        self.create_order([(self.mango, '1.00'), (self.passion, '1.00'), (self.passion, '0.50')])
+        group_by = ('salesperson__user__username',)
+
+        with self.assertNumQueries(1):
+            from_orders = summarize_orders(Order.objects.all(), 'month', group_by)
+        with self.assertNumQueries(1):
+            from_rollup = summarize_rollup(DailySalesRollup.objects.all(), 'month', group_by)
+
+        self.assertEqual(len(from_orders), 1)
+        row = from_orders[0]
+        self.assertEqual((row['total_sales'], row['num_orders'], row['total_liters']), (Decimal('735.00'), 2, Decimal('5.50')))
+        self.assertEqual(
+            [(r['period'], r['total_sales'], r['num_orders'], r['total_liters']) for r in from_rollup],
+            [(r['period'], r['total_sales'], r['num_orders'], r['total_liters']) for r in from_orders],
+        )
+
+
+class SeedBenchmarkDataTests(TestCase):
+
+    def test_seed_keeps_rollup_and_balances_consistent(self):
+        call_command(
+            'seed_benchmark_data', salespersons=2, clients=10, flavors=3, orders=40, payments=15,
+            batch_size=16, seed=7, stdout=StringIO(),
+        )
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Payment.objects.count(), 15)
+        rollup_orders = sum(DailySalesRollup.objects.values_list('order_count', flat=True))
+        self.assertEqual(rollup_orders, 40)
+        self.assertEqual(reconcile_client_balances(dry_run=True), 0)
+        # Dates come from the generator, not from auto_now_add
+        self.assertGreater(Order.objects.dates('order_date', 'day').count(), 1)
+
+    def test_every_salesperson_gets_an_approved_client(self):
+        call_command(
+            'seed_benchmark_data', salespersons=4, clients=4, flavors=1, orders=5, payments=5, seed=3, stdout=StringIO(),
+        )
+        salespersons = UserProfile.objects.filter(role='salesperson')
+        self.assertEqual(
+            set(Client.objects.filter(status='approved').values_list('assigned_salesperson', flat=True)),
+            set(salespersons.values_list('id', flat=True)),
+        )
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark_data', salespersons=2, clients=1, stdout=StringIO())
+
+
+@override_settings(REPORT_JOBS_RUNNER='worker', REPORT_JOBS_DIR=tempfile.mkdtemp())
+class ReportJobTests(SalesTestCase):
+
+    def test_async_report_matches_the_synchronous_one(self):
+        order = self.create_order([(self.mango, '2.00'), (self.passion, '1.00')])
+        params = {'start_date': order.order_date.date(), 'end_date': order.order_date.date()}
+        expected = self.api.get('/api/v1/reports/sales/weekly/', params).content
+
+        response = self.api.get('/api/v1/reports/sales/weekly/', {**params, 'async': '1'})
+        self.assertEqual(response.status_code, 202)
+        status_url = response['Location']
+        self.assertEqual(self.api.get(status_url).data['status'], 'queued')
+        self.assertEqual(self.api.get(f"{status_url}download/").status_code, 409)
+
+        call_command('run_report_worker', once=True, stdout=StringIO())
+        job = self.api.get(status_url).data
+        self.assertEqual((job['status'], job['rows_written']), ('done', 1))
+        download = self.api.get(job['download_url'])
+        self.assertEqual(b''.join(download.streaming_content), expected)
+
+    def test_jobs_left_running_by_a_dead_process_are_run_again(self):
+        self.api.get('/api/v1/reports/sales/monthly/', {'year': 2025, 'month': 1, 'async': '1'})
+        ReportJob.objects.update(status='running', started_at=timezone.now())
+        call_command('run_report_worker', once=True, stdout=StringIO())
+        self.assertEqual(ReportJob.objects.get().status, 'running') # Still within REPORT_JOBS_TIMEOUT
+
+        ReportJob.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        call_command('run_report_worker', once=True, stdout=StringIO())
+        self.assertEqual(ReportJob.objects.get().status, 'done')
+
+    def test_post_enqueues_and_validates(self):
+        response = self.api.post('/api/v1/reports/sales/monthly/', {'year': '2025'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'detail': 'Year and month parameters are required.'})
+
+        response = self.api.post('/api/v1/reports/sales/monthly/', {'year': '2025', 'month': '1'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = ReportJob.objects.get()
+        self.assertEqual(job.params, {'year': '2025', 'month': '1'})
+
+    def test_jobs_are_private_and_yearly_stays_admin_only(self):
+        self.assertEqual(self.api.get('/api/v1/reports/sales/yearly/', {'year': 2025, 'async': '1'}).status_code, 403)
+        self.api.force_authenticate(self.admin.user)
+        job_url = self.api.get('/api/v1/reports/sales/yearly/', {'year': 2025, 'async': '1'})['Location']
+        self.api.force_authenticate(self.salesperson.user)
+        self.assertEqual(self.api.get(job_url).status_code, 404)
+
+
+class ReportCacheTests(SalesTestCase):
+
+    def monthly(self):
+        return self.api.get('/api/v1/reports/sales/monthly/', {'year': 2024, 'month': 3}).content
+
+    def test_writes_only_invalidate_the_periods_they_touch(self):
+        old = self.create_order([(self.mango, '2.00')])
+        Order.objects.filter(pk=old.pk).update(order_date='2024-03-10T10:00:00Z')
+        rebuild_rollups()
+
+        report = self.monthly()
+        self.assertIn(b'2024-03,240', report)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.monthly(), report)
+
+        # A sale today leaves March 2024 cached
+        self.create_order([(self.passion, '1.00')])
+        with self.assertNumQueries(0):
+            self.monthly()
+
+        # Touching the March order recomputes it
+        self.api.patch(f'/api/v1/orders/{old.id}/', {'payment_status': 'paid'}, format='json')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.monthly(), report)
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(REPORT_CACHE_PROCESS_LOCAL=False)
+    def test_process_local_cache_is_skipped_when_not_allowed(self):
+        self.monthly()
+        with CaptureQueriesContext(connection) as queries:
+            self.monthly()
+        self.assertEqual(len(queries), 1)
+
+    def test_roles_are_cached_separately(self):
+        other = UserProfile.objects.create(user=User.objects.create_user(username='jane'), role='salesperson')
+        other_client = Client.objects.create(name='Kiosk', status='approved', assigned_salesperson=other)
+        self.create_order([(self.mango, '1.00')])
+        self.api.force_authenticate(other.user)
+        self.api.post('/api/v1/orders/', {
+            'client_id': other_client.id,
+            'order_items': [{'flavor_id': self.mango.id, 'quantity_liters': '1.00'}],
+        }, format='json')
+
+        day = timezone.localdate()
+        params = {'start_date': day, 'end_date': day}
+        self.assertIn(b',120,1,', self.api.get('/api/v1/reports/sales/weekly/', params).content)
+        self.api.force_authenticate(self.admin.user)
+        self.assertIn(b',240,2,', self.api.get('/api/v1/reports/sales/weekly/', params).content)
+
+
+class SparseFieldsTests(SalesTestCase):
+
+    def test_fields_trim_the_response_and_the_query(self):
+        for _ in range(3):
+            self.create_order([(self.mango, '1.00'), (self.passion, '2.00')])
+        params = {'fields': 'id,order_date,client.name,total_amount,payment_status'}
+        # The ETag validator aggregate plus the page itself
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/v1/orders/', params)
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'order_date', 'client', 'total_amount', 'payment_status'})
+        self.assertEqual(row['client'], {'name': 'Corner Shop'})
+
+    def test_relations_collapse_to_ids_unless_expanded(self):
+        order = self.create_order([(self.mango, '1.00')])
+        payment = self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id, 'order_id': order.id,
+            'amount_paid': '10.00', 'payment_date': '2025-01-01T10:00:00Z',
+        }, format='json').data
+        response = self.api.get(f"/api/v1/payments/{payment['id']}/", {'fields': 'id,order,client'})
+        self.assertEqual(response.data, {'id': payment['id'], 'client': self.client_obj.id, 'order': order.id})
+
+        response = self.api.get('/api/v1/orders/', {'fields': 'id,order_items', 'expand': 'order_items'})
+        self.assertEqual(response.data['results'][0]['order_items'][0]['flavor']['name'], 'Mango')
+
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/v1/clients/', {'fields': 'id,name,assigned_salesperson.user.username'})
+        self.assertEqual(response.data['results'][0]['assigned_salesperson'], {'user': {'username': 'john_doe'}})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.api.get('/api/v1/orders/', {'fields': 'id,client.nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'detail': 'Unknown field(s): client.nope.'})
+
+
+class PaymentRepresentationTests(SalesTestCase):
+
+    def record_payments(self, count):
+        order = self.create_order([(self.mango, '1.00'), (self.passion, '1.00')])
+        for _ in range(count):
+            self.api.post('/api/v1/payments/', {
+                'client_id': self.client_obj.id, 'order_id': order.id,
+                'amount_paid': '10.00', 'payment_date': '2025-01-01T10:00:00Z',
+            }, format='json')
+        return order
+
+    def test_payment_pages_cost_a_fixed_number_of_queries(self):
+        order = self.record_payments(1)
+        with CaptureQueriesContext(connection) as single:
+            self.api.get('/api/v1/payments/')
+        self.record_payments(6)
+        with CaptureQueriesContext(connection) as many:
+            response = self.api.get('/api/v1/payments/')
+        self.assertEqual(len(single), 2) # ETag validator + page
+        self.assertEqual(len(many), len(single))
+        self.assertEqual(response.data['results'][-1]['order'], {
+            'id': order.id, 'order_date': response.data['results'][-1]['order']['order_date'],
+            'total_amount': '270.00', 'payment_status': 'outstanding',
+        })
+
+    def test_full_order_only_when_expanded(self):
+        self.record_payments(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/v1/payments/', {'expand': 'order'})
+        order = response.data['results'][0]['order']
+        self.assertEqual(order['client']['name'], 'Corner Shop')
+        self.assertEqual(len(order['order_items']), 2)
+        self.assertLessEqual(len(queries), 3)
+
+
+class ConditionalGetTests(SalesTestCase):
+
+    def test_unchanged_list_answers_304_from_one_aggregate(self):
+        self.create_order([(self.mango, '1.00')])
+        response = self.api.get('/api/v1/orders/')
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 1)
+        self.assertIn('MAX(', queries[0]['sql'])
+
+    def test_writes_change_the_list_etag(self):
+        order = self.create_order([(self.mango, '1.00')])
+        etag = self.api.get('/api/v1/orders/')['ETag']
+        # A payment changes the nested client's balance, not the order row
+        self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id, 'amount_paid': '10.00', 'payment_date': '2025-01-01T10:00:00Z',
+        }, format='json')
+        response = self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.api.delete(f'/api/v1/orders/{order.id}/')
+        self.assertEqual(self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_username_changes_change_the_etags(self):
+        order = self.create_order([(self.mango, '1.00')])
+        list_etag = self.api.get('/api/v1/orders/')['ETag']
+        detail_etag = self.api.get(f'/api/v1/orders/{order.id}/')['ETag']
+        user = self.salesperson.user
+        user.username = 'john_kamau'
+        user.save()
+        response = self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.api.get(f'/api/v1/orders/{order.id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('john_kamau', response.content.decode())
+
+    def test_flavor_changes_change_the_order_etags(self):
+        order = self.create_order([(self.mango, '1.00')])
+        list_etag = self.api.get('/api/v1/orders/')['ETag']
+        detail_etag = self.api.get(f'/api/v1/orders/{order.id}/')['ETag']
+        Flavor.objects.filter(pk=self.mango.pk).update(name='Ripe Mango', updated_at=timezone.now())
+        self.assertEqual(self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+        self.assertEqual(self.api.get(f'/api/v1/orders/{order.id}/', HTTP_IF_NONE_MATCH=detail_etag).status_code, 200)
+
+    def test_detail_uses_the_row_updated_at(self):
+        order = self.create_order([(self.mango, '1.00')])
+        url = f'/api/v1/orders/{order.id}/'
+        response = self.api.get(url)
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.api.patch(url, {'payment_status': 'paid'}, format='json')
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_etag_depends_on_user_and_query(self):
+        self.create_order([(self.mango, '1.00')])
+        etag = self.api.get('/api/v1/orders/')['ETag']
+        self.assertEqual(self.api.get('/api/v1/orders/', {'page_size': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.api.force_authenticate(self.admin.user)
+        self.assertEqual(self.api.get('/api/v1/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CHANGE_FEED_OVERLAP=0)
+class ChangeFeedTests(SalesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.since = (timezone.now() - timedelta(minutes=1)).isoformat()
+
+    def sync(self, url, since):
+        response = self.api.get(url, {'updated_since': since})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_feed_returns_changes_deletions_and_a_new_watermark(self):
+        kept, changed, removed = (self.create_order([(self.mango, '1.00')]) for _ in range(3))
+        watermark = self.sync('/api/v1/orders/', self.since)['watermark']
+
+        self.api.patch(f'/api/v1/orders/{changed.id}/', {'payment_status': 'paid'}, format='json')
+        self.api.delete(f'/api/v1/orders/{removed.id}/')
+        added = self.create_order([(self.passion, '1.00')])
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.sync('/api/v1/orders/', watermark)
+        self.assertEqual([order['id'] for order in data['results']], [changed.id, added.id])
+        self.assertEqual((data['deleted'], data['reset']), ([removed.id], False))
+        self.assertGreater(data['watermark'], watermark)
+        self.assertTrue(any('"updated_at" >' in query['sql'] for query in queries.captured_queries))
+
+        data = self.sync('/api/v1/orders/', data['watermark'])
+        self.assertEqual((data['results'], data['deleted']), ([], []))
+        self.assertTrue(Order.objects.filter(pk=kept.pk).exists())
+
+    def test_deletions_are_scoped_to_the_salesperson(self):
+        other = UserProfile.objects.create(user=User.objects.create_user(username='jane_smith'), role='salesperson')
+        payment = Payment.objects.create(
+            client=self.client_obj, amount_paid=Decimal('10.00'), payment_date=timezone.now(), recorded_by_salesperson=other
+        )
+        payment_id = payment.id
+        payment.delete()
+        self.assertEqual(self.sync('/api/v1/payments/', self.since)['deleted'], [])
+        self.api.force_authenticate(self.admin.user)
+        self.assertEqual(self.sync('/api/v1/payments/', self.since)['deleted'], [payment_id])
+
+    def test_deleting_an_order_resyncs_its_payments(self):
+        order = self.create_order([(self.mango, '1.00')])
+        payment = self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id, 'order_id': order.id,
+            'amount_paid': '10.00', 'payment_date': '2025-01-01T10:00:00Z',
+        }, format='json').data
+        watermark = self.sync('/api/v1/payments/', self.since)['watermark']
+        self.api.delete(f'/api/v1/orders/{order.id}/')
+        data = self.sync('/api/v1/payments/', watermark)
+        self.assertEqual([(row['id'], row['order']) for row in data['results']], [(payment['id'], None)])
+
+    def test_client_leaving_the_salespersons_list_is_a_deletion(self):
+        requested = self.api.post('/api/v1/clients/', {'name': 'Kiosk'}, format='json').data
+        watermark = self.sync('/api/v1/clients/', self.since)['watermark']
+        self.api.force_authenticate(self.admin.user)
+        self.api.post(f"/api/v1/clients/{requested['id']}/reject/")
+        self.api.force_authenticate(self.salesperson.user)
+        self.assertEqual(self.sync('/api/v1/clients/', watermark)['deleted'], [requested['id']])
+
+    def test_deletions_wait_for_the_last_page(self):
+        for _ in range(3):
+            self.create_order([(self.mango, '1.00')])
+        self.create_order([(self.mango, '1.00')]).delete()
+        first = self.api.get('/api/v1/orders/', {'updated_since': self.since, 'page_size': 2}).data
+        self.assertEqual(first['deleted'], [])
+        self.assertEqual(parse_datetime(first['watermark']), parse_datetime(self.since))
+        last = self.api.get(first['next']).data
+        self.assertIsNone(last['next'])
+        self.assertEqual(len(last['deleted']), 1)
+
+    def test_old_timestamps_reset_the_client_copy(self):
+        self.create_order([(self.mango, '1.00')]).delete()
+        kept = self.create_order([(self.mango, '1.00')])
+        data = self.sync('/api/v1/orders/', '1970-01-01T00:00:00Z')
+        self.assertEqual(([order['id'] for order in data['results']], data['deleted'], data['reset']), ([kept.id], [], True))
+        self.assertEqual(self.api.get('/api/v1/orders/', {'updated_since': 'yesterday'}).status_code, 400)
+
+
+class FastReadTests(SalesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_order([(self.mango, '1.50'), (self.passion, '2.25')])
+        order = self.create_order([(self.passion, '10')])
+        self.create_order([(self.mango, '0.01')])
+        self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id, 'order_id': order.id, 'amount_paid': '99.9',
+            'payment_date': '2025-01-01T10:00:00.123456Z', 'payment_method': 'Mpesa',
+        }, format='json')
+        self.api.post('/api/v1/payments/', {
+            'client_id': self.client_obj.id, 'amount_paid': '5', 'payment_date': '2025-02-01T10:00:00Z',
+        }, format='json')
+        self.api.post('/api/v1/clients/', {'name': 'Kiosk é', 'phone_number': '0700'}, format='json')
+
+    def test_list_pages_are_byte_for_byte_identical_to_the_serializers(self):
+        since = (timezone.now() - timedelta(minutes=1)).isoformat()
+        cases = [
+            ('/api/v1/orders/', {}),
+            ('/api/v1/orders/', {'fields': 'id,client.name,order_items.flavor.name,total_amount'}),
+            ('/api/v1/orders/', {'expand': 'order_items', 'fields': 'id,order_items'}),
+            ('/api/v1/orders/', {'updated_since': since, 'page_size': 2}),
+            ('/api/v1/payments/', {}),
+            ('/api/v1/payments/', {'expand': 'order'}),
+            ('/api/v1/payments/', {'fields': 'id,order,client'}),
+            ('/api/v1/clients/', {}),
+            ('/api/v1/clients/', {'ordering': '-outstanding_balance', 'fields': 'id,outstanding_balance,assigned_salesperson'}),
+        ]
+        for profile in (self.salesperson, self.admin):
+            self.api.force_authenticate(profile.user)
+            for url, params in cases:
+                with self.subTest(role=profile.role, url=url, params=params):
+                    with override_settings(FAST_READ_SERIALIZERS=False):
+                        expected = self.api.get(url, params)
+                    actual = self.api.get(url, params)
+                    self.assertEqual(actual.status_code, 200)
+                    self.assertEqual(actual.content, expected.content)
+                    self.assertIn(b'"results":[{', actual.content)
+
+    def test_compiled_representation_matches_serializer_data(self):
+        request = Request(APIRequestFactory().get('/api/v1/orders/'))
+        request.user = self.admin.user
+        orders = Order.objects.prefetch_related('order_items__flavor').order_by('id')
+        serializer = OrderSerializer(orders, many=True, context={'request': request})
+        self.assertEqual(compile_serializer(serializer)(orders), OrderSerializer(orders, many=True, context={'request': request}).data)
+
+
+class PaymentImportTests(SalesTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_client = Client.objects.create(name='Kiosk', status='approved')
+
+    def upload(self, lines, query=''):
+        statement = SimpleUploadedFile('statement.csv', ('\ufeff' + '\r\n'.join(lines)).encode(), content_type='text/csv')
+        return self.api.post(f'/api/v1/payments/import/{query}', {'file': statement}, format='multipart')
+
+    def outcomes(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_imports_valid_rows_in_one_batch_and_reports_every_row(self):
+        order = self.create_order([(self.mango, '2.00')]) # 240.00
+        other_order = Order.objects.create(client=self.other_client, salesperson=self.admin, total_amount=Decimal('0.00'))
+        header = 'client_id,order_id,amount_paid,payment_date,payment_method,reference'
+        valid = [f'{self.client_obj.id},{order.id},240.00,2025-08-01 09:30,Mpesa,QX1', f'{self.client_obj.id},,15.50,2025-08-02,,']
+        invalid = [
+            f'{self.client_obj.id},,-5,2025-08-01,Cash,', # Negative amount
+            f'{self.other_client.id},,10,2025-08-01,Cash,', # Not this salesperson's client
+            f'{self.client_obj.id},{other_order.id},10,2025-08-01,Cash,', # Another client's order
+            f'{self.client_obj.id},,10,yesterday,Cash,',
+        ]
+        with CaptureQueriesContext(connection) as small:
+            self.outcomes(self.upload([header] + valid[:1] + invalid[:1]))
+        Payment.objects.all().delete()
+        self.client_obj.refresh_from_db()
+        self.assertEqual(self.client_obj.outstanding_balance, Decimal('240.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.outcomes(self.upload([header] + valid + invalid + valid * 5))
+        self.assertEqual(len(queries), len(small)) # Lookups, insert and balance update per batch, not per row
+        self.assertEqual([row['row'] for row in rows], [str(line) for line in range(2, 18)])
+        self.assertEqual([row['status'] for row in rows].count('created'), 12)
+        self.assertEqual([row['status'] for row in rows[:6]], ['created', 'created', 'error', 'error', 'error', 'error'])
+        self.assertTrue(rows[2]['errors'].startswith('amount_paid: '))
+        self.assertEqual(rows[3]['errors'], "client_id: Client not found or not assigned to this salesperson.")
+        self.assertEqual(rows[4]['errors'], "order_id: Order not found for this client.")
+        self.assertTrue(rows[5]['errors'].startswith('payment_date: '))
+
+        payment = Payment.objects.get(pk=rows[0]['payment_id'])
+        self.assertEqual((payment.order, payment.amount_paid, payment.payment_method), (order, Decimal('240.00'), 'Mpesa'))
+        self.assertEqual(payment.recorded_by_salesperson, self.salesperson)
+        self.assertEqual(Payment.objects.count(), 12)
+        self.client_obj.refresh_from_db()
+        self.assertEqual(self.client_obj.outstanding_balance, Decimal('240.00') - 6 * Decimal('255.50'))
+        self.assertEqual(reconcile_client_balances(dry_run=True), 0)
+
+    def test_dry_run_and_missing_columns(self):
+        response = self.upload(['client_id,amount_paid,payment_date', f'{self.client_obj.id},10,2025-08-01'], '?dry_run=true')
+        self.assertEqual(self.outcomes(response), [{'row': '2', 'status': 'valid', 'payment_id': '', 'errors': ''}])
+        self.assertFalse(Payment.objects.exists())
+
+        response = self.upload(['client_id,amount', f'{self.client_obj.id},10'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], "The statement is missing the column(s): amount_paid, payment_date.")
+
+    def test_management_command_writes_a_csv_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/statement.csv'
+            with open(path, 'w', newline='') as statement:
+                statement.write(f'client_id,amount_paid,payment_date\n{self.other_client.id},25.00,2025-08-01\n0,1,2025-08-01\n')
+            report, summary = StringIO(), StringIO()
+            call_command('import_payment_statement', path, recorded_by='admin', batch_size=1, stdout=report, stderr=summary)
+        payment = Payment.objects.get()
+        self.assertEqual(report.getvalue().splitlines(), [
+            'row,status,payment_id,errors',
+            f'2,created,{payment.id},',
+            '3,error,,client_id: Client not found or not assigned to this salesperson.',
+        ])
+        self.assertIn('1 payments created, 1 rows failed', summary.getvalue())
+        self.other_client.refresh_from_db()
+        self.assertEqual(self.other_client.outstanding_balance, Decimal('-25.00'))
+
+
+class PaymentAllocationTests(SalesTestCase):
+
+    def test_payments_settle_the_oldest_orders_first(self):
+        first = self.create_order([(self.mango, '2.00')]) # 240.00
+        second = self.create_order([(self.passion, '1.00')]) # 150.00
+        updated_at = Order.objects.get(pk=first.pk).updated_at
+
+        payment = self.pay('300.00')
+        self.assertEqual(self.state(), (
+            [(payment.id, first.id, Decimal('240.00')), (payment.id, second.id, Decimal('60.00'))],
+            {first.id: 'paid', second.id: 'outstanding'},
+        ))
+        self.assertGreater(Order.objects.get(pk=first.pk).updated_at, updated_at) # Seen by the change feed
+
+        # The 10.00 left over is credit the next order starts with
+        top_up = self.pay('100.00')
+        third = self.create_order([(self.mango, '1.00')])
+        allocations, statuses = self.state()
+        self.assertEqual(allocations[-2:], [(top_up.id, second.id, Decimal('90.00')), (top_up.id, third.id, Decimal('10.00'))])
+        self.assertEqual(statuses, {first.id: 'paid', second.id: 'paid', third.id: 'outstanding'})
+
+        # The set-based rebuild reaches the same result
+        incremental = self.state()
+        self.assertEqual(rebuild_allocations(), 4)
+        self.assertEqual(self.state(), incremental)
+
+        # Taking money away re-settles the client: the first payment now covers the first order only
+        self.api.force_authenticate(self.admin.user)
+        self.assertEqual(self.api.delete(f'/api/v1/payments/{top_up.id}/').status_code, 204)
+        self.assertEqual(self.state()[1], {first.id: 'paid', second.id: 'outstanding', third.id: 'outstanding'})
+
+    def test_rebuild_is_set_based_and_follows_payment_dates(self):
+        other = Client.objects.create(name='Kiosk', status='approved', assigned_salesperson=self.salesperson)
+        orders = [self.create_order([(self.mango, '1.00')]) for _ in range(3)] # 120.00 each
+        late = self.pay('120.00')
+        early = self.pay('130.00', days_ago=1)
+        self.pay('50.00', client=other) # Credit of another client never pays these orders
+        PaymentAllocation.objects.all().delete()
+        Order.objects.update(payment_status='outstanding')
+
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_allocations()
+        # savepoint, delete, insert ... select, days to mark paid + update, days to mark outstanding (none), release
+        self.assertEqual(len(queries), 7)
+        allocations, statuses = self.state()
+        self.assertEqual(allocations, sorted([
+            (early.id, orders[0].id, Decimal('120.00')), (early.id, orders[1].id, Decimal('10.00')),
+            (late.id, orders[1].id, Decimal('110.00')), (late.id, orders[2].id, Decimal('10.00')),
+        ]))
+        self.assertEqual([statuses[order.id] for order in orders], ['paid', 'paid', 'outstanding'])
+
+    def test_backdated_payment_is_allocated_like_a_rebuild(self):
+        older, newer = self.create_order([(self.mango, '1.00')]), self.create_order([(self.mango, '1.00')])
+        for order, days in ((older, 10), (newer, 5)):
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days))
+        today = self.pay('120.00')
+        backdated = self.pay('120.00', days_ago=20)
+
+        allocations, statuses = self.state()
+        self.assertEqual(allocations, sorted([
+            (backdated.id, older.id, Decimal('120.00')), (today.id, newer.id, Decimal('120.00')),
+        ]))
+        self.assertEqual(statuses, {older.id: 'paid', newer.id: 'paid'})
+        rebuild_allocations()
+        self.assertEqual(self.state(), (allocations, statuses))
+
+
+@override_settings(REPLICA_DATABASE_ALIAS='replica')
+class ReadReplicaRoutingTests(SalesTestCase):
+    """
+    The 'replica' alias is served by the test database's own connection here, so every query works
+    and the tests look at where each request chose to read (request.db_routing).
+    """
+
+    def setUp(self):
+        super().setUp()
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.__delitem__, 'replica')
+
+    def read_alias(self, response):
+        self.assertEqual(response.status_code, 200)
+        return response.wsgi_request.db_routing.read_alias
+
+    def test_writer_reads_own_writes_from_primary_while_others_use_replica(self):
+        admin = APIClient()
+        admin.force_authenticate(self.admin.user)
+        self.assertEqual(self.read_alias(self.api.get('/api/v1/orders/')), 'replica')
+
+        order = self.create_order([(self.mango, '1.00')])
+        response = self.api.get('/api/v1/orders/')
+        self.assertEqual(self.read_alias(response), 'default')
+        self.assertEqual([row['id'] for row in response.data['results']], [order.id])
+        self.assertEqual(self.read_alias(admin.get(f'/api/v1/orders/{order.id}/')), 'replica')
+        self.assertEqual(self.read_alias(admin.get('/api/v1/reports/sales/daily/', {'date': order.order_date.date()})), 'replica')
+
+        # Change feeds and views that did not opt in stay on the primary
+        self.assertEqual(self.read_alias(admin.get('/api/v1/orders/', {'updated_since': '2020-01-01T00:00:00Z'})), 'default')
+        self.assertEqual(self.read_alias(admin.get('/api/v1/flavors/')), 'default')
+
+    @override_settings(REPLICA_LAG_SECONDS=0)
+    def test_pin_ends_after_the_lag_window(self):
+        self.create_order([(self.mango, '1.00')])
+        self.assertEqual(self.read_alias(self.api.get('/api/v1/orders/')), 'replica')
+
+    @override_settings(REPLICA_PIN_PROCESS_LOCAL=False)
+    def test_replica_is_not_read_when_pins_are_not_shared(self):
+        # Another worker could not see this process's pins, so no request may risk the replica
+        self.assertEqual(self.read_alias(self.api.get('/api/v1/orders/')), 'default')
+
+    def test_reads_after_a_write_in_the_same_request_go_to_the_primary(self):
+        token = _routing.set(RequestRouting())
+        self.addCleanup(_routing.reset, token)
+        _routing.get().read_alias = 'replica'
+        self.assertEqual(router.db_for_read(Order), 'replica')
+        self.assertEqual(router.db_for_write(Order, instance=Order(client=self.client_obj)), 'default')
+        self.assertEqual(router.db_for_read(Order), 'default')
+
+
+class ArchiveTests(SalesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Three 120.00 orders from 400 days ago; the first is paid exactly, the 130.00 pays the second and part of the third
+        self.orders = [self.create_order([(self.mango, '1.00')]) for _ in range(3)]
+        for i, order in enumerate(self.orders):
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=400, minutes=-i))
+        self.first_payment = self.pay('120.00', days_ago=399)
+        self.second_payment = self.pay('130.00', days_ago=398)
+        rebuild_allocations()
+        rebuild_rollups() # The backdating went around the write path
+        self.day = Order.objects.get(pk=self.orders[0].pk).order_date.date()
+
+    def test_archives_the_paid_off_run_and_reads_it_back(self):
+        balance = Client.objects.get(pk=self.client_obj.pk).outstanding_balance
+        rollup = self.rollup_rows()
+        report = self.api.get('/api/v1/reports/sales/daily/', {'date': self.day})
+        report = b''.join(report.streaming_content)
+        _, statuses = self.state()
+
+        self.assertEqual(list(archive()), [(1, 1)])
+        self.assertEqual(list(ArchivedOrder.objects.values_list('id', flat=True)), [self.orders[0].id])
+        self.assertEqual(list(ArchivedPayment.objects.values_list('id', flat=True)), [self.first_payment.id])
+        self.assertFalse(Order.objects.filter(pk=self.orders[0].pk).exists())
+
+        # Balances, rollups, allocations of the rest and reports are untouched
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).outstanding_balance, balance)
+        self.assertEqual(reconcile_client_balances(dry_run=True), 0)
+        self.assertEqual(self.rollup_rows(), rollup)
+        rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), rollup)
+        allocations = self.state()[0]
+        rebuild_allocations()
+        self.assertEqual(self.state(), (allocations, {order.id: statuses[order.id] for order in self.orders[1:]}))
+        response = self.api.get('/api/v1/reports/sales/daily/', {'date': self.day})
+        self.assertEqual(b''.join(response.streaming_content), report)
+
+        history = self.api.get(f'/api/v1/clients/{self.client_obj.id}/history/').data
+        self.assertEqual(
+            [(order['id'], order['archived']) for order in history['orders']],
+            [(self.orders[2].id, False), (self.orders[1].id, False), (self.orders[0].id, True)],
+        )
+        self.assertEqual([payment['archived'] for payment in history['payments']], [False, True])
+        recent = self.api.get(f'/api/v1/clients/{self.client_obj.id}/history/', {'start_date': self.day + timedelta(days=2)})
+        self.assertEqual(recent.data['orders'], [])
+
+    def test_change_feeds_report_archived_rows_as_deleted(self):
+        since = timezone.now().isoformat()
+        list(archive())
+        orders = self.api.get('/api/v1/orders/', {'updated_since': since}).data
+        self.assertEqual((orders['results'], orders['deleted']), ([], [self.orders[0].id]))
+        payments = self.api.get('/api/v1/payments/', {'updated_since': since}).data
+        self.assertEqual((payments['results'], payments['deleted']), ([], [self.first_payment.id]))
+
+    def test_orders_linked_to_payments_that_stay_are_kept(self):
+        self.pay('10.00') # Recent, so it stays hot
+        Payment.objects.filter(amount_paid=Decimal('10.00')).update(order=self.orders[0])
+        self.assertEqual(list(archive()), [(0, 0)])
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+    def test_backdated_payment_archives_with_the_order_it_paid(self):
+        kiosk = Client.objects.create(name='Kiosk', status='approved', assigned_salesperson=self.salesperson)
+        older, newer = self.create_order([(self.mango, '1.00')], kiosk), self.create_order([(self.mango, '1.00')], kiosk)
+        for order, days in ((older, 10), (newer, 5)):
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days))
+        today = self.pay('120.00', client=kiosk)
+        backdated = self.pay('120.00', days_ago=20, client=kiosk)
+        kiosk_rows = Q(client=kiosk)
+        horizon = timezone.now() - timedelta(days=7)
+
+        # Allocations pairing the backdated payment with the newer order (as stored before allocation
+        # followed payment dates) keep the run from being archived, and the other clients still go
+        allocations = list(PaymentAllocation.objects.filter(order__client=kiosk).values_list('payment_id', 'order_id', 'amount'))
+        PaymentAllocation.objects.filter(order__client=kiosk).delete()
+        PaymentAllocation.objects.bulk_create([
+            PaymentAllocation(payment=today, order=older, amount=Decimal('120.00')),
+            PaymentAllocation(payment=backdated, order=newer, amount=Decimal('120.00')),
+        ])
+        self.assertEqual(list(archive(horizon, chunk_size=1)), [(1, 1), (0, 0)])
+        self.assertFalse(ArchivedOrder.objects.filter(kiosk_rows).exists())
+
+        PaymentAllocation.objects.filter(order__client=kiosk).delete()
+        PaymentAllocation.objects.bulk_create([PaymentAllocation(payment_id=p, order_id=o, amount=a) for p, o, a in allocations])
+        self.assertEqual(list(archive(horizon)), [(1, 1)])
+        self.assertEqual(list(ArchivedOrder.objects.filter(kiosk_rows).values_list('id', flat=True)), [older.id])
+        self.assertEqual(list(ArchivedPayment.objects.filter(kiosk_rows).values_list('id', flat=True)), [backdated.id])
+        self.assertEqual(
+            list(PaymentAllocation.objects.filter(order__client=kiosk).values_list('payment_id', 'order_id', 'amount')),
+            [(today.id, newer.id, Decimal('120.00'))],
+        )
+        self.assertEqual(reconcile_client_balances(dry_run=True), 0)
+
+
+class AdminWriteTests(SalesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username='root', password='rootpassword'))
+
+    def order_form(self, items, **fields):
+        data = {
+            'client': self.client_obj.id, 'salesperson': self.salesperson.id, 'payment_status': 'outstanding',
+            'order_items-TOTAL_FORMS': len(items), 'order_items-INITIAL_FORMS': 0, **fields,
+        }
+        for i, (flavor, quantity) in enumerate(items):
+            data.update({f'order_items-{i}-flavor': flavor.id, f'order_items-{i}-quantity_liters': quantity})
+        return data
+
+    def assert_consistent(self):
+        # What the write paths maintain matches a rebuild of everything from the rows
+        self.assertEqual(reconcile_client_balances(dry_run=True), 0)
+        rollup, state = self.rollup_rows(), self.state()
+        rebuild_rollups()
+        rebuild_allocations()
+        self.assertEqual((self.rollup_rows(), self.state()), (rollup, state))
+
+    def test_admin_orders_and_payments_keep_derived_data_in_step(self):
+        payment = self.pay('100.00')
+        response = self.client.post('/admin/sales/order/add/', self.order_form([(self.mango, '2.00'), (self.passion, '1.00')]))
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('390.00'))
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).outstanding_balance, Decimal('290.00'))
+        self.assert_consistent()
+
+        item = order.order_items.get(flavor=self.mango)
+        data = self.order_form([], **{'order_items-TOTAL_FORMS': 2, 'order_items-INITIAL_FORMS': 2})
+        for i, row in enumerate(order.order_items.order_by('id')):
+            data.update({
+                f'order_items-{i}-id': row.id, f'order_items-{i}-order': order.id,
+                f'order_items-{i}-flavor': row.flavor_id, f'order_items-{i}-quantity_liters': row.quantity_liters,
+            })
+            if row == item:
+                data[f'order_items-{i}-quantity_liters'] = '1.00'
+        response = self.client.post(f'/admin/sales/order/{order.id}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('270.00'))
+        self.assert_consistent()
+
+        response = self.client.post(f'/admin/sales/payment/{payment.id}/change/', {
+            'client': self.client_obj.id, 'amount_paid': '270.00', 'payment_date_0': payment.payment_date.date(),
+            'payment_date_1': '08:00:00', 'payment_method': 'Cash', 'recorded_by_salesperson': self.salesperson.id,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).outstanding_balance, Decimal('0.00'))
+        self.assertEqual(self.state()[1], {order.id: 'paid'})
+        self.assert_consistent()
@@ -6,6 +6,7 @@ from . import views_reports
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'payments', PaymentViewSet, basename='payment') # Register order and payment viewsets
+router.register(r'reports/jobs', views_reports.ReportJobViewSet, basename='report-job') # Background report status and downloads
 
 urlpatterns = router.urls + [
     # Reports endpoints
@@ -1,14 +1,27 @@
+import csv
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django.db.models import Sum
 from .models import Order, Payment
+from .payment_import import REPORT_COLUMNS, PaymentStatementImport, report_row
 from rest_framework.permissions import IsAuthenticated
 from .serializers import OrderSerializer, PaymentSerializer
+from .views_reports import Echo
 from users.permissions import IsAdminUser, IsSalesperson, IsOwnerOfOrder, IsOwnerOfPayment
 from users.models import UserProfile 
+from core.models import Flavor
+from core.changefeed import ChangeFeedMixin
+from core.conditional import ConditionalGetMixin
+from core.fastread import FastReadMixin
+from core.fieldsets import SparseFieldsMixin
+from core.pagination import KeysetPagination
+from core.replicas import ReplicaReadMixin
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ChangeFeedMixin, ConditionalGetMixin, FastReadMixin, SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows orders to be viewed, created, or edited.
     Salespersons manage their own orders. Admins manage all orders.
@@ -16,6 +29,21 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated, IsOwnerOfOrder]
+    pagination_class = KeysetPagination
+    replica_actions = ('list', 'retrieve')
+    keyset_ordering = ('-order_date', '-id') # Newest first, id breaks ties between equal dates
+    # Nested objects whose changes must change the ETag (order items are covered by the order's own updated_at)
+    etag_related_fields = ('client__updated_at', 'salesperson__updated_at')
+    # The nested client renders its salesperson profiles too; joined so a page costs one query plus the items
+    related_fields = (
+        'client__assigned_salesperson__user',
+        'client__requested_by_salesperson__user',
+        'salesperson__user',
+    )
+
+    def get_etag_subqueries(self):
+        # Flavors are nested in every item; the newest change to any of them changes the ETag
+        return {'flavors': Flavor.objects.order_by('-updated_at').values_list('updated_at', flat=True)}
 
     def get_queryset(self):
         """
@@ -45,9 +73,9 @@ class OrderViewSet(viewsets.ModelViewSet):
                 if payment_status:
                     queryset = queryset.filter(payment_status=payment_status)
 
-                return queryset.select_related('client', 'salesperson__user').prefetch_related('order_items__flavor').order_by('-order_date')
+                return queryset.select_related(*self.related_fields).prefetch_related('order_items__flavor').order_by('-order_date')
             elif user.profile.role == 'salesperson':
-                return Order.objects.filter(salesperson=user.profile).select_related('client', 'salesperson__user').prefetch_related('order_items__flavor').order_by('-order_date')
+                return Order.objects.filter(salesperson=user.profile).select_related(*self.related_fields).prefetch_related('order_items__flavor').order_by('-order_date')
         return Order.objects.none()
 
     def perform_create(self, serializer):
@@ -59,7 +87,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ChangeFeedMixin, ConditionalGetMixin, FastReadMixin, SparseFieldsMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows payments to be viewed, created, or edited.
     Salespersons manage their own recorded payments. Admins manage all payments.
@@ -67,6 +95,18 @@ class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated, IsOwnerOfPayment]
+    pagination_class = KeysetPagination
+    replica_actions = ('list', 'retrieve')
+    keyset_ordering = ('-payment_date', '-id')
+    etag_related_fields = ('client__updated_at', 'order__updated_at', 'recorded_by_salesperson__updated_at')
+    # Everything the default (compact) representation renders, joined in the page query:
+    # the client with its salesperson profiles, the order summary and the recording salesperson
+    related_fields = (
+        'client__assigned_salesperson__user',
+        'client__requested_by_salesperson__user',
+        'order',
+        'recorded_by_salesperson__user',
+    )
 
     def get_queryset(self):
         """
@@ -93,11 +133,38 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 if end_date:
                     queryset = queryset.filter(payment_date__lte=end_date)
 
-                return queryset.select_related('client', 'order', 'recorded_by_salesperson__user').order_by('-payment_date')
+                return queryset.select_related(*self.related_fields).order_by('-payment_date')
             elif user.profile.role == 'salesperson':
-                return Payment.objects.filter(recorded_by_salesperson=user.profile).select_related('client', 'order', 'recorded_by_salesperson__user').order_by('-payment_date')
+                return Payment.objects.filter(recorded_by_salesperson=user.profile).select_related(*self.related_fields).order_by('-payment_date')
         return Payment.objects.none()
 
     def perform_create(self, serializer):
         # The `recorded_by_salesperson` is automatically set by the serializer's create method
         serializer.save()
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        """
+        Imports a CSV payment statement uploaded as `file`, with the columns client_id, amount_paid,
+        payment_date and optionally order_id and payment_method. The payments are recorded by the
+        requesting user. ?dry_run=true only validates. Streams the outcome of every row as CSV
+        (row, status, payment_id, errors), each batch's rows as soon as the batch is written.
+        """
+        statement = request.FILES.get('file')
+        if statement is None:
+            return Response({"detail": "Upload the statement as a CSV file in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        if not hasattr(request.user, 'profile'):
+            return Response({"detail": "Only salespersons and admins can import payments."}, status=status.HTTP_403_FORBIDDEN)
+
+        importer = PaymentStatementImport(request.user.profile, dry_run=request.query_params.get('dry_run') == 'true')
+        outcomes = importer.run(statement) # A statement without the required columns is a 400 here
+        writer = csv.writer(Echo())
+
+        def stream():
+            yield writer.writerow(REPORT_COLUMNS)
+            for outcome in outcomes:
+                yield writer.writerow(report_row(outcome))
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="payment_import_report.csv"'
+        return response
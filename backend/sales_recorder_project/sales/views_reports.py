@@ -1,43 +1,138 @@
 from rest_framework.views import APIView
+from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.reverse import reverse
 from django.db.models import Sum, F, ExpressionWrapper, fields
-from django.http import HttpResponse
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 import csv
 import datetime
 from datetime import timedelta
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
 from django.db import models
+from django.utils import timezone
 from users.permissions import IsAdminUser, IsSalesperson
-from .models import Order, OrderItem
+from .archive import needs_archive
+from .models import ArchivedOrder, DailySalesRollup, Order, OrderItem, ReportJob
+from .report_cache import get_report, day_granule, month_granule, range_granules, year_granule
+from .report_jobs import enqueue_report, wake_thread_runner
+from .reporting import summarize_rollup
+from .serializers import ReportJobSerializer
+from core.pagination import KeysetPagination
+from core.replicas import ReplicaReadMixin
 from users.models import UserProfile 
-class BaseSalesReportView(APIView):
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() hands the formatted line back instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+class BaseSalesReportView(ReplicaReadMixin, APIView):
     """
     Base class for sales report generation. Handles common queryset filtering
     based on user role and CSV response generation.
+
+    Subclasses implement parse_params() and build_report(); the report is then either
+    returned directly or, with ?async=1 (or a POST), generated by a background job.
+    Reports served directly are read from the replica when one is configured.
     """
     permission_classes = [IsAuthenticated]
+    replica_actions = ('get',)
+    stream_chunk_size = 2000 # Rows fetched from the database per round trip when streaming
+    report_type = None
+    streaming = False # Stream the CSV instead of building it in memory
 
-    def get_queryset_base(self):
+    def get(self, request, *args, **kwargs):
+        params = self.parse_params(request.query_params)
+        if request.query_params.get('async') in ('1', 'true'):
+            return self.enqueue(request, request.query_params)
+        filename, header, rows = get_report(self, request.user, params)
+        if self.streaming:
+            return self.generate_streaming_csv_response(filename, header, rows)
+        return self.generate_csv_response(filename, header, rows)
+
+    def post(self, request, *args, **kwargs):
         """
-        Returns the base queryset for orders, filtered by user role.
+        Enqueues the report as a background job. Parameters may be sent in the body or the query string.
         """
-        user = self.request.user
-        queryset = Order.objects.all()
+        data = request.query_params.dict()
+        data.update({key: str(value) for key, value in request.data.items()})
+        self.parse_params(data) # Reject bad parameters now rather than in the worker
+        return self.enqueue(request, data)
+
+    def enqueue(self, request, query_params):
+        if not hasattr(request.user, 'profile'):
+            return Response({"detail": "Only salespersons and admins can request reports."}, status=status.HTTP_403_FORBIDDEN)
+        params = {key: value for key, value in query_params.items() if key != 'async'}
+        job = enqueue_report(self.report_type, request.user.profile, params)
+        status_url = reverse('report-job-detail', args=[job.id], request=request)
+        return Response(
+            {"id": job.id, "status": job.status, "status_url": status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url},
+        )
+
+    def parse_params(self, query_params):
+        """
+        Validates the request parameters and returns them as a dict.
+        Raises ValidationError({"detail": ...}) for bad input.
+        """
+        raise NotImplementedError
+
+    def build_report(self, user, params):
+        """
+        Returns (filename, header, rows) for the report. Runs both in the request and in report jobs,
+        so it must only depend on `user` and `params`.
+        """
+        raise NotImplementedError
+
+    def cache_granules(self, params):
+        """
+        The days, months or years the report covers (see sales/report_cache.py),
+        or None to never cache it.
+        """
+        return None
+
+    def get_queryset_base(self, user, model=Order):
+        """
+        Returns the base queryset for orders (or for archived orders, with model=ArchivedOrder), filtered by user role.
+        """
+        queryset = model.objects.all()
 
         # Safely check for user profile before accessing role
         if hasattr(user, 'profile') and user.is_authenticated:
             if user.profile.role == 'salesperson':
                 queryset = queryset.filter(salesperson=user.profile)
             elif user.profile.role != 'admin': # If not salesperson or admin, no access
-                return Order.objects.none()
+                return model.objects.none()
         else:
             # If user is not authenticated or has no profile, deny access or return empty queryset
-            return Order.objects.none()
+            return model.objects.none()
 
-        # For reports, we often need order items data, so prefetch it
-        queryset = queryset.prefetch_related('order_items__flavor', 'client', 'salesperson__user')
+        return queryset
+
+    def get_rollup_queryset_base(self, user, salesperson_id=None):
+        """
+        Returns the daily sales rollup rows visible to the user, with the admin
+        salesperson filter applied. Aggregated reports read from here instead of raw orders.
+        """
+        if not (user.is_authenticated and hasattr(user, 'profile')):
+            return DailySalesRollup.objects.none()
+
+        queryset = DailySalesRollup.objects.all()
+        if user.profile.role == 'salesperson':
+            queryset = queryset.filter(salesperson=user.profile)
+        elif user.profile.role == 'admin':
+            if salesperson_id:
+                queryset = queryset.filter(salesperson__user__id=salesperson_id)
+        else:
+            return DailySalesRollup.objects.none()
         return queryset
 
     def generate_csv_response(self, filename, header, data):
@@ -51,99 +146,127 @@ class BaseSalesReportView(APIView):
         writer.writerows(data)
         return response
 
+    def generate_streaming_csv_response(self, filename, header, rows):
+        """
+        Helper method to stream CSV content row by row.
+        `rows` is consumed lazily, so memory stays flat and the first bytes go out
+        before the whole result set has been read.
+        """
+        writer = csv.writer(Echo())
+
+        def stream():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class DailySalesReportView(BaseSalesReportView):
     """
     Generates a daily sales report.
     Salespersons get their own daily report. Admins can get any salesperson's or all.
     """
-    def get(self, request, *args, **kwargs):
-        date_str = request.query_params.get('date')
+    report_type = 'daily'
+    streaming = True
+
+    def parse_params(self, query_params):
+        date_str = query_params.get('date')
         if not date_str:
-            return Response({"detail": "Date parameter is required (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Date parameter is required (YYYY-MM-DD)."})
         try:
             report_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
         except ValueError:
-            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Invalid date format. Use YYYY-MM-DD."})
+        return {'date': report_date, 'salesperson_id': query_params.get('salesperson_id')}
 
-        # Get base queryset filtered by user role
-        queryset = self.get_queryset_base().filter(order_date__date=report_date)
+    def cache_granules(self, params):
+        return [day_granule(params['date'])]
 
-        # Admin can filter by specific salesperson - ensure request.user.profile exists
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
-            salesperson_id = request.query_params.get('salesperson_id')
-            if salesperson_id:
-                queryset = queryset.filter(salesperson__user__id=salesperson_id)
+    def build_report(self, user, params):
+        report_date = params['date']
+
+        # A plain range on order_date (rather than order_date__date) lets the database use its indexes
+        day_start = timezone.make_aware(datetime.datetime.combine(report_date, datetime.time.min))
+
+        def day_rows(model):
+            # Get base queryset filtered by user role
+            queryset = self.get_queryset_base(user, model).filter(order_date__gte=day_start, order_date__lt=day_start + timedelta(days=1))
+
+            # Admin can filter by specific salesperson - ensure user.profile exists
+            if hasattr(user, 'profile') and user.profile.role == 'admin':
+                if params['salesperson_id']:
+                    queryset = queryset.filter(salesperson__user__id=params['salesperson_id'])
+
+            # Aggregate total liters sold for each order, fetching only the columns the report needs
+            return queryset.annotate(
+                total_liters_sold=Coalesce(Sum('order_items__quantity_liters'), 0, output_field=models.DecimalField())
+            ).values_list(
+                'id', 'client__name', 'salesperson__user__username', 'order_date',
+                'total_amount', 'payment_status', 'total_liters_sold'
+            )
 
-        # Aggregate total liters sold for each order
-        queryset = queryset.annotate(
-            total_liters_sold=Sum('order_items__quantity_liters')
-        ).order_by('client__name') # Order for consistent reporting
+        rows = day_rows(Order)
+        if needs_archive(day_start):
+            # The day's orders may have been archived (sales/archive.py), all or some of them
+            rows = rows.union(day_rows(ArchivedOrder), all=True)
+        rows = rows.order_by('client__name', 'id').iterator(chunk_size=self.stream_chunk_size) # Order for consistent reporting
 
         header = ['Order ID', 'Client Name', 'Salesperson', 'Order Date', 'Total Amount', 'Payment Status', 'Total Liters Sold']
-        data = []
-        for order in queryset:
-            data.append([
-                order.id,
-                order.client.name,
-                order.salesperson.user.username,
-                order.order_date.strftime('%Y-%m-%d'),
-                order.total_amount,
-                order.payment_status,
-                order.total_liters_sold if order.total_liters_sold is not None else 0
-            ])
+        data = (
+            [order_id, client_name, username, order_date.strftime('%Y-%m-%d'), total_amount, payment_status, total_liters_sold]
+            for order_id, client_name, username, order_date, total_amount, payment_status, total_liters_sold in rows
+        )
 
         filename = f"daily_sales_report_{report_date}.csv"
-        return self.generate_csv_response(filename, header, data)
+        return filename, header, data
 
 class WeeklySalesReportView(BaseSalesReportView):
     """
     Generates a weekly sales report (aggregated by day within the week).
     Salespersons get their own weekly report. Admins can get any salesperson's or all.
     """
-    def get(self, request, *args, **kwargs):
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
+    report_type = 'weekly'
+
+    def parse_params(self, query_params):
+        start_date_str = query_params.get('start_date')
+        end_date_str = query_params.get('end_date')
 
         if not start_date_str or not end_date_str:
-            return Response({"detail": "Start date and end date parameters are required (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Start date and end date parameters are required (YYYY-MM-DD)."})
         try:
             start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
         except ValueError:
-            return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Invalid date format. Use YYYY-MM-DD."})
 
         if start_date > end_date:
-            return Response({"detail": "Start date cannot be after end date."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Start date cannot be after end date."})
+        return {'start_date': start_date, 'end_date': end_date, 'salesperson_id': query_params.get('salesperson_id')}
 
-        queryset = self.get_queryset_base().filter(order_date__date__range=[start_date, end_date])
+    def cache_granules(self, params):
+        return range_granules(params['start_date'], params['end_date'])
 
-        # Admin can filter by specific salesperson - ensure request.user.profile exists
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
-            salesperson_id = request.query_params.get('salesperson_id')
-            if salesperson_id:
-                queryset = queryset.filter(salesperson__user__id=salesperson_id)
+    def build_report(self, user, params):
+        start_date, end_date = params['start_date'], params['end_date']
+        queryset = self.get_rollup_queryset_base(user, params['salesperson_id']).filter(day__range=[start_date, end_date])
 
         # Group by day and aggregate
-        report_data = queryset.annotate(
-            day=TruncDay('order_date')
-        ).values('day').annotate(
-            total_sales=Sum('total_amount'),
-            num_orders=models.Count('id'),
-            total_liters_sold_week=Sum('order_items__quantity_liters')
-        ).order_by('day')
+        report_data = summarize_rollup(queryset, 'day')
 
         header = ['Date', 'Total Sales', 'Number of Orders', 'Total Liters Sold']
         data = []
         for row in report_data:
             data.append([
-                row['day'].strftime('%Y-%m-%d'),
+                row['period'].strftime('%Y-%m-%d'),
                 row['total_sales'],
                 row['num_orders'],
-                row['total_liters_sold_week']
+                row['total_liters']
             ])
 
         filename = f"weekly_sales_report_{start_date}_to_{end_date}.csv"
-        return self.generate_csv_response(filename, header, data)
+        return filename, header, data
 
 
 class MonthlySalesReportView(BaseSalesReportView):
@@ -151,12 +274,14 @@ class MonthlySalesReportView(BaseSalesReportView):
     Generates a monthly sales report (aggregated by week or day within the month).
     Salespersons get their own monthly report. Admins can get any salesperson's or all.
     """
-    def get(self, request, *args, **kwargs):
-        year = request.query_params.get('year')
-        month = request.query_params.get('month')
+    report_type = 'monthly'
+
+    def parse_params(self, query_params):
+        year = query_params.get('year')
+        month = query_params.get('month')
 
         if not year or not month:
-            return Response({"detail": "Year and month parameters are required."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Year and month parameters are required."})
         try:
             year = int(year)
             month = int(month)
@@ -164,38 +289,33 @@ class MonthlySalesReportView(BaseSalesReportView):
             if not (1 <= month <= 12):
                 raise ValueError("Month must be between 1 and 12.")
         except ValueError:
-            return Response({"detail": "Invalid year or month format."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Invalid year or month format."})
+        return {'year': year, 'month': month, 'salesperson_id': query_params.get('salesperson_id')}
 
-        # Filter for the specific month
-        queryset = self.get_queryset_base().filter(order_date__year=year, order_date__month=month)
+    def cache_granules(self, params):
+        return [month_granule(params['year'], params['month'])]
 
-        # Admin can filter by specific salesperson - ensure request.user.profile exists
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
-            salesperson_id = request.query_params.get('salesperson_id')
-            if salesperson_id:
-                queryset = queryset.filter(salesperson__user__id=salesperson_id)
+    def build_report(self, user, params):
+        year, month = params['year'], params['month']
+
+        # Filter for the specific month
+        queryset = self.get_rollup_queryset_base(user, params['salesperson_id']).filter(day__year=year, day__month=month)
 
         # Group by month (or can group by week/day within month if desired)
-        report_data = queryset.annotate(
-            month=TruncMonth('order_date')
-        ).values('month').annotate(
-            total_sales=Sum('total_amount'),
-            num_orders=models.Count('id'),
-            total_liters_sold_month=Sum('order_items__quantity_liters')
-        ).order_by('month')
+        report_data = summarize_rollup(queryset, 'month')
 
         header = ['Month', 'Total Sales', 'Number of Orders', 'Total Liters Sold']
         data = []
         for row in report_data:
             data.append([
-                row['month'].strftime('%Y-%m'), # Format as YYYY-MM
+                row['period'].strftime('%Y-%m'), # Format as YYYY-MM
                 row['total_sales'],
                 row['num_orders'],
-                row['total_liters_sold_month']
+                row['total_liters']
             ])
 
         filename = f"monthly_sales_report_{year}-{month}.csv"
-        return self.generate_csv_response(filename, header, data)
+        return filename, header, data
 
 class YearlySalesReportView(BaseSalesReportView):
     """
@@ -203,46 +323,85 @@ class YearlySalesReportView(BaseSalesReportView):
     Only accessible by Admin users.
     """
     permission_classes = [IsAdminUser] # Override permission for this specific view
+    report_type = 'yearly'
 
-    def get(self, request, *args, **kwargs):
-        year = request.query_params.get('year')
+    def parse_params(self, query_params):
+        year = query_params.get('year')
 
         if not year:
-            return Response({"detail": "Year parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Year parameter is required."})
         try:
             year = int(year)
         except ValueError:
-            return Response({"detail": "Invalid year format."}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValidationError({"detail": "Invalid year format."})
+        return {'year': year, 'salesperson_id': query_params.get('salesperson_id')}
+
+    def cache_granules(self, params):
+        return [year_granule(params['year'])]
 
-        queryset = self.get_queryset_base().filter(order_date__year=year)
+    def build_report(self, user, params):
+        year = params['year']
 
         # Admin can still filter by specific salesperson for this yearly report
-        # Ensure request.user.profile exists
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
-            salesperson_id = request.query_params.get('salesperson_id')
-            if salesperson_id:
-                queryset = queryset.filter(salesperson__user__id=salesperson_id)
+        queryset = self.get_rollup_queryset_base(user, params['salesperson_id']).filter(day__year=year)
 
         # Group by month within the year and aggregate
-        report_data = queryset.annotate(
-            month=TruncMonth('order_date')
-        ).values('month', 'salesperson__user__username').annotate(
-            total_sales=Sum('total_amount'),
-            num_orders=models.Count('id'),
-            total_liters_sold_year=Sum('order_items__quantity_liters')
-        ).order_by('month', 'salesperson__user__username')
+        report_data = summarize_rollup(queryset, 'month', group_by=('salesperson__user__username',))
 
         # For yearly report, it's useful to see sales per salesperson per month
         header = ['Month', 'Salesperson', 'Total Sales', 'Number of Orders', 'Total Liters Sold']
         data = []
         for row in report_data:
             data.append([
-                row['month'].strftime('%Y-%m'),
+                row['period'].strftime('%Y-%m'),
                 row['salesperson__user__username'],
                 row['total_sales'],
                 row['num_orders'],
-                row['total_liters_sold_year']
+                row['total_liters']
             ])
 
         filename = f"yearly_sales_report_{year}.csv"
-        return self.generate_csv_response(filename, header, data)
\ No newline at end of file
+        return filename, header, data
+
+
+# Report type -> view, used by report jobs to rebuild a report outside the request
+REPORT_VIEWS = {
+    view.report_type: view
+    for view in (DailySalesReportView, WeeklySalesReportView, MonthlySalesReportView, YearlySalesReportView)
+}
+
+
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status and download of background report jobs.
+    Users see the jobs they requested; admins see all of them.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        user = self.request.user
+        if hasattr(user, 'profile'):
+            if user.profile.role == 'admin':
+                return ReportJob.objects.all()
+            return ReportJob.objects.filter(requested_by=user.profile)
+        return ReportJob.objects.none()
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.data['status'] in ('queued', 'running'):
+            wake_thread_runner() # Someone is waiting: pick up jobs a restarted process left behind
+        return response
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done':
+            return Response({"detail": f"Report is not ready (status: {job.status})."}, status=status.HTTP_409_CONFLICT)
+        try:
+            file = open(job.file_path, 'rb')
+        except FileNotFoundError:
+            return Response({"detail": "Report file is no longer available."}, status=status.HTTP_410_GONE)
+        return FileResponse(file, as_attachment=True, filename=job.filename, content_type='text/csv')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware', # First, so its latency covers every other middleware
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,12 +57,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.replicas.ReplicaRoutingMiddleware',
 ]
 
 # Configure Django REST Framework Authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication', # TokenAuthentication with a TTL cache
         'rest_framework.authentication.SessionAuthentication',
     ],
 
@@ -69,20 +72,73 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'core.renderers.FastJSONParser', # orjson, same results as rest_framework.parsers.JSONParser
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
 
     # Default renderer classes if response formats are customized
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer', # orjson, same bytes as rest_framework.renderers.JSONRenderer
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
 AUTH_USER_MODEL = 'users.User' # Creates a custom user model
 
+# Seconds an authenticated token (with its user and profile) stays in the AUTH_TOKEN_CACHE_ALIAS cache.
+# Logout, token deletes and user and profile saves and deletes evict entries, but only in the backend
+# of the process handling them: a shared backend (Redis, Memcached) evicts everywhere.
+AUTH_TOKEN_CACHE_ALIAS = 'default'
+AUTH_TOKEN_CACHE_TTL = 300
+# Cache tokens in a per-process LocMemCache too: right for a single process (runserver, tests), but
+# with several workers revoked credentials would keep working elsewhere, so settings_production turns it off
+AUTH_TOKEN_CACHE_PROCESS_LOCAL = True
+
+# Flavor catalog cache (core/catalog.py). Changes made in this process invalidate it immediately;
+# changes made by other worker processes are picked up once the TTL runs out.
+FLAVOR_CATALOG_TTL = 300 # seconds
+FLAVOR_LIST_MAX_AGE = 60 # seconds browsers may reuse GET /api/v1/flavors/
+
+# Background report jobs (?async=1 on the report endpoints). 'thread' runs them in a pool
+# inside the web process; 'worker' leaves them for `manage.py run_report_worker`.
+REPORT_JOBS_RUNNER = 'thread'
+REPORT_JOBS_THREADS = 2
+# A job running for longer than this (seconds) is taken to have died with its process and is queued
+# again; queued jobs are run by whichever process's pool is woken next (a new job or a status poll)
+REPORT_JOBS_TIMEOUT = 1800
+REPORT_JOBS_DIR = BASE_DIR / 'report_jobs' # Finished report files
+
+# Report result cache (sales/report_cache.py). Order writes invalidate the days, months and years
+# they touch; other processes only see that through a shared cache backend (set REPORT_CACHE_ALIAS).
+REPORT_CACHE_ALIAS = 'default'
+REPORT_CACHE_TTL = 3600 # seconds
+REPORT_CACHE_MAX_ROWS = 5000 # Larger reports are streamed without being cached
+# Cache reports in a per-process LocMemCache too: right for a single process (runserver, tests),
+# stale for up to the TTL with several workers, so settings_production turns it off
+REPORT_CACHE_PROCESS_LOCAL = True
+
+# Closed, fully paid orders older than this (with their items and payments) are moved to the
+# archive tables by `python manage.py archive_orders` (sales/archive.py)
+ARCHIVE_HORIZON_DAYS = 365
+
+# Client search (GET /api/v1/clients/search/, clients/search.py): candidates taken from the search
+# index and re-ranked by trigram similarity; more finds more typos, at some cost per keystroke
+CLIENT_SEARCH_CANDIDATES = 100
+CLIENT_SEARCH_SCAN = 5000 # SQLite: index matches ranked per query, which bounds the slowest searches
+
+# ?updated_since= change feed (core/changefeed.py)
+CHANGE_FEED_OVERLAP = 5 # seconds the returned watermark trails the clock, so late commits are not missed
+CHANGE_FEED_RETENTION_DAYS = 90 # Tombstones kept; older timestamps get a full reset
+
+# Request metrics (core/middleware.py), served at /metrics
+METRICS_SLOW_QUERY_MS = 100 # Queries at least this slow are logged with their SQL (logger 'core.metrics')
+METRICS_SERVER_TIMING = True # Add the Server-Timing header to every response
+
+# Order, payment and client list pages are serialized by precompiled getters (core/fastread.py),
+# with output identical to the serializers'; False falls back to DRF's field-by-field path
+FAST_READ_SERIALIZERS = True
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:5173',
     'http://127.0.0.1:5173',
@@ -121,6 +177,48 @@ DATABASES = {
     }
 }
 
+# Optional read replica (core/replicas.py): views that opt in serve safe requests from it, writes and
+# the reads after them stay on 'default'. Locally, DJANGO_REPLICA_DB names a second SQLite file that
+# `python manage.py sync_sqlite_replica` copies the primary into; with Postgres, point it at a standby.
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = None
+if os.environ.get('DJANGO_REPLICA_DB'):
+    REPLICA_DATABASE_ALIAS = 'replica'
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DJANGO_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'}, # Tests read their own writes through the default test database
+    }
+# Seconds a user who wrote reads from 'default' only (longer than the replica is expected to lag), and
+# the longest a report built from the replica stays cached. Pins live in the REPLICA_PIN_CACHE_ALIAS cache.
+REPLICA_LAG_SECONDS = 10
+REPLICA_PIN_CACHE_ALIAS = 'default'
+# Keep pins in a per-process LocMemCache too: right for a single process, but with several workers the
+# next request may land where the pin is unknown, so settings_production turns it off (no replica reads
+# until REPLICA_PIN_CACHE_ALIAS names a shared backend)
+REPLICA_PIN_PROCESS_LOCAL = True
+
+# SQLite tuned for several worker processes writing to the same file. settings_production applies it;
+# run `python manage.py benchmark_sqlite_writes` to compare it with the stock connection.
+SQLITE_PRODUCTION_OPTIONS = {
+    # Run on every new connection. WAL lets readers and the single writer work at the same time,
+    # and with it synchronous=NORMAL only risks the last commits on power loss, never corruption.
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA mmap_size=268435456', # Read through a 256 MiB memory map instead of read() calls
+        'PRAGMA cache_size=-65536', # 64 MiB page cache per connection (negative values are KiB)
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA journal_size_limit=67108864', # Truncate the WAL back to 64 MiB after checkpoints
+    ]),
+    # Write transactions take the write lock up front. A deferred transaction that reads and then
+    # writes (e.g. the rollup upsert) fails with "database is locked" without waiting when another
+    # process committed in between; an immediate one queues on the busy timeout instead.
+    'transaction_mode': 'IMMEDIATE',
+    # Seconds a connection waits for the write lock (sqlite3 busy_timeout) before giving up
+    'timeout': 20,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
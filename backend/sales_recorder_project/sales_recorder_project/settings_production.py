@@ -0,0 +1,45 @@
+"""
+Production profile: the development settings with debugging off, a JSON-only API and
+SQLite tuned for concurrent workers (WAL, immediate write transactions, a busy timeout).
+
+Run with DJANGO_SETTINGS_MODULE=sales_recorder_project.settings_production and set
+DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma separated) in the environment.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REST_FRAMEWORK, SQLITE_PRODUCTION_OPTIONS
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# JSON only: the browsable API (and the templates and forms it loads per response) is a development tool
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+    ],
+}
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+        # Keep connections (and their page cache and memory map) across requests instead of reopening per request
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Several workers: a report cached in one worker's LocMemCache would miss the other workers' order
+# writes, so reports are only cached once REPORT_CACHE_ALIAS names a shared backend (Redis, Memcached)
+REPORT_CACHE_PROCESS_LOCAL = False
+# Likewise a logout or deactivation would only evict the cached token in the worker handling it, so
+# tokens are only cached once AUTH_TOKEN_CACHE_ALIAS names a shared backend
+AUTH_TOKEN_CACHE_PROCESS_LOCAL = False
+# And a read-after-write pin set in one worker's LocMemCache would not keep the writer's next request,
+# served by another worker, off the lagging replica: replica reads need a shared REPLICA_PIN_CACHE_ALIAS
+REPLICA_PIN_PROCESS_LOCAL = False
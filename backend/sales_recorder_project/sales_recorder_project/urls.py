@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token # For token-based authentication(DRF token auth)
+from core.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -9,5 +10,6 @@ urlpatterns = [
     path('api/v1/auth/', include('users.urls')), # Include user-related endpoints
     path('api/v1/', include('sales.urls')), # Include sales-related endpoints ie orders and payments
     path('api/v1/', include('core.urls')), # Include core-related endpoints
-    path('api/v1/token-auth/', obtain_auth_token) # Token authentication endpoint
+    path('api/v1/token-auth/', obtain_auth_token), # Token authentication endpoint
+    path('metrics', MetricsView.as_view(), name='metrics'), # Prometheus scrape endpoint (admin only)
 ]
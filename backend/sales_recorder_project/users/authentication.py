@@ -0,0 +1,65 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'default')]
+
+
+def caching_enabled():
+    """
+    False when the token cache is a per-process LocMemCache and AUTH_TOKEN_CACHE_PROCESS_LOCAL is off:
+    a logout or deactivation handled by one worker would not evict the other workers' entries.
+    """
+    return getattr(settings, 'AUTH_TOKEN_CACHE_PROCESS_LOCAL', True) or not isinstance(get_cache(), LocMemCache)
+
+
+def token_cache_key(key):
+    # Hash the token so raw credentials never end up in the cache backend
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def evict_token(key):
+    get_cache().delete(token_cache_key(key))
+
+
+def evict_user_tokens(user):
+    """
+    Drops the cached credentials of every token belonging to `user`
+    (e.g. after deactivation or a role change).
+    """
+    get_cache().delete_many([token_cache_key(key) for key in Token.objects.filter(user=user).values_list('key', flat=True)])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that resolves token -> user -> profile in a single query
+    and keeps the result in the AUTH_TOKEN_CACHE_ALIAS cache for AUTH_TOKEN_CACHE_TTL seconds
+    (unless caching_enabled() says the cache cannot be trusted with revocations).
+    On a warm cache a request costs no authentication queries, and
+    `request.user.profile` is already loaded for permissions and querysets.
+    """
+    def authenticate_credentials(self, key):
+        cache = get_cache() if caching_enabled() else None
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key) if cache is not None else None
+        if token is None:
+            try:
+                token = Token.objects.select_related('user__profile').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            # Touch the profile so a missing one is cached as missing rather than queried again
+            hasattr(token.user, 'profile')
+            if cache is not None:
+                cache.set(cache_key, token, getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .authentication import evict_token, evict_user_tokens
+from .models import User, UserProfile
+
+
+def login_only(update_fields):
+    # A login timestamp is neither cached with tokens nor shown by any representation
+    return bool(update_fields) and set(update_fields) == {'last_login'}
+
+
+@receiver(post_save, sender=User)
+def evict_saved_user(sender, instance, created, **kwargs):
+    """
+    Saved users (e.g. deactivated ones) must not keep authenticating with cached credentials.
+    """
+    if created or login_only(kwargs.get('update_fields')):
+        return # New users have no tokens yet
+    evict_user_tokens(instance)
+
+
+@receiver(post_save, sender=User)
+def touch_saved_user_profile(sender, instance, created, **kwargs):
+    """
+    User has no updated_at: its profile's stands in for it, so the ETags of everything nesting the
+    username (profiles, and orders, payments and clients through their salesperson) change with it.
+    """
+    if created or login_only(kwargs.get('update_fields')):
+        return
+    UserProfile.objects.filter(user=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=UserProfile)
+def evict_saved_profile(sender, instance, created, **kwargs):
+    # The cached user carries its profile, so a role change must be picked up
+    if not created:
+        evict_user_tokens(instance.user_id)
+
+
+@receiver(post_delete, sender=UserProfile)
+def evict_deleted_profile(sender, instance, **kwargs):
+    # The cached user carries the profile (and its role) it had when cached
+    evict_user_tokens(instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    evict_token(instance.key)
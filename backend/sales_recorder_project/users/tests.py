@@ -1,3 +1,48 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import User, UserProfile
 
-# Create your tests here.
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='adminpassword')
+        UserProfile.objects.create(user=cls.user, role='admin')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_cache_needs_no_auth_queries(self):
+        self.api.get('/api/v1/auth/me/')
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/v1/auth/me/')
+        self.assertEqual(response.data['profile']['role'], 'admin')
+
+    def test_deactivation_evicts_cached_credentials(self):
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 401)
+
+    def test_logout_evicts_cached_credentials(self):
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 200)
+        self.assertEqual(self.api.post('/api/v1/auth/logout/').status_code, 204)
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 401)
+
+    def test_profile_delete_evicts_cached_credentials(self):
+        self.assertEqual(self.api.get('/api/v1/auth/me/').data['profile']['role'], 'admin')
+        UserProfile.objects.filter(user=self.user).delete()
+        self.assertIsNone(self.api.get('/api/v1/auth/me/').data['profile'])
+
+    @override_settings(AUTH_TOKEN_CACHE_PROCESS_LOCAL=False)
+    def test_process_local_cache_is_skipped_when_not_allowed(self):
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 200)
+        # Revoked the way another worker would: nothing evicts this process's cache
+        Token.objects.filter(pk=self.token.pk).update(key='revoked')
+        self.assertEqual(self.api.get('/api/v1/auth/me/').status_code, 401)
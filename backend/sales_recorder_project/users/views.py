@@ -7,6 +7,8 @@ from .serializers import RegisterSerializer, LoginSerializer, UserSerializer, Us
 from rest_framework import viewsets
 from .models import User, UserProfile
 from .permissions import IsAdminUser, IsSalesperson 
+from .authentication import evict_token
+from core.conditional import ConditionalGetMixin
 
 class RegisterAPI(generics.GenericAPIView):
     """
@@ -52,7 +54,9 @@ class LogoutAPI(APIView):
     permission_classes = [permissions.IsAuthenticated] # Only authenticated users can logout
 
     def post(self, request):
-        request.user.auth_token.delete()
+        token = request.user.auth_token
+        evict_token(token.key) # Stop the cached credentials from authenticating right away
+        token.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class UserProfileView(generics.RetrieveAPIView):
@@ -66,7 +70,7 @@ class UserProfileView(generics.RetrieveAPIView):
         return self.request.user
     
 
-class UserProfileViewSet(viewsets.ReadOnlyModelViewSet):
+class UserProfileViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows UserProfiles to be viewed.
     Primarily for admin to get a list of salespersons.
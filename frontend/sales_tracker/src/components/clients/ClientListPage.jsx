@@ -3,6 +3,7 @@ import { useState } from "react";
 import useAuthStore from "../../store/authStore"; // For authentication token
 import Input from "../common/Input";
 import Button from "../common/Button";
+import fetchAllPages from "../common/fetchAllPages";
 import { useNavigate } from "react-router-dom";
 
 const ClientListPage = () => {
@@ -30,20 +31,14 @@ const ClientListPage = () => {
                     url += `client_type=${filterType}&`;
                 }
 
-                const response = await fetch(url, {
+                // Every page of the list, not just the first 50 clients
+                const data = await fetchAllPages(url, {
                     method: 'GET',
                     headers: {
                         'Content-Type': 'application/json',
                         'Authorization': `Token ${token}`, // Includes the authentication
                     },
-                });
-
-                if (!response.ok) {
-                    const errorData = await response.json();
-                    throw new Error(errorData.detail || 'Failed to fetch clients');
-                }
-
-                const data = await response.json();
+                }, 'Failed to fetch clients');
                 setClients(data);
             } catch (err) {
                 console.error('Error fetching clients:', err);
@@ -3,6 +3,7 @@ import useAuthStore from '../../store/authStore';
 import Button from '../common/Button';
 import Select from '../common/Select';
 import Modal from '../common/Modal'; 
+import fetchAllPages from '../common/fetchAllPages';
 
 const PendingClientsPage = () => {
   const token = useAuthStore((state) => state.token);
@@ -24,22 +25,11 @@ const PendingClientsPage = () => {
     setError(null);
     try {
       if (!token) throw new Error('Authentication token not found.');
-      const response = await fetch('http://localhost:8000/api/v1/clients/?status=pending_approval', {
+      // The client list is paginated: follow it to the end so no request is left out
+      const data = await fetchAllPages('http://localhost:8000/api/v1/clients/?status=pending_approval', {
         headers: { 'Authorization': `Token ${token}` },
-      });
-
-      if (!response.ok) {
-        const errorText = await response.text();
-        console.error('PendingClientsPage: Backend Error Data (Clients Fetch):', errorText);
-        try {
-          const errorData = JSON.parse(errorText);
-          throw new Error(errorData.detail || 'Failed to fetch pending clients.');
-        } catch (jsonError) {
-          throw new Error(`Failed to fetch pending clients: ${errorText.substring(0, 200)}... (Response was not JSON)`);
-        }
-      }
-      const data = await response.json();
-      setPendingClients(data.results || data);
+      }, 'Failed to fetch pending clients.');
+      setPendingClients(data);
     } catch (err) {
       console.error('PendingClientsPage: Error fetching pending clients:', err);
       setError(err.message);
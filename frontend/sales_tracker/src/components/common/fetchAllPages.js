@@ -0,0 +1,33 @@
+// Fetches every page of a list endpoint by following `next` until it runs out.
+// Paginated lists (clients, orders, payments) come back whole instead of as their first page;
+// endpoints that are not paginated return their plain array, which is used as is.
+const fetchAllPages = async (url, options, errorMessage) => {
+  const results = [];
+  let next = url;
+
+  while (next) {
+    const response = await fetch(next, options);
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      let detail = null;
+      try {
+        detail = JSON.parse(errorText).detail;
+      } catch (jsonError) {
+        // Not JSON (e.g. an HTML error page): fall back to the caller's message
+      }
+      throw new Error(detail || errorMessage);
+    }
+
+    const data = await response.json();
+    if (!data.results) {
+      return data; // Not paginated
+    }
+    results.push(...data.results);
+    next = data.next;
+  }
+
+  return results;
+};
+
+export default fetchAllPages;
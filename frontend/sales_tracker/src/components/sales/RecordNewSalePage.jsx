@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import useAuthStore from '../../store/authStore';
 import Button from '../common/Button';
 import Input from '../common/Input'; 
+import fetchAllPages from '../common/fetchAllPages';
 const RecordNewSalePage = () => {
   const navigate = useNavigate();
   const token = useAuthStore((state) => state.token);
@@ -30,19 +31,13 @@ const RecordNewSalePage = () => {
 
         // Salespersons should only see their approved clients for recording sales
         // Admins can see all approved clients.
-        let clientUrl = `http://localhost:8000/api/v1/clients/?status=approved`;
+        // The largest pages the API serves, followed to the end so no client is left out of the dropdown
+        let clientUrl = `http://localhost:8000/api/v1/clients/?status=approved&page_size=500`;
 
-        const response = await fetch(clientUrl, {
+        const data = await fetchAllPages(clientUrl, {
           headers: { 'Authorization': `Token ${token}` },
-        });
-
-        if (!response.ok) {
-          const errorData = await response.json();
-          console.error('RecordNewSalePage: Backend Error Data (Clients Fetch):', errorData); // Enhanced error logging
-          throw new Error(errorData.detail || 'Failed to fetch clients.');
-        }
-        const data = await response.json();
-        setClients(data.results || data);
+        }, 'Failed to fetch clients.');
+        setClients(data);
       } catch (err) {
         console.error('RecordNewSalePage: Error fetching clients:', err);
         setFetchingError(err.message);